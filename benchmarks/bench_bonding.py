@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark bond-graph construction: MinimumDistanceNN vs the cell-list strategy.
+
+Builds cubic supercells of the Si fixture and reports wall time per strategy as
+n_sites grows. MinimumDistanceNN is only timed up to --max-reference-sites since it
+scales poorly.
+
+Usage:
+  python benchmarks/bench_bonding.py
+  python benchmarks/bench_bonding.py --sizes 8 64 512 4096 --json bonding.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURE = ROOT / "tests" / "data" / "si.cif"
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Bond graph construction benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 64, 512, 4096], help="Target n_sites")
+    parser.add_argument("--max-reference-sites", type=int, default=512, help="Largest size timed with MinimumDistanceNN")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per case (best time is reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    from lattice_api.services.bonding import build_structure_graph
+    from lattice_api.services.cif import parse_cif_bytes
+
+    unit = parse_cif_bytes(FIXTURE.read_bytes())
+    results = []
+    print(f"{'n_sites':>8} {'strategy':>18} {'seconds':>10} {'edges':>8}")
+    for target in args.sizes:
+        k = max(1, round((target / len(unit)) ** (1 / 3)))
+        structure = unit * (k, k, k)
+        for strategy in ("minimum_distance", "cell_list"):
+            if strategy == "minimum_distance" and len(structure) > args.max_reference_sites:
+                continue
+            edges = build_structure_graph(structure, strategy).graph.number_of_edges()
+            seconds = _time(lambda: build_structure_graph(structure, strategy), args.repeat)
+            results.append({"n_sites": len(structure), "strategy": strategy, "seconds": seconds, "edges": edges})
+            print(f"{len(structure):>8} {strategy:>18} {seconds:>10.4f} {edges:>8}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark CIF parsing: pymatgen's CifParser vs the P1 fast path.
+
+Writes random multi-species P1 structures with CifWriter and reports wall time of
+both readers as n_sites grows, with and without the primitive cell reduction the
+API applies. CifParser is only timed up to --max-reference-sites since it scales
+quadratically; below that, the two results are checked to be the same structure.
+
+Usage:
+  python benchmarks/bench_cif.py
+  python benchmarks/bench_cif.py --sizes 100 1000 10000 --json cif.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _random_cif(n_sites: int) -> str:
+    import numpy as np
+    from pymatgen.core import Lattice, Structure
+    from pymatgen.io.cif import CifWriter
+
+    rng = np.random.default_rng(n_sites)
+    # About 12 A^3 per atom keeps sites well apart
+    a = (12.0 * n_sites) ** (1 / 3)
+    species = rng.choice(["O", "Fe", "Li", "P", "Mn"], size=n_sites).tolist()
+    structure = Structure(Lattice.from_parameters(a, a, a, 88, 91, 93), species, rng.random((n_sites, 3)))
+    return str(CifWriter(structure))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="CIF parsing benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="n_sites")
+    parser.add_argument("--max-reference-sites", type=int, default=10000, help="Largest size timed with CifParser")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per case (best time is reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+    from pymatgen.io.cif import CifParser
+
+    from lattice_api.services.fastcif import read_p1_cif
+
+    results = []
+    print(f"{'n_sites':>8} {'primitive':>9} {'reader':>10} {'seconds':>10}")
+    for n_sites in args.sizes:
+        text = _random_cif(n_sites)
+        for primitive in (False, True):
+            readers = {"fast_p1": lambda: read_p1_cif(text, primitive)}
+            if n_sites <= args.max_reference_sites:
+                readers["cifparser"] = lambda: CifParser.from_str(text).get_structures(primitive=primitive)[0]
+            outputs = {}
+            for reader, fn in readers.items():
+                outputs[reader] = fn()
+                seconds = _time(fn, args.repeat)
+                results.append({"n_sites": n_sites, "primitive": primitive, "reader": reader, "seconds": seconds})
+                print(f"{n_sites:>8} {str(primitive):>9} {reader:>10} {seconds:>10.4f}")
+            if "cifparser" in outputs:
+                fast, reference = outputs["fast_p1"], outputs["cifparser"]
+                assert fast is not None and fast.labels == reference.labels
+                assert np.allclose(fast.frac_coords, reference.frac_coords, atol=1e-8)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark SceneResponse serialization: Pydantic validation vs the direct path.
+
+For supercells of the Si fixture, the scene dict is rendered once and then
+serialized by:
+
+- pydantic:  SceneResponse(...).model_dump_json()  (validate + re-serialize; the old path)
+- stdlib:    json.dumps of the plain document
+- direct:    services.encoding.dumps_json (orjson when installed; the current path)
+- core:      pydantic_core.to_json, dumps_json's path without orjson
+
+Wall time (best of --repeat) and peak Python heap allocation (tracemalloc) are
+reported per method.
+
+Usage:
+  python benchmarks/bench_serialize.py
+  python benchmarks/bench_serialize.py --sizes 1000 8000 --json serialize.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURE = ROOT / "tests" / "data" / "si.cif"
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Scene response serialization benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 1000, 8000], help="Target n_sites")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per case (best time is reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    import pydantic_core
+
+    from lattice_api.models import SceneResponse
+    from lattice_api.services.cif import parse_cif_bytes
+    from lattice_api.services.encoding import _json_default, dumps_json
+    from lattice_api.services.scene import structure_lattice_dict, structure_to_scene_dict
+
+    unit = parse_cif_bytes(FIXTURE.read_bytes())
+    results = []
+    print(f"{'n_sites':>8} {'method':>10} {'seconds':>10} {'peak MB':>9} {'bytes':>11}")
+    for target in args.sizes:
+        k = max(1, round((target / len(unit)) ** (1 / 3)))
+        structure = unit * (k, k, k)
+        doc = {
+            "scene": structure_to_scene_dict(structure, bond_strategy="cell_list"),
+            "formula": structure.composition.reduced_formula,
+            "lattice": structure_lattice_dict(structure),
+            "n_sites": len(structure),
+            "source": "upload",
+        }
+        methods = {
+            "pydantic": lambda: SceneResponse(**doc).model_dump_json().encode("utf-8"),
+            "stdlib": lambda: json.dumps(doc, separators=(",", ":")).encode("utf-8"),
+            "direct": lambda: dumps_json(doc),
+            "core": lambda: pydantic_core.to_json(doc, fallback=_json_default),
+        }
+        for name, fn in methods.items():
+            size = len(fn())
+            seconds = _time(fn, args.repeat)
+            peak = _peak(fn)
+            results.append(
+                {"n_sites": len(structure), "method": name, "seconds": seconds, "peak_bytes": peak, "bytes": size}
+            )
+            print(f"{len(structure):>8} {name:>10} {seconds:>10.4f} {peak / 2**20:>9.1f} {size:>11}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark worker cold start.
+
+Each case runs in a fresh interpreter so module caches do not hide import cost:
+- app_import:    `import lattice_api.main` (must stay light: heavy imports are lazy)
+- heavy_imports: pymatgen + crystal_toolkit imports done by warmup
+- first_render:  first render of the built-in warmup structure after imports
+- warm_render:   a second render in the same process
+- time_to_ready: app startup with LATTICE_WARMUP=1 until /health/ready returns 200
+
+Usage:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --repeat 5 --json startup.json --max-app-import 1.0
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+_PROBE = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+import lattice_api.main
+t1 = time.perf_counter()
+result = {"app_import": t1 - t0}
+if sys.argv[1] == "render":
+    from lattice_api.services.executor import warm_worker
+    from lattice_api.services.warmup import render_warmup_structure
+    warm_worker()
+    t2 = time.perf_counter()
+    render_warmup_structure()
+    t3 = time.perf_counter()
+    render_warmup_structure()
+    t4 = time.perf_counter()
+    result.update(heavy_imports=t2 - t1, first_render=t3 - t2, warm_render=t4 - t3)
+elif sys.argv[1] == "ready":
+    from fastapi.testclient import TestClient
+    with TestClient(lattice_api.main.app) as client:
+        while client.get("/health/ready").status_code != 200:
+            time.sleep(0.01)
+    result["time_to_ready"] = time.perf_counter() - t0
+print(json.dumps(result))
+"""
+
+
+def _probe(mode: str) -> dict:
+    env = dict(os.environ, LATTICE_WARMUP="1", LATTICE_EXECUTOR="thread", LATTICE_EXECUTOR_WORKERS="1")
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _PROBE, mode], capture_output=True, text=True, check=True, env=env
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per case (median is reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument(
+        "--max-app-import", type=float, default=None, help="Fail (exit 1) if app import median exceeds this (s)"
+    )
+    args = parser.parse_args(argv)
+
+    samples: dict[str, list[float]] = {}
+    for mode in ("render", "ready"):
+        for _ in range(args.repeat):
+            for name, seconds in _probe(mode).items():
+                samples.setdefault(name, []).append(seconds)
+
+    results = {name: statistics.median(values) for name, values in samples.items()}
+    for name, seconds in results.items():
+        print(f"{name:>14}: {seconds:8.3f}s")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.max_app_import is not None and results["app_import"] > args.max_app_import:
+        print(f"app import regression: {results['app_import']:.3f}s > {args.max_app_import}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark CIF and POSCAR export: pymatgen's writers vs the fast writers.
+
+Builds random multi-species P1 structures and reports wall time of
+`str(CifWriter(s)).encode()` / `str(Poscar(s)).encode()` against
+services/writers.py as n_sites grows, checking the outputs are identical.
+pymatgen's Poscar is quadratic in n_sites, so the pymatgen writers are only
+timed up to --max-reference-sites.
+
+Usage:
+  python benchmarks/bench_writers.py
+  python benchmarks/bench_writers.py --sizes 1000 10000 50000 --json writers.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _random_structure(n_sites: int):
+    import numpy as np
+    from pymatgen.core import Lattice, Structure
+
+    rng = np.random.default_rng(n_sites)
+    a = (12.0 * n_sites) ** (1 / 3)
+    species = rng.choice(["O", "Fe", "Li", "P", "Mn"], size=n_sites).tolist()
+    return Structure(Lattice.from_parameters(a, a, a, 88, 91, 93), species, rng.random((n_sites, 3)))
+
+
+def _fast(writer, structure) -> bytes:
+    out = io.BytesIO()
+    assert writer(structure, out)
+    return out.getvalue()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="CIF/POSCAR writer benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="n_sites")
+    parser.add_argument("--max-reference-sites", type=int, default=10000, help="Largest size timed with pymatgen")
+    parser.add_argument("--repeat", type=int, default=1, help="Repetitions per case (best time is reported)")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    from pymatgen.io.cif import CifWriter
+    from pymatgen.io.vasp.inputs import Poscar
+
+    from lattice_api.services.writers import write_p1_cif, write_poscar
+
+    results = []
+    print(f"{'n_sites':>8} {'format':>7} {'writer':>8} {'seconds':>10}")
+    for n_sites in args.sizes:
+        structure = _random_structure(n_sites)
+        for fmt, fast, reference in (
+            ("cif", write_p1_cif, lambda s: str(CifWriter(s)).encode("utf-8")),
+            ("poscar", write_poscar, lambda s: str(Poscar(s)).encode("utf-8")),
+        ):
+            writers = {"fast": lambda fast=fast, s=structure: _fast(fast, s)}
+            if n_sites <= args.max_reference_sites:
+                writers["pymatgen"] = lambda reference=reference, s=structure: reference(s)
+            outputs = {}
+            for writer, fn in writers.items():
+                outputs[writer] = fn()
+                seconds = _time(fn, args.repeat)
+                results.append({"n_sites": n_sites, "format": fmt, "writer": writer, "seconds": seconds})
+                print(f"{n_sites:>8} {fmt:>7} {writer:>8} {seconds:>10.4f}")
+            if "pymatgen" in outputs:
+                assert outputs["fast"] == outputs["pymatgen"]
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the parse, graph, render and export hot paths.
+
+Supercells of the fixtures are generated at each target size, and every case is
+timed on each of them:
+
+- parse:                   parse_cif_bytes on the supercell's CIF text
+- graph_minimum_distance:  StructureGraph via MinimumDistanceNN (capped by --max-reference-sites)
+- graph_cell_list:         StructureGraph via the cell-list strategy
+- legend:                  crystal_toolkit Legend construction plus a color/radius lookup per site
+- legend_shared:           the same with services.legend.get_legend (warm shared tables)
+- get_scene:               StructureGraph.get_scene with the service's render options
+- to_json:                 Scene.to_json
+- scene_end_to_end:        structure_to_scene_dict (cell_list bonds, cold graph cache)
+- scene_rerender:          the same with another radius scheme and a warm graph cache
+- session_move:            EditSession.apply moving one site (the /api/scene/session patch)
+- session_substitute:      EditSession.apply substituting one site
+- export_<fmt>:            the _export_* functions behind /api/export (cif_symm with a cold
+                           symmetry cache, cif_symm_cached with a warm one)
+
+Results go to a JSON file. Each (case, n_sites) is compared with the baseline
+(benchmarks/baseline.json, the reference run shipped with the repo, or --baseline)
+and the run fails if any case is slower by more than --threshold.
+
+Usage:
+  python benchmarks/run.py --json bench.json
+  python benchmarks/run.py --sizes 10 100 --cases parse get_scene --baseline bench.json
+  python benchmarks/run.py --no-baseline --json benchmarks/baseline.json  # new reference
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+CASES = (
+    "parse",
+    "graph_minimum_distance",
+    "graph_cell_list",
+    "legend",
+    "legend_shared",
+    "get_scene",
+    "to_json",
+    "scene_end_to_end",
+    "scene_rerender",
+    "session_move",
+    "session_substitute",
+    "export_cif",
+    "export_cif_symm",
+    "export_cif_symm_cached",
+    "export_poscar",
+    "export_json",
+    "export_prismatic",
+    "export_mpr",
+)
+FIXTURES = {
+    "si": ROOT / "tests" / "data" / "si.cif",
+    "example": ROOT / "examples" / "structure.json",
+}
+
+
+def _load_fixture(name: str):
+    from pymatgen.core import Structure
+
+    from lattice_api.services.cif import parse_cif_bytes
+
+    path = FIXTURES[name]
+    if path.suffix == ".cif":
+        return parse_cif_bytes(path.read_bytes())
+    return Structure.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+def make_supercell(unit, target: int):
+    """Scale `unit` to roughly `target` sites with near-cubic scaling factors."""
+    cells = max(1, round(target / len(unit)))
+    k = max(1, round(cells ** (1 / 3)))
+    m = max(1, round((cells / k) ** 0.5))
+    n = max(1, round(cells / (k * m)))
+    return unit * (k, m, n)
+
+
+def _time(fn: Callable[[], Any], repeat: int, budget: float) -> Dict[str, float]:
+    """Best and median wall time over `repeat` runs (fewer if one run exceeds `budget`)."""
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        if samples[-1] > budget:
+            break
+    return {"seconds": min(samples), "median": statistics.median(samples), "runs": len(samples)}
+
+
+def _cases(structure, max_reference_sites: int) -> Dict[str, Callable[[], Callable[[], Any]]]:
+    """Case name -> setup returning the callable to time.
+
+    Setups run only for the selected cases; the graph, legend, scene and CIF text
+    some of them share are built on first use.
+    """
+    from crystal_toolkit.core.legend import Legend
+    from crystal_toolkit.renderables import structuregraph as _ct_structuregraph  # noqa: F401
+    from pymatgen.io.cif import CifWriter
+
+    from lattice_api.routers import export
+    from lattice_api.services.bonding import build_structure_graph
+    from lattice_api.services.cache import get_graph_cache
+    from lattice_api.services.cif import parse_cif_bytes
+    from lattice_api.services.legend import get_legend
+    from lattice_api.services.scene import SCENE_RENDER_OPTIONS, structure_to_scene_dict
+    from lattice_api.services.session import EditSession
+    from lattice_api.services.symmetry import get_symmetry_cache
+
+    shared: Dict[str, Any] = {}
+
+    def once(name: str, build: Callable[[], Any]) -> Any:
+        if name not in shared:
+            shared[name] = build()
+        return shared[name]
+
+    def graph():
+        return once("graph", lambda: build_structure_graph(structure, "cell_list"))
+
+    def legend():
+        return once("legend", lambda: Legend(structure, radius_scheme="uniform"))
+
+    def legend_lookups(legend):
+        for site in structure:
+            for sp in site.species:
+                legend.get_color(sp, site)
+                legend.get_radius(sp, site)
+
+    def parse():
+        data = str(CifWriter(structure)).encode("utf-8")
+        return lambda: parse_cif_bytes(data)
+
+    def get_scene():
+        g, lg = graph(), legend()
+        return lambda: g.get_scene(legend=lg, **SCENE_RENDER_OPTIONS)
+
+    def to_json():
+        scene = once("scene", lambda: graph().get_scene(legend=legend(), **SCENE_RENDER_OPTIONS))
+        return scene.to_json
+
+    def scene_cold():
+        get_graph_cache().memory.clear()
+        return structure_to_scene_dict(structure, bond_strategy="cell_list")
+
+    def cif_symm_cold():
+        get_symmetry_cache().clear()
+        return export._export_cif(structure, symm=True)
+
+    def session_edit(op: str):
+        session = EditSession(structure)
+        if op == "move":
+            home = structure[0].frac_coords.tolist()
+            edits = [
+                {"op": "move", "site": 0, "coords": [x + 0.01 for x in home]},
+                {"op": "move", "site": 0, "coords": home},
+            ]
+        else:
+            edits = [
+                {"op": "substitute", "sites": [0], "species": "Ge"},
+                {"op": "substitute", "sites": [0], "species": structure[0].species_string},
+            ]
+
+        def run():
+            # Alternate between an edit and its inverse so every run starts from the same state
+            edits.reverse()
+            return session.apply(edits[0])
+
+        return run
+
+    def ready(fn: Callable[[], Any]) -> Callable[[], Callable[[], Any]]:
+        """Setup of a case that needs none."""
+        return lambda: fn
+
+    cases: Dict[str, Callable[[], Callable[[], Any]]] = {
+        "parse": parse,
+        "graph_cell_list": ready(lambda: build_structure_graph(structure, "cell_list")),
+        "legend": ready(lambda: legend_lookups(Legend(structure, radius_scheme="uniform"))),
+        "legend_shared": ready(lambda: legend_lookups(get_legend(structure, radius_scheme="uniform"))),
+        "get_scene": get_scene,
+        "to_json": to_json,
+        "scene_end_to_end": ready(scene_cold),
+        # Bond graph from the graph cache, as when only display options change
+        "scene_rerender": ready(
+            lambda: structure_to_scene_dict(structure, bond_strategy="cell_list", radius_strategy="atomic")
+        ),
+        "session_move": lambda: session_edit("move"),
+        "session_substitute": lambda: session_edit("substitute"),
+        "export_cif": ready(lambda: export._export_cif(structure, symm=False)),
+        "export_cif_symm": ready(cif_symm_cold),
+        "export_cif_symm_cached": ready(lambda: export._export_cif(structure, symm=True)),
+        "export_poscar": ready(lambda: export._export_poscar(structure)),
+        "export_json": ready(lambda: export._export_json(structure)),
+        "export_prismatic": ready(lambda: export._export_prismatic_zip(structure)),
+        "export_mpr": ready(lambda: export._export_mpr_zip(structure, None)),
+    }
+    if len(structure) <= max_reference_sites:
+        cases["graph_minimum_distance"] = ready(lambda: build_structure_graph(structure, "minimum_distance"))
+    return cases
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float, min_delta: float = 0.0
+) -> List[str]:
+    """Return human-readable regressions (ratio > 1 + threshold, and slower by more
+    than `min_delta` seconds) against `baseline`."""
+    base = {(r["fixture"], r["case"], r["n_sites"]): r["seconds"] for r in baseline}
+    regressions = []
+    for r in results:
+        ref = base.get((r["fixture"], r["case"], r["n_sites"]))
+        if not ref:
+            continue
+        r["baseline"] = ref
+        r["ratio"] = r["seconds"] / ref
+        if r["ratio"] > 1 + threshold and r["seconds"] - ref > min_delta:
+            regressions.append(
+                f"{r['fixture']}/{r['case']}@{r['n_sites']}: {r['seconds']:.4f}s vs {ref:.4f}s ({r['ratio']:.2f}x)"
+            )
+    return regressions
+
+
+def _git_rev() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except Exception:
+        return None
+    return out.stdout.strip()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="lattice-api hot path benchmarks")
+    parser.add_argument("--fixtures", nargs="+", default=["si"], choices=sorted(FIXTURES), help="Unit cells to scale")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Target n_sites")
+    parser.add_argument("--cases", nargs="+", default=None, choices=CASES, help="Only run these cases (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case (best time is compared)")
+    parser.add_argument("--budget", type=float, default=5.0, help="Stop repeating once a run exceeds this (s)")
+    parser.add_argument("--max-reference-sites", type=int, default=1000, help="Largest size for MinimumDistanceNN")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument(
+        "--baseline",
+        default=str(BASELINE),
+        help="Baseline JSON (a previous --json output) to compare with (default: benchmarks/baseline.json)",
+    )
+    parser.add_argument("--no-baseline", action="store_true", help="Do not compare with a baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = +25%%)")
+    parser.add_argument(
+        "--min-delta", type=float, default=0.002, help="Ignore slowdowns smaller than this (s); sub-ms cases are noisy"
+    )
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore")
+    results: List[Dict[str, Any]] = []
+    print(f"{'fixture':>8} {'case':>24} {'n_sites':>8} {'best (s)':>10} {'median (s)':>10}")
+    for fixture in args.fixtures:
+        unit = _load_fixture(fixture)
+        for target in args.sizes:
+            structure = make_supercell(unit, target)
+            for case, setup in _cases(structure, args.max_reference_sites).items():
+                if args.cases and case not in args.cases:
+                    continue
+                timing = _time(setup(), args.repeat, args.budget)
+                results.append({"fixture": fixture, "case": case, "n_sites": len(structure), **timing})
+                print(
+                    f"{fixture:>8} {case:>24} {len(structure):>8} {timing['seconds']:>10.4f} {timing['median']:>10.4f}"
+                )
+
+    regressions: List[str] = []
+    if not args.no_baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline["meta"].get("platform") != platform.platform():
+            print(
+                f"\nNote: the baseline was recorded on {baseline['meta'].get('platform')}; "
+                "record one on this machine (--json) for meaningful ratios.",
+                file=sys.stderr,
+            )
+        regressions = compare(results, baseline["results"], args.threshold, args.min_delta)
+
+    if args.json:
+        meta = {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "git_rev": _git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "threshold": args.threshold,
+            "min_delta": args.min_delta,
+        }
+        Path(args.json).write_text(json.dumps({"meta": meta, "results": results}, indent=2), encoding="utf-8")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over +{args.threshold:.0%}:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from lattice_api.routers.health import router as health_router
+from lattice_api.routers.jobs import router as jobs_router
+from lattice_api.routers.metrics import router as metrics_router
 from lattice_api.routers.prompt import router as prompt_router
 from lattice_api.routers.export import router as export_router
 from lattice_api.routers.scene import router as scene_router
+from lattice_api.routers.session import router as session_router
+from lattice_api.routers.trajectory import router as trajectory_router
+from lattice_api.services.cif import MAX_BATCH_UPLOAD_SIZE
+from lattice_api.services.executor import shutdown_executor
+from lattice_api.services.upload import MULTIPART_OVERHEAD, BodySizeLimitMiddleware
+from lattice_api.services.warmup import mark_starting, run_warmup, warmup_enabled
+from lattice_api.services.workflows import shutdown_job_queue
 
 # Set Crystal Toolkit default color scheme if not provided externally
 os.environ.setdefault("CT_LEGEND_COLOR_SCHEME", "VESTA")
@@ -34,6 +45,22 @@ def get_allowed_origin_regex() -> str | None:
     return regex or None
 
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Heavy imports are lazy unless LATTICE_WARMUP is set; warmup runs in the
+    # background so /health can report progress while it happens
+    warmup_task = None
+    if warmup_enabled():
+        mark_starting()
+        warmup_task = asyncio.create_task(run_warmup())
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    # Stop job dispatchers and pool workers so reloads and shutdowns do not leave orphans behind
+    shutdown_job_queue()
+    shutdown_executor()
+
+
 app = FastAPI(
     title="lattice-api",
     description=(
@@ -41,6 +68,7 @@ app = FastAPI(
         "Future: Prompt -> structure generation -> VASP band/DOS -> Agents/MCP validation."
     ),
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -56,11 +84,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized CIF uploads before the multipart parser buffers them
+app.add_middleware(
+    BodySizeLimitMiddleware, paths=["/api/scene", "/api/trajectory", "/api/jobs/scene"]
+)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    paths=["/api/scene/batch"],
+    max_bytes=MAX_BATCH_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+    detail=f"Batch upload too large. Max {MAX_BATCH_UPLOAD_SIZE // (1024 * 1024)}MB.",
+)
+
 # Routers
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(scene_router)
+app.include_router(session_router)
+app.include_router(trajectory_router)
 app.include_router(prompt_router)
 app.include_router(export_router)
+app.include_router(jobs_router)
 
 
 @app.get("/")
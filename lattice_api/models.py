@@ -1,14 +1,114 @@
-from typing import Dict, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
 
+RadiusStrategyLiteral = Literal[
+    "uniform",
+    "atomic",
+    "specified_or_average_ionic",
+    "covalent",
+    "van_der_waals",
+    "atomic_calculated",
+]
+
+
+BondStrategyLiteral = Literal["minimum_distance", "cell_list"]
+
+
+LodLiteral = Literal["auto", "full", "reduced", "atoms"]
+
+
+JobPriorityLiteral = Literal["high", "normal", "low"]
+
+
 class SceneResponse(BaseModel):
-    scene: dict
+    # Documents the /api/scene response; the handler serializes it directly
+    # (services/scene.py) rather than validating the large scene through it
+    scene: Dict[str, Any] = Field(
+        description="Crystal Toolkit Scene JSON: {name, contents: [...], origin, visible}"
+    )
     formula: str
     lattice: Dict[str, float]  # a,b,c,alpha,beta,gamma,volume
     n_sites: int
     source: Literal["upload", "prompt"]
+    lod: Optional[Literal["full", "reduced", "atoms"]] = Field(
+        default=None, description="Level of detail actually rendered"
+    )
+    scene_id: Optional[str] = Field(
+        default=None,
+        description="Id of the upload for POST /api/scene/render and, when bonds were deferred "
+        "(lod=atoms), GET /api/scene/{scene_id}/bonds",
+    )
+    supercell: Optional[List[List[int]]] = Field(
+        default=None, description="Supercell matrix rendered, if one was requested"
+    )
+
+
+class AxesOptions(BaseModel):
+    # Unset fields keep the CT_AXES_* defaults
+    visible: Optional[bool] = None
+    mode: Optional[Literal["lattice", "cartesian"]] = None
+    scale: Optional[float] = Field(default=None, gt=0)
+    head_length: Optional[float] = Field(default=None, ge=0)
+    head_width: Optional[float] = Field(default=None, ge=0)
+    radius: Optional[float] = Field(default=None, ge=0)
+
+
+class SceneRenderRequest(BaseModel):
+    scene_id: Optional[str] = Field(default=None, description="scene_id of an earlier /api/scene response")
+    cif: Optional[str] = Field(default=None, description="CIF text, when there is no scene_id")
+    radius_strategy: RadiusStrategyLiteral = "uniform"
+    bond_strategy: BondStrategyLiteral = "minimum_distance"
+    lod: LodLiteral = "full"
+    primitive_budget: Optional[int] = Field(default=None, ge=1)
+    supercell: Optional[str] = Field(default=None, description='"2x2x2", "2,2,2" or nine integers')
+    axes: Optional[AxesOptions] = None
+
+
+class SceneBondsResponse(BaseModel):
+    scene_id: str
+    bonds: Dict[str, Any] = Field(description="Scene group of batched half-bond cylinders")
+
+
+class TrajectoryTopology(BaseModel):
+    frame: int = Field(description="First frame this bond list applies to")
+    bonds: List[List[int]] = Field(description="[i, j, a, b, c]: site i bonded to site j in image (a, b, c)")
+
+
+class TrajectoryResponse(BaseModel):
+    # Documents the /api/trajectory response; serialized directly like SceneResponse
+    formula: str
+    n_sites: int
+    n_frames: int
+    source: Literal["upload"]
+    scene: Dict[str, Any] = Field(
+        description="Template scene of frame 0 (reduced level; atom batches list their `sites`)"
+    )
+    topologies: List[TrajectoryTopology]
+    lattice: List[List[float]] = Field(description="Lattice matrix of frame 0")
+    frameLattices: Optional[List[List[List[float]]]] = Field(
+        default=None, description="Per-frame lattice matrices, only when the cell changes"
+    )
+    frames: Dict[str, Any] = Field(
+        description='{"encoding": "delta", "scale", "positions": per-frame integer deltas} in JSON, '
+        '{"encoding": "float32", "framePositions"} in the binary encoding'
+    )
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str = Field(description="scene or export")
+    priority: JobPriorityLiteral
+    state: Literal["queued", "running", "done", "failed"]
+    created: float = Field(description="Unix timestamps, like started/finished")
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    status_code: Optional[int] = Field(default=None, description="HTTP status the work finished with")
+    error: Optional[Any] = None
+    media_type: Optional[str] = None
+    filename: Optional[str] = None
+    links: Dict[str, str] = Field(description="self, events (SSE) and result URLs")
 
 
 class PromptRequest(BaseModel):
@@ -38,3 +138,16 @@ class ExportRequest(BaseModel):
     cif: Optional[str] = None
     structure: Optional[dict] = None
     options: ExportOptions = Field(default_factory=ExportOptions)
+
+
+class BulkExportItem(BaseModel):
+    name: Optional[str] = Field(default=None, description="Folder name in the archive")
+    material_id: Optional[str] = None
+    cif: Optional[str] = None
+    structure: Optional[dict] = None
+
+
+class BulkExportRequest(BaseModel):
+    items: List[BulkExportItem]
+    formats: List[FormatLiteral]
+    options: ExportOptions = Field(default_factory=ExportOptions)
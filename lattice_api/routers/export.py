@@ -1,17 +1,39 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import io
 import json
-import zipfile
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from lattice_api.models import (
+    BulkExportItem,
+    BulkExportRequest,
+    ExportOptions,
     ExportRequest,
+    FormatLiteral,
+    JobPriorityLiteral,
+    JobStatus,
     MPROptions,
     CellLiteral,
 )
-from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.cache import get_export_cache
+from lattice_api.services.cif import MAX_BATCH_ITEMS, parse_cif_bytes
+from lattice_api.services.conditional import matching_etag, negotiated_response, not_modified
+from lattice_api.services.dedup import canonical_id, dedup_candidate, dedup_enabled
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import finish_request, note, record, stage, timed_call
+from lattice_api.services.symmetry import get_symmetry
+from lattice_api.services.workflows import get_job_queue, job_status
+from lattice_api.services.writers import fast_writers_enabled, write_p1_cif, write_poscar
+from lattice_api.services.zipstream import ZipStreamWriter, iter_zip
 
 
 router = APIRouter(prefix="/api", tags=["export"])
@@ -26,7 +48,7 @@ def _error(status: int, error: str, message: str, detail: dict | None = None):
     raise HTTPException(status_code=status, detail={"error": error, "message": message, "detail": detail or {}})
 
 
-def _load_structure_from_request(req: ExportRequest):
+def _load_structure_from_request(req: ExportRequest | BulkExportItem):
     from pymatgen.core.structure import Structure
 
     if req.structure:
@@ -51,13 +73,11 @@ def _apply_cell_option(structure, cell: CellLiteral):
     if cell == "input":
         return structure
     try:
-        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
-
-        sga = SpacegroupAnalyzer(structure, symprec=1e-3)
+        symmetry = get_symmetry(structure, symprec=1e-3)
         if cell == "primitive":
-            return sga.get_primitive_standard_structure()
+            return symmetry.primitive
         if cell == "conventional":
-            return sga.get_conventional_standard_structure()
+            return symmetry.conventional
     except Exception:
         return structure
     return structure
@@ -66,13 +86,23 @@ def _apply_cell_option(structure, cell: CellLiteral):
 def _export_cif(structure, symm: bool) -> bytes:
     from pymatgen.io.cif import CifWriter
 
-    cif_str = str(CifWriter(structure, symprec=(1e-2 if symm else None)))
+    if symm:
+        return get_symmetry(structure, symprec=1e-2).symmetrized_cif().encode("utf-8")
+    if fast_writers_enabled():
+        out = io.BytesIO()
+        if write_p1_cif(structure, out):
+            return out.getvalue()
+    cif_str = str(CifWriter(structure))
     return cif_str.encode("utf-8")
 
 
 def _export_poscar(structure) -> bytes:
     from pymatgen.io.vasp.inputs import Poscar
 
+    if fast_writers_enabled():
+        out = io.BytesIO()
+        if write_poscar(structure, out):
+            return out.getvalue()
     return str(Poscar(structure)).encode("utf-8")
 
 
@@ -80,17 +110,16 @@ def _export_json(structure) -> bytes:
     return json.dumps(structure.as_dict()).encode("utf-8")
 
 
-def _export_prismatic_zip(structure) -> bytes:
+def _prismatic_entries(structure) -> List[Tuple[str, bytes | str]]:
     # Minimal placeholder: include a CIF and a README for prismatic usage
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("README.txt", "Prismatic input bundle (placeholder). Includes structure.cif.\n")
-        zf.writestr("structure.cif", _export_cif(structure, symm=False))
-        zf.writestr("structure.json", _export_json(structure))
-    return mem.getvalue()
+    return [
+        ("README.txt", "Prismatic input bundle (placeholder). Includes structure.cif.\n"),
+        ("structure.cif", _export_cif(structure, symm=False)),
+        ("structure.json", _export_json(structure)),
+    ]
 
 
-def _export_mpr_zip(structure, mpr: MPROptions | None) -> bytes:
+def _mpr_entries(structure, mpr: MPROptions | None) -> List[Tuple[str, bytes | str]]:
     from pymatgen.io.vasp.sets import MPRelaxSet
 
     kwargs = {}
@@ -98,63 +127,315 @@ def _export_mpr_zip(structure, mpr: MPROptions | None) -> bytes:
     vset = MPRelaxSet(structure, **kwargs)
     vasp_input = vset.get_input_set(potcar_spec=True)
 
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("INCAR", str(vasp_input["INCAR"]))
-        zf.writestr("KPOINTS", str(vasp_input["KPOINTS"]))
-        zf.writestr("POSCAR", str(vasp_input["POSCAR"]))
-        # POTCAR.spec is a string if potcar_spec=True
-        potcar_obj = vasp_input["POTCAR"]
-        zf.writestr("POTCAR.spec", potcar_obj if isinstance(potcar_obj, str) else str(potcar_obj))
+    # POTCAR.spec is a string if potcar_spec=True (newer pymatgen also keys it as "POTCAR.spec")
+    potcar_obj = vasp_input["POTCAR.spec"] if "POTCAR.spec" in vasp_input else vasp_input["POTCAR"]
+    return [
+        ("INCAR", str(vasp_input["INCAR"])),
+        ("KPOINTS", str(vasp_input["KPOINTS"])),
+        ("POSCAR", _export_poscar(vasp_input["POSCAR"].structure)),
+        ("POTCAR.spec", potcar_obj if isinstance(potcar_obj, str) else str(potcar_obj)),
         # Also include a CIF for convenience
-        zf.writestr("structure.cif", _export_cif(structure, symm=False))
-    return mem.getvalue()
+        ("structure.cif", _export_cif(structure, symm=False)),
+    ]
 
 
-@router.post("/export")
-def export_file(req: ExportRequest):
+def _export_prismatic_zip(structure) -> bytes:
+    return b"".join(iter_zip(_prismatic_entries(structure)))
+
+
+def _export_mpr_zip(structure, mpr: MPROptions | None) -> bytes:
+    return b"".join(iter_zip(_mpr_entries(structure, mpr)))
+
+
+def _export_name(fmt: FormatLiteral, formula: str) -> tuple[str, str]:
+    """(content_type, filename) of an export of a structure with this reduced formula."""
+    if fmt == "cif" or fmt == "cif_symm":
+        return "chemical/x-cif", f"{formula}.cif"
+    if fmt == "poscar":
+        return "text/plain", "POSCAR"
+    if fmt == "json":
+        return "application/json", "structure.json"
+    if fmt == "prismatic":
+        return "application/zip", "prismatic_inputs.zip"
+    if fmt == "mpr":
+        return "application/zip", "vasp_inputs_mprelaxset.zip"
+    return "application/octet-stream", "download"
+
+
+def _export_candidate(req: ExportRequest) -> dict | None:
+    """dedup_candidate of the request's structure. Runs inside the executor pool."""
+    with stage("load"):
+        structure = _load_structure_from_request(req)
+    return dedup_candidate(structure)
+
+
+async def _export_cache_key(req: ExportRequest) -> tuple[str | None, str]:
+    """(key shared by all requests for an equivalent structure, reduced formula),
+    or (None, "") if not cacheable.
+
+    Only standardized cells qualify: "input" exports mirror the uploaded setting.
+    The structure is parsed in the pool; the dedup index and the export cache are
+    used here, in the API process, so all workers share them.
+    """
+    if req.options.cell == "input" or not dedup_enabled():
+        return None, ""
+    candidate = await get_executor().run(_export_candidate, req)
+    canonical = await canonical_id(candidate)
+    if canonical is None:
+        return None, ""
+    spec = f"{canonical}|{req.format}|{req.options.model_dump_json()}"
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest(), candidate["fingerprint"][0]
+
+
+def _cached_export(key: str | None) -> tuple[bytes, str, str] | None:
+    """(payload, content_type, filename) from the export cache, or None."""
+    cached = get_export_cache().get(key) if key is not None else None
+    if cached is None:
+        return None
+    content_type, filename, payload = cached.split(b"\n", 2)
+    return payload, content_type.decode("utf-8"), filename.decode("utf-8")
+
+
+def _cache_export(key: str, payload: bytes, content_type: str, filename: str) -> None:
+    get_export_cache().put(key, f"{content_type}\n{filename}\n".encode("utf-8") + payload)
+
+
+def _build_export(req: ExportRequest) -> tuple[bytes, str, str]:
+    """Resolve, transform and serialize the requested export.
+
+    Returns (payload, content_type, filename). Runs inside the executor pool.
+    """
     # 1) Resolve structure
-    structure = _load_structure_from_request(req)
+    with stage("load"):
+        structure = _load_structure_from_request(req)
     if not structure:
         _error(422, "UnprocessableEntity", "Could not resolve a structure from input")
+    note("n_sites", len(structure))
 
     # 2) Apply cell choice
-    structure = _apply_cell_option(structure, req.options.cell)
+    with stage("cell"):
+        structure = _apply_cell_option(structure, req.options.cell)
 
     # 3) Build payload by format
     fmt = req.format
-    filename = "download"
-    content_type = "application/octet-stream"
+    content_type, filename = _export_name(fmt, structure.composition.reduced_formula)
     payload = b""
 
     try:
-        if fmt == "cif" or fmt == "cif_symm":
-            symm = True if fmt == "cif_symm" else bool(req.options.symmetrize)
-            payload = _export_cif(structure, symm)
-            content_type = "chemical/x-cif"
-            filename = f"{structure.composition.reduced_formula}.cif"
-        elif fmt == "poscar":
-            payload = _export_poscar(structure)
-            content_type = "text/plain"
-            filename = "POSCAR"
-        elif fmt == "json":
-            payload = _export_json(structure)
-            content_type = "application/json"
-            filename = "structure.json"
-        elif fmt == "prismatic":
-            payload = _export_prismatic_zip(structure)
-            content_type = "application/zip"
-            filename = "prismatic_inputs.zip"
-        elif fmt == "mpr":
-            payload = _export_mpr_zip(structure, req.options.mpr)
-            content_type = "application/zip"
-            filename = "vasp_inputs_mprelaxset.zip"
-        else:
-            _error(400, "BadRequest", f"Unsupported format: {fmt}")
+        with stage("format"):
+            if fmt == "cif" or fmt == "cif_symm":
+                symm = True if fmt == "cif_symm" else bool(req.options.symmetrize)
+                payload = _export_cif(structure, symm)
+            elif fmt == "poscar":
+                payload = _export_poscar(structure)
+            elif fmt == "json":
+                payload = _export_json(structure)
+            elif fmt == "prismatic":
+                payload = _export_prismatic_zip(structure)
+            elif fmt == "mpr":
+                payload = _export_mpr_zip(structure, req.options.mpr)
+            else:
+                _error(400, "BadRequest", f"Unsupported format: {fmt}")
     except HTTPException:
         raise
     except Exception as exc:
         _error(500, "InternalServerError", "Failed to generate export", {"exc": str(exc)})
 
+    return payload, content_type, filename
+
+
+# Bump when export output changes for the same request, so clients drop their ETags
+EXPORT_ETAG_VERSION = "1"
+
+
+def _export_etag_key(req: ExportRequest) -> str:
+    """Content address of an export: the request's input and options."""
+    return hashlib.sha256(f"v{EXPORT_ETAG_VERSION}|{req.model_dump_json()}".encode("utf-8")).hexdigest()
+
+
+@router.post("/export")
+async def export_file(
+    req: ExportRequest,
+    accept_encoding: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    """Export a structure as a file in the requested format.
+
+    The ETag is a hash of the request body, so `If-None-Match` with it gets a 304
+    before anything is parsed. Text formats are compressed as `Accept-Encoding`
+    allows (see services/conditional.py); zips are sent as they are.
+    """
+    started = time.perf_counter()
+    key = _export_etag_key(req)
+    tag = matching_etag(if_none_match, key)
+    if tag is not None:
+        finish_request("export", "not_modified", {}, started)
+        return not_modified(tag)
+    try:
+        # Equivalent structures (see services/dedup.py) share standardized-cell exports
+        cache_key, _ = await _export_cache_key(req)
+        cached = _cached_export(cache_key)
+        if cached is not None:
+            (payload, content_type, filename), stages = cached, {}
+        else:
+            built = await get_executor().run(timed_call, _build_export, req)
+            (payload, content_type, filename), stages = built
+            if cache_key is not None:
+                _cache_export(cache_key, payload, content_type, filename)
+    except HTTPException:
+        finish_request("export", "error", {}, started)
+        raise
+
     headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
-    return Response(content=payload, media_type=content_type, headers=headers)
+    headers.update(finish_request("export", "ok", stages, started, len(payload)))
+    return negotiated_response(
+        payload, key=key, media_type=content_type, accept_encoding=accept_encoding, headers=headers
+    )
+
+
+@router.post("/jobs/export", status_code=202, response_model=JobStatus, tags=["jobs"])
+async def submit_export_job(req: ExportRequest, priority: JobPriorityLiteral = Query("normal")):
+    """Queue an /api/export request as a background job (e.g. `format="mpr"`).
+
+    The job result (`GET /api/jobs/{id}/result`) is the file /api/export would
+    return, with the same content type and filename. Cached exports complete immediately.
+    """
+    jobs = get_job_queue()
+    cache_key, formula = await _export_cache_key(req)
+    cached = _cached_export(cache_key)
+    if cached is not None:
+        payload, content_type, filename = cached
+        job = jobs.complete("export", payload, content_type, priority=priority, filename=filename)
+    else:
+        on_done = None
+        if cache_key is not None:
+            content_type, filename = _export_name(req.format, formula)
+            on_done = functools.partial(
+                _cache_export, cache_key, content_type=content_type, filename=filename
+            )
+        job = jobs.submit("export", _build_export, req, priority=priority, on_done=on_done)
+    status_doc = job_status(job)
+    return JSONResponse(status_doc, status_code=202, headers={"Location": status_doc["links"]["self"]})
+
+
+def _bulk_entries(structure, fmt: FormatLiteral, options: ExportOptions) -> List[Tuple[str, bytes | str]]:
+    """Archive entries (relative to the structure's folder) for one format."""
+    if fmt == "cif":
+        name = f"{structure.composition.reduced_formula}.cif"
+        return [(name, _export_cif(structure, bool(options.symmetrize)))]
+    if fmt == "cif_symm":
+        return [(f"{structure.composition.reduced_formula}_symm.cif", _export_cif(structure, True))]
+    if fmt == "poscar":
+        return [("POSCAR", _export_poscar(structure))]
+    if fmt == "json":
+        return [("structure.json", _export_json(structure))]
+    if fmt == "prismatic":
+        return [(f"prismatic/{name}", data) for name, data in _prismatic_entries(structure)]
+    if fmt == "mpr":
+        return [(f"mpr/{name}", data) for name, data in _mpr_entries(structure, options.mpr)]
+    _error(400, "BadRequest", f"Unsupported format: {fmt}")
+    return []
+
+
+def _build_bulk_item(
+    item: BulkExportItem, formats: List[FormatLiteral], options: ExportOptions
+) -> Tuple[str, List[Tuple[str, bytes | str]]]:
+    """Parse and cell-transform one structure once, then render every format.
+
+    Returns (reduced_formula, entries). Runs inside the executor pool.
+    """
+    with stage("load"):
+        structure = _load_structure_from_request(item)
+    if not structure:
+        _error(422, "UnprocessableEntity", "Could not resolve a structure from input")
+    note("n_sites", len(structure))
+    with stage("cell"):
+        structure = _apply_cell_option(structure, options.cell)
+    entries: List[Tuple[str, bytes | str]] = []
+    try:
+        for fmt in formats:
+            with stage(f"format_{fmt}"):
+                entries.extend(_bulk_entries(structure, fmt, options))
+    except HTTPException:
+        raise
+    except Exception as exc:
+        _error(500, "InternalServerError", "Failed to generate export", {"exc": str(exc)})
+    return structure.composition.reduced_formula, entries
+
+
+def _folder_name(index: int, item: BulkExportItem, formula: str, used: Dict[str, int]) -> str:
+    base = re.sub(r"[^A-Za-z0-9._-]+", "_", item.name or "").strip("._") or f"{index:04d}_{formula}"
+    count = used.get(base, 0)
+    used[base] = count + 1
+    return base if count == 0 else f"{base}_{count}"
+
+
+async def _stream_bulk_zip(req: BulkExportRequest) -> AsyncIterator[bytes]:
+    """Yield the archive while it is written, keeping a bounded window of items in flight.
+
+    Entries appear in request order. Failed items are listed in `errors.json` at the end
+    of the archive (the response status is already sent by then).
+    """
+    executor = get_executor()
+    window = executor.max_workers * 2
+    items = iter(enumerate(req.items))
+    pending: deque = deque()
+
+    def refill() -> None:
+        while len(pending) < window:
+            nxt = next(items, None)
+            if nxt is None:
+                return
+            index, item = nxt
+            task = asyncio.ensure_future(
+                executor.run(timed_call, _build_bulk_item, item, req.formats, req.options, wait=True)
+            )
+            pending.append((index, item, task))
+
+    writer = ZipStreamWriter()
+    used: Dict[str, int] = {}
+    errors = []
+    refill()
+    try:
+        while pending:
+            index, item, task = pending.popleft()
+            try:
+                (formula, entries), stages = await task
+            except HTTPException as exc:
+                errors.append({"index": index, "name": item.name, "status": exc.status_code, "error": exc.detail})
+                refill()
+                continue
+            refill()
+            record("export_bulk", stages)
+            folder = _folder_name(index, item, formula, used)
+            for name, data in entries:
+                # Compression is CPU work; keep it off the event loop
+                chunk = await asyncio.to_thread(writer.add, f"{folder}/{name}", data)
+                if chunk:
+                    yield chunk
+        if errors:
+            yield writer.add("errors.json", json.dumps(errors, indent=2))
+        yield writer.close()
+    finally:
+        for _, _, task in pending:
+            task.cancel()
+
+
+@router.post("/export/bulk")
+async def export_bulk(req: BulkExportRequest):
+    """Export many structures in many formats as one streamed zip.
+
+    Each structure is parsed, cell-transformed and symmetry-analyzed once for all
+    requested formats; its files go under one folder per structure (`name`, or
+    `<index>_<formula>`). Multi-file formats are unpacked into subfolders
+    (`prismatic/`, `mpr/`) instead of nested zips.
+    """
+    if not req.items:
+        _error(400, "BadRequest", "At least one item is required")
+    if not req.formats:
+        _error(400, "BadRequest", "At least one format is required")
+    if len(req.items) > MAX_BATCH_ITEMS:
+        _error(413, "PayloadTooLarge", f"Too many items. Max {MAX_BATCH_ITEMS}.")
+
+    headers = {"Content-Disposition": 'attachment; filename="export.zip"'}
+    return StreamingResponse(_stream_bulk_zip(req), media_type="application/zip", headers=headers)
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from lattice_api.services.warmup import readiness
 
 
 router = APIRouter(tags=["health"])
@@ -8,5 +11,14 @@ router = APIRouter(tags=["health"])
 
 @router.get("/health")
 async def health():
-    return {"status": "ok"}
+    """Liveness plus readiness details; `ready` is false while warmup is running."""
+    return {"status": "ok", **readiness()}
+
 
+@router.get("/health/ready")
+async def health_ready():
+    """Readiness probe: 200 once warmup (if enabled) has finished, 503 before."""
+    state = readiness()
+    if not state["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "starting", **state})
+    return {"status": "ready", **state}
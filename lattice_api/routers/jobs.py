@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
+
+from lattice_api.models import JobStatus
+from lattice_api.services.workflows import FINISHED_STATES, get_job_queue, job_status
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+# How often an event stream re-reads the job (the store may live in another process)
+EVENTS_POLL_SECONDS = 0.25
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
+
+def _get_job(job_id: str) -> dict:
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired job id.")
+    return job
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Current status of a job submitted to /api/jobs/scene or /api/jobs/export.
+
+    Errors:
+    - 404: unknown job, or finished longer ago than LATTICE_JOB_TTL
+    """
+    return job_status(_get_job(job_id))
+
+
+async def _job_events(job_id: str) -> AsyncIterator[bytes]:
+    jobs = get_job_queue()
+    last_state = None
+    idle = 0.0
+    while True:
+        job = jobs.get(job_id)
+        if job is None:
+            yield b"event: expired\ndata: {}\n\n"
+            return
+        if job["state"] != last_state:
+            last_state = job["state"]
+            idle = 0.0
+            yield f"event: {last_state}\ndata: {json.dumps(job_status(job))}\n\n".encode("utf-8")
+            if last_state in FINISHED_STATES:
+                return
+        elif idle >= EVENTS_KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield b": keepalive\n\n"
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+        idle += EVENTS_POLL_SECONDS
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one event per state change (`queued`, `running`, `done`,
+    `failed`) carrying the JobStatus as data; the stream ends when the job finishes.
+
+    Errors:
+    - 404: unknown or expired job
+    """
+    _get_job(job_id)
+    return StreamingResponse(
+        _job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/{job_id}/result")
+async def job_result(job_id: str):
+    """Result of a finished job, as the synchronous endpoint would have returned it.
+
+    Errors:
+    - 404: unknown or expired job
+    - 409: job still queued or running
+    - the job's own status and detail if it failed
+    """
+    job = _get_job(job_id)
+    if job["state"] == "failed":
+        raise HTTPException(status_code=job["status_code"] or 500, detail=job["error"])
+    if job["state"] != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job['state']}.")
+    payload = get_job_queue().result(job_id)
+    if payload is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown or expired job id.")
+    headers = {}
+    if job["filename"]:
+        headers["Content-Disposition"] = f"attachment; filename=\"{job['filename']}\""
+    return Response(content=payload, media_type=job["media_type"], headers=headers)
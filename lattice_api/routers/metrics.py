@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from lattice_api.services.cache import get_scene_cache
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import REGISTRY, Gauge
+from lattice_api.services.workflows import get_job_queue
+
+
+router = APIRouter(tags=["metrics"])
+
+REGISTRY.register(
+    Gauge("lattice_executor_pending", "Tasks queued or running in the executor.", lambda: get_executor().pending)
+)
+REGISTRY.register(
+    Gauge("lattice_jobs_waiting", "Jobs queued and not yet running.", lambda: get_job_queue().waiting)
+)
+REGISTRY.register(
+    Gauge(
+        "lattice_scene_cache_bytes",
+        "Bytes held by the in-memory scene cache.",
+        lambda: get_scene_cache().memory.stats()["bytes"],
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "lattice_scene_cache_entries",
+        "Entries in the in-memory scene cache.",
+        lambda: get_scene_cache().memory.stats()["entries"],
+    )
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, stage, size and pool metrics.
+
+    Metrics are per process; with several server processes, scrape each one.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,56 +1,679 @@
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import functools
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, UploadFile, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from lattice_api.models import SceneResponse
-from lattice_api.services.cif import ensure_cif_extension, ensure_size_limit, parse_cif_bytes
-from lattice_api.services.scene import structure_to_scene_dict
+from lattice_api.models import (
+    BondStrategyLiteral,
+    JobPriorityLiteral,
+    JobStatus,
+    LodLiteral,
+    RadiusStrategyLiteral,
+    SceneBondsResponse,
+    SceneRenderRequest,
+    SceneResponse,
+)
+from lattice_api.services.cache import (
+    cif_content_id,
+    get_graph_cache,
+    get_scene_cache,
+    get_structure_store,
+    scene_cache_key,
+)
+from lattice_api.services.cif import (
+    MAX_BATCH_ITEMS,
+    ensure_cif_extension,
+    ensure_size_limit,
+    cif_block_spans,
+    expand_batch_upload,
+    iter_cif_blocks,
+    read_upload,
+    select_cif_block,
+)
+from lattice_api.services.conditional import matching_etag, negotiated_response, not_modified
+from lattice_api.services.dedup import canonical_id, cif_dedup_candidate, dedup_enabled
+from lattice_api.services.encoding import SCENE_BINARY_MEDIA_TYPE, wants_binary_scene
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import finish_request, record, timed_call
+from lattice_api.services.lod import default_primitive_budget
+from lattice_api.services.scene import (
+    build_bonds_payload,
+    build_scene_payload,
+    build_scene_payload_with_edges,
+)
+from lattice_api.services.supercell import diagonal, parse_supercell, supercell_spec
+from lattice_api.services.workflows import get_job_queue, job_status
 
 router = APIRouter(prefix="/api", tags=["scene"])
 
 
-@router.post("/scene", response_model=SceneResponse)
+def _scene_options(
+    data: bytes,
+    *,
+    radius_strategy: str,
+    bond_strategy: str,
+    lod: str,
+    primitive_budget: Optional[int],
+    supercell: Optional[str],
+    block: Optional[str],
+    encoding: str,
+) -> Tuple[bytes, Dict[str, Any]]:
+    """Validate /api/scene form options; return (CIF bytes to render, build_scene_payload kwargs).
+
+    Selects the requested data block and keeps it in the structure store under its
+    `scene_id` for follow-up requests (re-render, deferred bonds).
+    """
+    matrix = parse_supercell(supercell)
+    if block is not None and block.strip():
+        _, data = select_cif_block(data, block)
+    if lod == "auto" and primitive_budget is None:
+        primitive_budget = default_primitive_budget()
+    elif lod != "auto":
+        primitive_budget = None
+    get_structure_store().put(cif_content_id(data), data)
+    options = {
+        "radius_strategy": radius_strategy,
+        "bond_strategy": bond_strategy,
+        "lod": lod,
+        "primitive_budget": primitive_budget,
+        "supercell": matrix,
+        "axes": None,
+        "encoding": encoding,
+    }
+    return data, options
+
+
+def _scene_key(data: bytes, options: Dict[str, Any], *, structure: Optional[str] = None) -> str:
+    """Scene cache key of an upload, or with `structure` (a dedup representative id,
+    see services/dedup.py) of any upload equivalent to it."""
+    return scene_cache_key(
+        data if structure is None else b"",
+        structure=structure,
+        radius_strategy=options["radius_strategy"],
+        bond_strategy=options["bond_strategy"],
+        lod=None if options["lod"] == "full" else options["lod"],
+        primitive_budget=options["primitive_budget"],
+        supercell=supercell_spec(options["supercell"]),
+        axes=json.dumps(options["axes"], sort_keys=True) if options["axes"] else None,
+        encoding=options["encoding"],
+    )
+
+
+def _scene_response(
+    payload: bytes,
+    key: str,
+    *,
+    media_type: str,
+    accept_encoding: Optional[str],
+    headers: Dict[str, str],
+    stages: Dict[str, Any],
+) -> Response:
+    """Scene payload with its ETag, compressed as negotiated; times the "compress" stage."""
+    t0 = time.perf_counter()
+    response = negotiated_response(
+        payload,
+        key=key,
+        media_type=media_type,
+        accept_encoding=accept_encoding,
+        headers=headers,
+    )
+    stages["timings"]["compress"] = time.perf_counter() - t0
+    return response
+
+
+def _edges_key(data: bytes, options: Dict[str, Any]) -> str:
+    """Graph cache key of the bond graph a render of this CIF uses: diagonal
+    supercells bond the unit cell, other matrices the built supercell."""
+    supercell = options["supercell"] if diagonal(options["supercell"]) is None else None
+    spec = f"edges|{cif_content_id(data)}|{options['bond_strategy']}|{json.dumps(supercell)}"
+    return hashlib.sha256(spec.encode("utf-8")).hexdigest()
+
+
+async def _render(data: bytes, options: Dict[str, Any]) -> Tuple[bytes, Dict[str, Any]]:
+    """build_scene_payload in the pool, keeping the bond graph edges in this process.
+
+    Pool workers each have their own graph cache, so the edges a worker returns are
+    kept here (by CIF content and bond strategy) and sent back with the next render
+    of the same upload, whichever worker it lands on.
+    """
+    graph_cache = get_graph_cache()
+    key = _edges_key(data, options)
+    edges = graph_cache.get(key)
+    (payload, new_edges), stages = await get_executor().run(
+        timed_call, build_scene_payload_with_edges, data, edges=edges, **options
+    )
+    if new_edges is not None:
+        graph_cache.put(key, new_edges)
+    return payload, stages
+
+
+def _with_scene_id(entry: bytes, scene_id: str) -> bytes:
+    """Payload of a dedup cache entry (the id it was rendered under, then the
+    payload) with its `scene_id` replaced by the upload's own.
+
+    Both ids are 64 hex digits, so the binary encoding's offsets stay valid.
+    """
+    rendered_id, payload = entry[:64], entry[64:]
+    return payload.replace(rendered_id, scene_id.encode("ascii"), 1)
+
+
+@router.post(
+    "/scene",
+    response_model=SceneResponse,
+    responses={200: {"content": {SCENE_BINARY_MEDIA_TYPE: {}}}},
+)
 async def create_scene(
     file: UploadFile = File(...),
+    radius_strategy: RadiusStrategyLiteral = Form("uniform"),
+    bond_strategy: BondStrategyLiteral = Form("minimum_distance"),
+    lod: LodLiteral = Form("full"),
+    primitive_budget: Optional[int] = Form(None, ge=1),
+    supercell: Optional[str] = Form(None),
+    block: Optional[str] = Form(None),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
 ) -> SceneResponse:
     """Accept a .cif file (<=10MB), parse it, and return a Scene JSON.
 
+    With `Accept: application/x-lattice-scene` the same response is returned in
+    the binary typed-array encoding instead (see services/encoding.py).
+
+    `lod` trades detail for size on large structures (see services/lod.py):
+    `reduced` drops image atoms and batches primitives, `atoms` also defers bonds
+    to `GET /api/scene/{scene_id}/bonds`, and `auto` picks a level from
+    `primitive_budget` (default LATTICE_SCENE_PRIMITIVE_BUDGET).
+
+    `supercell` ("2x2x2", "2,2,2" or nine integers for a 3x3 matrix) renders a
+    supercell instead of the unit cell. Positive diagonal supercells are tiled from the
+    unit cell's geometry at the "reduced" level (or "atoms"; see services/supercell.py).
+
+    `block` picks one data block of a multi-block CIF by index or name (default:
+    the first block with a structure); other blocks are not parsed. Use
+    `/api/scene/blocks` to render all of them.
+
+    Responses are cached by content hash of the CIF plus render options; the
+    `X-Scene-Cache` header reports HIT or MISS. On a miss, an upload equivalent
+    to one already rendered (same structure, other atom order or setting) gets
+    that scene, with `X-Scene-Dedup: HIT` and its own `scene_id` (see
+    services/dedup.py; not for supercells or lod=atoms/auto). With
+    LATTICE_SERVER_TIMING=1 a `Server-Timing` header lists the per-stage durations.
+
+    The `ETag` is derived from the same hash: `If-None-Match` with it gets a 304
+    without any rendering. Bodies are compressed with zstd, br or gzip as
+    `Accept-Encoding` allows (see services/conditional.py).
+
     Errors:
-    - 400: not a .cif
+    - 400: not a .cif, an invalid supercell, or no such block
     - 413: file too large
     - 422: parse failure
     """
+    started = time.perf_counter()
+    stages = {"timings": {}, "values": {}}
+    try:
+        ensure_cif_extension(file.filename)
+
+        t0 = time.perf_counter()
+        data = await read_upload(file)
+        stages["timings"]["read"] = time.perf_counter() - t0
+
+        encoding = "binary" if wants_binary_scene(accept) else "json"
+        media_type = SCENE_BINARY_MEDIA_TYPE if encoding == "binary" else "application/json"
+        data, options = _scene_options(
+            data,
+            radius_strategy=radius_strategy,
+            bond_strategy=bond_strategy,
+            lod=lod,
+            primitive_budget=primitive_budget,
+            supercell=supercell,
+            block=block,
+            encoding=encoding,
+        )
+
+        cache = get_scene_cache()
+        t0 = time.perf_counter()
+        key = _scene_key(data, options)
+        tag = matching_etag(if_none_match, key)
+        if tag is not None:
+            finish_request("scene", "not_modified", stages, started)
+            return not_modified(tag, {"Vary": "Accept"})
+        cached = cache.get(key)
+        stages["timings"]["cache"] = time.perf_counter() - t0
+        send = functools.partial(
+            _scene_response, key=key, media_type=media_type, accept_encoding=accept_encoding, stages=stages
+        )
+        if cached is not None:
+            response = send(cached, headers={"X-Scene-Cache": "HIT", "Vary": "Accept"})
+            response.headers.update(finish_request("scene", "hit", stages, started, len(cached)))
+            return response
+
+        dedup_key = None
+        # Supercell matrices depend on the cell setting, so only plain scenes are shared;
+        # bonds deferred by lod=atoms (or auto) must line up with the atoms served
+        if options["supercell"] is None and options["lod"] in ("full", "reduced") and dedup_enabled():
+            t0 = time.perf_counter()
+            canonical = await canonical_id(await get_executor().run(cif_dedup_candidate, data))
+            if canonical is not None:
+                dedup_key = _scene_key(data, options, structure=canonical)
+                cached = cache.get(dedup_key)
+            stages["timings"]["dedup"] = time.perf_counter() - t0
+            if cached is not None:
+                cached = _with_scene_id(cached, cif_content_id(data))
+                cache.put(key, cached)
+                headers = {"X-Scene-Cache": "HIT", "X-Scene-Dedup": "HIT", "Vary": "Accept"}
+                response = send(cached, headers=headers)
+                response.headers.update(finish_request("scene", "dedup", stages, started, len(cached)))
+                return response
+
+        payload, worker_stages = await _render(data, options)
+    except HTTPException:
+        finish_request("scene", "error", stages, started)
+        raise
+    cache.put(key, payload)
+    if dedup_key is not None:
+        cache.put(dedup_key, cif_content_id(data).encode("ascii") + payload)
+    stages["timings"].update(worker_stages["timings"])
+    stages["values"].update(worker_stages["values"])
+    response = send(payload, headers={"X-Scene-Cache": "MISS", "Vary": "Accept"})
+    response.headers.update(finish_request("scene", "miss", stages, started, len(payload)))
+    return response
+
+
+@router.post(
+    "/scene/render",
+    response_model=SceneResponse,
+    responses={200: {"content": {SCENE_BINARY_MEDIA_TYPE: {}}}},
+)
+async def rerender_scene(
+    req: SceneRenderRequest,
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+) -> SceneResponse:
+    """Render a structure already uploaded to /api/scene again with other options.
+
+    Takes the `scene_id` of an earlier response (or the CIF text in `cif`) plus
+    the /api/scene render options and `axes` overrides of the CT_AXES_* settings.
+    The bond graph edges are kept by this process (see _render), so switching the
+    radius scheme, level of detail or axes only re-parses the CIF and re-runs the
+    legend and scene stages, on any pool worker; `X-Graph-Cache` reports whether
+    the graph was reused. Results share
+    the scene cache (`X-Scene-Cache`), ETags and compression with /api/scene.
+
+    Errors:
+    - 400: neither scene_id nor cif, or an invalid supercell
+    - 404: unknown or expired scene_id (upload the CIF again)
+    - 413: CIF text too large
+    - 422: parse failure
+    """
+    started = time.perf_counter()
+    stages = {"timings": {}, "values": {}}
+    try:
+        if req.scene_id:
+            data = get_structure_store().get(req.scene_id)
+            if data is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Unknown or expired scene_id; render the scene again.",
+                )
+        elif req.cif:
+            data = req.cif.encode("utf-8")
+            ensure_size_limit(len(data))
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="One of 'scene_id' or 'cif' is required."
+            )
+
+        encoding = "binary" if wants_binary_scene(accept) else "json"
+        media_type = SCENE_BINARY_MEDIA_TYPE if encoding == "binary" else "application/json"
+        data, options = _scene_options(
+            data,
+            radius_strategy=req.radius_strategy,
+            bond_strategy=req.bond_strategy,
+            lod=req.lod,
+            primitive_budget=req.primitive_budget,
+            supercell=req.supercell,
+            block=None,
+            encoding=encoding,
+        )
+        if req.axes is not None:
+            options["axes"] = req.axes.model_dump(exclude_none=True) or None
+
+        cache = get_scene_cache()
+        key = _scene_key(data, options)
+        tag = matching_etag(if_none_match, key)
+        if tag is not None:
+            finish_request("scene_render", "not_modified", stages, started)
+            return not_modified(tag, {"Vary": "Accept"})
+        cached = cache.get(key)
+        send = functools.partial(
+            _scene_response, key=key, media_type=media_type, accept_encoding=accept_encoding, stages=stages
+        )
+        if cached is not None:
+            response = send(cached, headers={"X-Scene-Cache": "HIT", "Vary": "Accept"})
+            response.headers.update(finish_request("scene_render", "hit", stages, started, len(cached)))
+            return response
+
+        payload, worker_stages = await _render(data, options)
+    except HTTPException:
+        finish_request("scene_render", "error", stages, started)
+        raise
+    cache.put(key, payload)
+    stages["timings"].update(worker_stages["timings"])
+    stages["values"].update(worker_stages["values"])
+    headers = {"X-Scene-Cache": "MISS", "Vary": "Accept"}
+    graph_cache = stages["values"].get("graph_cache")
+    if graph_cache is not None:
+        headers["X-Graph-Cache"] = graph_cache.upper()
+    response = send(payload, headers=headers)
+    response.headers.update(finish_request("scene_render", "miss", stages, started, len(payload)))
+    return response
+
+
+@router.post("/jobs/scene", status_code=202, response_model=JobStatus, tags=["jobs"])
+async def submit_scene_job(
+    file: UploadFile = File(...),
+    radius_strategy: RadiusStrategyLiteral = Form("uniform"),
+    bond_strategy: BondStrategyLiteral = Form("minimum_distance"),
+    lod: LodLiteral = Form("full"),
+    primitive_budget: Optional[int] = Form(None, ge=1),
+    supercell: Optional[str] = Form(None),
+    block: Optional[str] = Form(None),
+    priority: JobPriorityLiteral = Form("normal"),
+    accept: Optional[str] = Header(default=None),
+) -> JobStatus:
+    """Queue an /api/scene render as a background job (see services/workflows.py).
+
+    Takes the same fields as /api/scene plus `priority`. The job result
+    (`GET /api/jobs/{id}/result`) is the /api/scene response body, in the
+    encoding selected by `Accept` here. Cached scenes complete immediately.
+
+    Errors:
+    - 400/413: as for /api/scene
+    - 503: job queue full (Retry-After)
+    """
     ensure_cif_extension(file.filename)
+    data = await read_upload(file)
+    encoding = "binary" if wants_binary_scene(accept) else "json"
+    media_type = SCENE_BINARY_MEDIA_TYPE if encoding == "binary" else "application/json"
+    data, options = _scene_options(
+        data,
+        radius_strategy=radius_strategy,
+        bond_strategy=bond_strategy,
+        lod=lod,
+        primitive_budget=primitive_budget,
+        supercell=supercell,
+        block=block,
+        encoding=encoding,
+    )
+    cache = get_scene_cache()
+    key = _scene_key(data, options)
+    cached = cache.get(key)
+    jobs = get_job_queue()
+    if cached is not None:
+        job = jobs.complete("scene", cached, media_type, priority=priority)
+    else:
+        job = jobs.submit(
+            "scene",
+            build_scene_payload,
+            data,
+            priority=priority,
+            media_type=media_type,
+            on_done=functools.partial(cache.put, key),
+            **options,
+        )
+    status_doc = job_status(job)
+    return JSONResponse(status_doc, status_code=202, headers={"Location": status_doc["links"]["self"]})
 
-    data = await file.read()
-    ensure_size_limit(len(data))
 
-    structure = parse_cif_bytes(data)
+@router.get(
+    "/scene/{scene_id}/bonds",
+    response_model=SceneBondsResponse,
+    responses={200: {"content": {SCENE_BINARY_MEDIA_TYPE: {}}}},
+)
+async def scene_bonds(
+    scene_id: str,
+    bond_strategy: BondStrategyLiteral = Query("minimum_distance"),
+    supercell: Optional[str] = Query(None),
+    accept: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+) -> SceneBondsResponse:
+    """Bonds group for a scene rendered with lod=atoms (or auto resolving to atoms).
 
-    scene_dict = structure_to_scene_dict(structure)
+    Pass the same `supercell` as the scene request to get the tiled bonds. ETags
+    and compression work as for /api/scene.
 
-    lattice = structure.lattice
-    lattice_dict: Dict[str, float] = {
-        "a": float(lattice.a),
-        "b": float(lattice.b),
-        "c": float(lattice.c),
-        "alpha": float(lattice.alpha),
-        "beta": float(lattice.beta),
-        "gamma": float(lattice.gamma),
-        "volume": float(lattice.volume),
-    }
+    Errors:
+    - 400: invalid supercell
+    - 404: unknown or expired scene_id (upload the CIF again)
+    """
+    matrix = parse_supercell(supercell)
+    data = get_structure_store().get(scene_id)
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Unknown or expired scene_id; render the scene again.",
+        )
+    encoding = "binary" if wants_binary_scene(accept) else "json"
+    media_type = SCENE_BINARY_MEDIA_TYPE if encoding == "binary" else "application/json"
+
+    cache = get_scene_cache()
+    key = scene_cache_key(
+        data,
+        kind="bonds",
+        bond_strategy=bond_strategy,
+        supercell=supercell_spec(matrix),
+        encoding=encoding,
+    )
+    tag = matching_etag(if_none_match, key)
+    if tag is not None:
+        return not_modified(tag, {"Vary": "Accept"})
+    payload = cache.get(key)
+    if payload is None:
+        payload, stages = await get_executor().run(
+            timed_call,
+            build_bonds_payload,
+            data,
+            bond_strategy=bond_strategy,
+            supercell=matrix,
+            encoding=encoding,
+        )
+        record("scene_bonds", stages)
+        cache.put(key, payload)
+    return negotiated_response(
+        payload,
+        key=key,
+        media_type=media_type,
+        accept_encoding=accept_encoding,
+        headers={"Vary": "Accept"},
+    )
+
+
+@router.get("/scene/cache")
+async def scene_cache_stats():
+    """Hit/miss counters and occupancy of the scene cache."""
+    return get_scene_cache().stats()
 
+
+async def _render_batch_item(
+    index: int,
+    name: str,
+    data: Union[bytes, Callable[[], bytes]],
+    *,
+    radius_strategy: str,
+    bond_strategy: str,
+    name_field: str = "filename",
+    pipeline: str = "scene_batch",
+) -> bytes:
+    """Render one batch item and return its NDJSON line (errors included).
+
+    Items are uploaded files (`name_field="filename"`, extension checked) or data
+    blocks of one CIF (`name_field="block"`). `data` may be a loader from
+    expand_batch_upload, called (off the event loop) only now.
+    """
+    head = {"index": index, name_field: name}
     try:
-        formula = structure.composition.reduced_formula
-    except Exception:
-        formula = str(getattr(structure, "formula", ""))
+        if name_field == "filename":
+            ensure_cif_extension(name)
+        if callable(data):
+            data = await asyncio.to_thread(data)
+        ensure_size_limit(len(data))
+        cache = get_scene_cache()
+        key = scene_cache_key(
+            data, radius_strategy=radius_strategy, bond_strategy=bond_strategy, encoding="json"
+        )
+        payload = cache.get(key)
+        if payload is None:
+            payload, stages = await get_executor().run(
+                timed_call,
+                build_scene_payload,
+                data,
+                wait=True,
+                radius_strategy=radius_strategy,
+                bond_strategy=bond_strategy,
+            )
+            record(pipeline, stages)
+            cache.put(key, payload)
+    except HTTPException as exc:
+        line = dict(head, status=exc.status_code, error=exc.detail)
+        return json.dumps(line).encode("utf-8") + b"\n"
+    # Splice the cached JSON in as-is rather than parsing and re-serializing it
+    prefix = json.dumps(dict(head, status=200))[:-1].encode("utf-8")
+    return prefix + b', "result": ' + payload + b"}\n"
+
+
+_LINE_INDEX = re.compile(rb'^\{"index": (\d+)')
+
+
+def _line_index(line: bytes) -> int:
+    """Item index of an NDJSON line from _render_batch_item, without parsing the payload."""
+    return int(_LINE_INDEX.match(line).group(1))
+
+
+async def _stream_batch(
+    items: Iterable[Tuple[str, Union[bytes, Callable[[], bytes]]]], *, radius_strategy: str, bond_strategy: str, **item_options: str
+) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines in completion order, keeping the pool busy but not flooded.
+
+    `items` is consumed lazily, as slots in the window free up.
+    """
+    window = get_executor().max_workers * 2
+    queue = iter(enumerate(items))
+    running: set = set()
+
+    def refill() -> None:
+        for index, (name, data) in queue:
+            running.add(
+                asyncio.ensure_future(
+                    _render_batch_item(
+                        index,
+                        name,
+                        data,
+                        radius_strategy=radius_strategy,
+                        bond_strategy=bond_strategy,
+                        **item_options,
+                    )
+                )
+            )
+            if len(running) >= window:
+                return
+
+    refill()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.discard(task)
+                yield task.result()
+            refill()
+    finally:
+        # Client went away: drop work that has not started yet
+        for task in running:
+            task.cancel()
+
+
+@router.post("/scene/batch")
+async def create_scene_batch(
+    files: List[UploadFile] = File(...),
+    radius_strategy: RadiusStrategyLiteral = Form("uniform"),
+    bond_strategy: BondStrategyLiteral = Form("minimum_distance"),
+):
+    """Render many CIFs (multiple files and/or .zip archives of .cif files).
+
+    Streams one JSON object per line (application/x-ndjson) in completion order:
+    `{"index", "filename", "status": 200, "result": SceneResponse}` or
+    `{"index", "filename", "status": <4xx/5xx>, "error": ...}`. `index` is the item's
+    position in upload order (zip members expanded in archive order).
+
+    Items are read lazily, a window at a time, as the pool renders them (zip
+    members are inflated one by one). A file or member over the size limit, a
+    corrupt member or an unreadable archive gets an error line of its own.
+
+    Errors:
+    - 413: more than MAX_BATCH_ITEMS items, or a body (or zip) over MAX_BATCH_UPLOAD_SIZE
+    """
+    # The upload files stay open until the streamed response has been sent
+    items: List[Tuple[str, Callable[[], bytes]]] = []
+    for upload in files:
+        items.extend(expand_batch_upload(upload.filename, upload.file))
+        if len(items) > MAX_BATCH_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Too many items in batch. Max {MAX_BATCH_ITEMS}.",
+            )
+
+    return StreamingResponse(
+        _stream_batch(items, radius_strategy=radius_strategy, bond_strategy=bond_strategy),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.post("/scene/blocks")
+async def create_scene_blocks(
+    file: UploadFile = File(...),
+    radius_strategy: RadiusStrategyLiteral = Form("uniform"),
+    bond_strategy: BondStrategyLiteral = Form("minimum_distance"),
+    accept: Optional[str] = Header(default=None),
+):
+    """Render every data block of a multi-block CIF, in parallel.
+
+    Blocks are split off lazily and rendered by the worker pool like batch items.
+    The response streams one JSON object per line (application/x-ndjson) in
+    completion order: `{"index", "block", "status": 200, "result": SceneResponse}`
+    or `{"index", "block", "status", "error"}`. With `Accept: application/json`
+    the same objects are returned as a JSON list in block order instead.
+
+    Errors:
+    - 400: not a .cif
+    - 413: file too large, or more blocks than the batch limit
+    """
+    ensure_cif_extension(file.filename)
+    data = await read_upload(file)
+    n_blocks = sum(1 for _ in cif_block_spans(data))
+    if n_blocks > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many data blocks. Max {MAX_BATCH_ITEMS}.",
+        )
 
-    return SceneResponse(
-        scene=scene_dict,
-        formula=formula,
-        lattice=lattice_dict,
-        n_sites=int(structure.num_sites),
-        source="upload",
+    lines = _stream_batch(
+        iter_cif_blocks(data),
+        radius_strategy=radius_strategy,
+        bond_strategy=bond_strategy,
+        name_field="block",
+        pipeline="scene_blocks",
     )
+    if accept and "application/json" in accept and "ndjson" not in accept:
+        parts = [(_line_index(line), line.rstrip(b"\n")) async for line in lines]
+        body = b"[" + b",".join(line for _, line in sorted(parts)) + b"]"
+        return Response(content=body, media_type="application/json")
+    return StreamingResponse(lines, media_type="application/x-ndjson")
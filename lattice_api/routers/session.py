@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple, get_args
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+
+from lattice_api.models import RadiusStrategyLiteral
+from lattice_api.services.cache import cif_content_id, get_structure_store
+from lattice_api.services.cif import ensure_size_limit, parse_cif_bytes
+from lattice_api.services.metrics import finish_request
+from lattice_api.services.session import EditError, EditSession, max_sessions, session_idle_timeout
+
+router = APIRouter(prefix="/api", tags=["scene"])
+
+_active = 0
+
+
+def _error(status_code: int, detail: str, ref: Any = None) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"type": "error", "status": status_code, "detail": detail}
+    if ref is not None:
+        message["ref"] = ref
+    return message
+
+
+def _open_session(message: Dict[str, Any]) -> Tuple[EditSession, Dict[str, Any]]:
+    """Parse the structure named by an "open" message; return (session, scene message)."""
+    radius_strategy = message.get("radius_strategy", "uniform")
+    if radius_strategy not in get_args(RadiusStrategyLiteral):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown radius_strategy '{radius_strategy}'.",
+        )
+    if message.get("scene_id"):
+        data = get_structure_store().get(message["scene_id"])
+        if data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Unknown or expired scene_id; render the scene again.",
+            )
+    elif message.get("cif"):
+        data = str(message["cif"]).encode("utf-8")
+        ensure_size_limit(len(data))
+        get_structure_store().put(cif_content_id(data), data)
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="One of 'scene_id' or 'cif' is required.")
+    try:
+        session = EditSession(parse_cif_bytes(data), radius_strategy)
+    except EditError as exc:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+    reply = {"type": "scene", **session.summary(), "scene_id": cif_content_id(data), "scene": session.scene()}
+    return session, reply
+
+
+@router.websocket("/scene/session")
+async def scene_session(websocket: WebSocket) -> None:
+    """Edit a structure interactively and receive scene patches.
+
+    Messages are JSON. The client opens the session with
+    `{"type": "open", "scene_id": ...}` (or `"cif"` with the CIF text, and an
+    optional `radius_strategy`) and gets `{"type": "scene", "version": 0,
+    "scene": ...}`: the "reduced" scene with an `id` on every atom and half-bond.
+    Then each `{"type": "edit", "op": ..., "ref": ...}` is answered with a
+    `{"type": "patch"}` listing `removed` ids and `added` and `changed`
+    primitives (see services/session.py for the ops). Bonds are only searched
+    around the sites an edit touches.
+
+    Errors come as `{"type": "error", "status", "detail"}` and leave the session
+    open: 400 invalid message or edit, 404 unknown scene_id, 413 structure too
+    large, 422 parse failure. An unexpected failure is answered with 500 and
+    the socket stays open, but an edit that fails this way drops the session,
+    which must be opened again. The socket is closed with 1013 when the server has
+    LATTICE_SESSION_MAX sessions open, and with 1000 after
+    LATTICE_SESSION_IDLE_TIMEOUT seconds without a message.
+    """
+    global _active
+    await websocket.accept()
+    if _active >= max_sessions():
+        await websocket.close(code=1013, reason="Too many editing sessions")
+        return
+    _active += 1
+    session: Optional[EditSession] = None
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=session_idle_timeout())
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="Idle timeout")
+                return
+            except (ValueError, KeyError):
+                await websocket.send_json(_error(400, "Messages must be JSON objects."))
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json(_error(400, "Messages must be JSON objects."))
+                continue
+
+            started = time.perf_counter()
+            stages: Dict[str, Any] = {"timings": {}, "values": {}}
+            kind = message.get("type")
+            ref = message.get("ref")
+            try:
+                if kind == "open":
+                    # Session state lives in this process, so parse and edit in a thread
+                    session, reply = await asyncio.to_thread(_open_session, message)
+                elif kind == "edit":
+                    if session is None:
+                        raise HTTPException(status_code=400, detail="Open a session first.")
+                    try:
+                        reply = await asyncio.to_thread(session.apply, message)
+                    except EditError as exc:
+                        raise HTTPException(status_code=400, detail=str(exc))
+                else:
+                    raise HTTPException(status_code=400, detail=f"Unknown message type '{kind}'.")
+            except HTTPException as exc:
+                finish_request("scene_session", "error", stages, started)
+                await websocket.send_json(_error(exc.status_code, exc.detail, ref))
+                continue
+            except Exception as exc:
+                # A bug, not a bad edit: the session state may be half-updated, so drop it
+                finish_request("scene_session", "error", stages, started)
+                if kind == "edit":
+                    session = None
+                detail = f"Internal error: {exc}. Open the session again."
+                await websocket.send_json(_error(500, detail, ref))
+                continue
+            if ref is not None:
+                reply["ref"] = ref
+            stages["values"]["n_sites"] = reply["n_sites"]
+            finish_request("scene_session", kind, stages, started)
+            await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _active -= 1
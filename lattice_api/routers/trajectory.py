@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, Header, HTTPException, UploadFile
+from fastapi.responses import Response
+
+from lattice_api.models import BondStrategyLiteral, RadiusStrategyLiteral, TrajectoryResponse
+from lattice_api.services.cache import get_scene_cache, scene_cache_key
+from lattice_api.services.cif import read_upload
+from lattice_api.services.encoding import SCENE_BINARY_MEDIA_TYPE, wants_binary_scene
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import finish_request, timed_call
+from lattice_api.services.trajectory import (
+    build_trajectory_payload,
+    ensure_trajectory_filename,
+    is_xdatcar,
+    rebuild_distance,
+)
+
+router = APIRouter(prefix="/api", tags=["trajectory"])
+
+
+@router.post(
+    "/trajectory",
+    response_model=TrajectoryResponse,
+    responses={200: {"content": {SCENE_BINARY_MEDIA_TYPE: {}}}},
+)
+async def create_trajectory(
+    file: UploadFile = File(...),
+    radius_strategy: RadiusStrategyLiteral = Form("uniform"),
+    bond_strategy: BondStrategyLiteral = Form("minimum_distance"),
+    accept: Optional[str] = Header(default=None),
+) -> TrajectoryResponse:
+    """Accept a multi-block .cif (one frame per data block) or an XDATCAR (<=10MB)
+    and return a template scene, the bond topology and per-frame positions.
+
+    The bond graph is built on the first frame and rebuilt only after atoms have
+    moved far enough to change it (see services/trajectory.py). With
+    `Accept: application/x-lattice-scene` positions come as one float32 array in
+    the binary encoding; JSON carries them as integer deltas.
+
+    Errors:
+    - 400: not a .cif or XDATCAR
+    - 413: file too large, or too many frames
+    - 422: parse failure, or frames with different sites
+    """
+    started = time.perf_counter()
+    stages = {"timings": {}, "values": {}}
+    try:
+        ensure_trajectory_filename(file.filename)
+        t0 = time.perf_counter()
+        data = await read_upload(file)
+        stages["timings"]["read"] = time.perf_counter() - t0
+
+        encoding = "binary" if wants_binary_scene(accept) else "json"
+        media_type = SCENE_BINARY_MEDIA_TYPE if encoding == "binary" else "application/json"
+        filename = "XDATCAR" if is_xdatcar(file.filename) else "trajectory.cif"
+
+        cache = get_scene_cache()
+        key = scene_cache_key(
+            data,
+            kind="trajectory",
+            format=filename,
+            radius_strategy=radius_strategy,
+            bond_strategy=bond_strategy,
+            rebuild_distance=rebuild_distance(),
+            encoding=encoding,
+        )
+        cached = cache.get(key)
+        if cached is not None:
+            headers = {"X-Scene-Cache": "HIT", "Vary": "Accept"}
+            headers.update(finish_request("trajectory", "hit", stages, started, len(cached)))
+            return Response(content=cached, media_type=media_type, headers=headers)
+
+        payload, worker_stages = await get_executor().run(
+            timed_call,
+            build_trajectory_payload,
+            data,
+            filename=filename,
+            radius_strategy=radius_strategy,
+            bond_strategy=bond_strategy,
+            encoding=encoding,
+        )
+    except HTTPException:
+        finish_request("trajectory", "error", stages, started)
+        raise
+    cache.put(key, payload)
+    stages["timings"].update(worker_stages["timings"])
+    stages["values"].update(worker_stages["values"])
+    headers = {"X-Scene-Cache": "MISS", "Vary": "Accept"}
+    headers.update(finish_request("trajectory", "miss", stages, started, len(payload)))
+    return Response(content=payload, media_type=media_type, headers=headers)
@@ -0,0 +1,185 @@
+"""Bond graph construction strategies.
+
+`minimum_distance` is pymatgen's MinimumDistanceNN (one neighbor search per site).
+`cell_list` applies the same rule - a neighbor is bonded when its distance is below
+(1 + tol) x the site's nearest-neighbor distance, searched within `cutoff` - but finds
+all pairs at once with pymatgen's periodic cell-list search and filters them with
+NumPy. The search radius starts small and only grows for sites whose bonding shell
+is not yet covered, so dense structures never materialize 10 A neighbor lists.
+
+`cached_structure_graph` memoizes either strategy by structure fingerprint: only
+the edges are stored (services/cache.py graph cache), and a hit rebuilds the same
+StructureGraph without a neighbor search.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from lattice_api.services.cache import get_graph_cache
+from lattice_api.services.metrics import note
+from lattice_api.services.symmetry import structure_fingerprint
+
+
+BOND_STRATEGIES = ("minimum_distance", "cell_list")
+
+# Initial cell-list search radius (A); covers typical first shells in one pass
+_INITIAL_RADIUS = 4.0
+
+
+def bonding_shells(
+    structure, centers=None, *, tol: float = 0.1, cutoff: float = 10.0, strict: bool = True
+) -> Tuple:
+    """Bonding shells of `centers` (default: all sites) as arrays (center, neighbor,
+    image, distance).
+
+    A neighbor is in a site's shell when its distance is below (1 + tol) x the
+    site's nearest-neighbor distance. Each pair appears once per center that has it
+    in its shell, so bonds found from both ends appear twice.
+
+    Raises ValueError if a site has no neighbor within `cutoff` (as MinimumDistanceNN
+    does); with `strict=False` such sites get an empty shell instead.
+    """
+    import numpy as np
+
+    n = len(structure)
+    centers_all, points_all, images_all, distances_all = [], [], [], []
+
+    pending = np.arange(n) if centers is None else np.unique(np.asarray(centers, dtype=int))
+    radius = min(_INITIAL_RADIUS, cutoff)
+    while pending.size:
+        sites = [structure[int(i)] for i in pending]
+        c, p, img, d = structure.get_neighbor_list(radius, sites=sites)
+        # With a few `sites`, the centers themselves can come back at distance ~0
+        found = d > 1e-8
+        c, p, img, d = pending[c[found]], p[found], np.asarray(img, dtype=int).reshape(-1, 3)[found], d[found]
+
+        dmin = np.full(n, np.inf)
+        np.minimum.at(dmin, c, d)
+        # Complete when the whole bonding shell (1 + tol) x dmin lies inside the radius
+        done = (1 + tol) * dmin[pending] <= radius
+        if radius >= cutoff:
+            if strict and not np.all(np.isfinite(dmin[pending])):
+                raise ValueError(f"No neighbors found within cutoff {cutoff} A for some sites")
+            done[:] = True
+
+        keep = done[np.searchsorted(pending, c)] & (d < (1 + tol) * dmin[c])
+        centers_all.append(c[keep])
+        points_all.append(p[keep])
+        images_all.append(img[keep])
+        distances_all.append(d[keep])
+
+        pending = pending[~done]
+        radius = min(radius * 2, cutoff)
+
+    frm = np.concatenate(centers_all) if centers_all else np.zeros(0, dtype=int)
+    to = np.concatenate(points_all) if points_all else np.zeros(0, dtype=int)
+    images = np.concatenate(images_all) if images_all else np.zeros((0, 3), dtype=int)
+    distances = np.concatenate(distances_all) if distances_all else np.zeros(0)
+    return frm, to, images, distances
+
+
+def cell_list_bonds(structure, *, tol: float = 0.1, cutoff: float = 10.0) -> Tuple:
+    """Return MinimumDistanceNN bonds as arrays (from_index, to_index, to_jimage).
+
+    Edges follow StructureGraph conventions: from_index <= to_index, from_jimage is
+    (0, 0, 0), self-edges have a positive first non-zero image component, and each
+    bond appears once.
+
+    Raises ValueError if a site has no neighbor within `cutoff` (as MinimumDistanceNN does).
+    """
+    import numpy as np
+
+    frm, to, images, _ = bonding_shells(structure, tol=tol, cutoff=cutoff)
+
+    # Canonicalize direction: from_index < to_index, shifting images accordingly
+    swap = to < frm
+    frm, to = np.where(swap, to, frm), np.where(swap, frm, to)
+    images = np.where(swap[:, None], -images, images)
+
+    # Self-edges: first non-zero image component must be positive
+    self_edge = frm == to
+    if np.any(self_edge):
+        nz = images != 0
+        first = np.argmax(nz, axis=1)
+        sign = np.sign(images[np.arange(len(images)), first])
+        flip = self_edge & (sign < 0)
+        images = np.where(flip[:, None], -images, images)
+
+    # Drop duplicates (each bond is found from both ends), keeping first-seen order
+    rows = np.column_stack([frm, to, images])
+    _, first_idx = np.unique(rows, axis=0, return_index=True)
+    first_idx.sort()
+    rows = rows[first_idx]
+    return rows[:, 0], rows[:, 1], rows[:, 2:5]
+
+
+def build_structure_graph(structure, strategy: str = "minimum_distance"):
+    """Build a pymatgen StructureGraph of bonds using the named strategy."""
+    from pymatgen.analysis.graphs import StructureGraph  # type: ignore
+
+    if strategy == "minimum_distance":
+        from pymatgen.analysis.local_env import MinimumDistanceNN  # type: ignore
+
+        return StructureGraph.from_local_env_strategy(structure, MinimumDistanceNN())
+
+    if strategy == "cell_list":
+        frm, to, images = cell_list_bonds(structure)
+        graph = StructureGraph.from_empty_graph(structure, name="bonds")
+        graph.graph.add_edges_from(
+            (int(u), int(v), {"to_jimage": (int(img[0]), int(img[1]), int(img[2]))})
+            for u, v, img in zip(frm, to, images)
+        )
+        return graph
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unknown bond strategy: {strategy}. Choose one of {', '.join(BOND_STRATEGIES)}.",
+    )
+
+
+def _graph_from_edges(structure, edges):
+    from pymatgen.analysis.graphs import StructureGraph  # type: ignore
+
+    graph = StructureGraph.from_empty_graph(structure, name="bonds")
+    graph.graph.add_edges_from(
+        (int(u), int(v), {"to_jimage": (int(a), int(b), int(c))}) for u, v, a, b, c in edges
+    )
+    return graph
+
+
+def graph_edges(graph) -> bytes:
+    """Edges of a StructureGraph as int32 rows (from, to, image a, b, c) in graph order."""
+    import numpy as np
+
+    edges = [(u, v, *image) for u, v, image in graph.graph.edges(data="to_jimage")]
+    return np.array(edges, dtype=np.int32).reshape(-1, 5).tobytes()
+
+
+def cached_structure_graph(
+    structure, strategy: str = "minimum_distance", edges: Optional[bytes] = None
+):
+    """build_structure_graph, memoized by structure fingerprint and strategy.
+
+    Edges are kept as int32 rows (graph_edges), so the rebuilt graph renders
+    exactly like the original. `edges` from an earlier graph_edges of this
+    structure and strategy (e.g. kept by the API process) skip the cache lookup.
+    """
+    import numpy as np
+
+    if edges is not None:
+        note("graph_cache", "hit")
+        return _graph_from_edges(structure, np.frombuffer(edges, dtype=np.int32).reshape(-1, 5))
+    cache = get_graph_cache()
+    key = hashlib.sha256(f"{structure_fingerprint(structure)}|{strategy}".encode("utf-8")).hexdigest()
+    value = cache.get(key)
+    if value is not None:
+        note("graph_cache", "hit")
+        return _graph_from_edges(structure, np.frombuffer(value, dtype=np.int32).reshape(-1, 5))
+    note("graph_cache", "miss")
+    graph = build_structure_graph(structure, strategy)
+    cache.put(key, graph_edges(graph))
+    return graph
@@ -0,0 +1,386 @@
+"""Content-addressed caches for scene generation.
+
+Two tiers are provided:
+- an in-memory LRU bounded by total payload size (per process), and
+- an optional on-disk tier (shared between uvicorn workers, survives restarts).
+
+Env vars:
+- LATTICE_SCENE_CACHE_MAX_BYTES: memory tier budget in bytes (default 128MB, 0 disables).
+- LATTICE_SCENE_CACHE_DIR: directory for the on-disk tier. If unset, disk tier is disabled.
+- LATTICE_SCENE_CACHE_DISK_MAX_BYTES: budget of each on-disk tier (scenes, structures,
+  exports, graphs, dedup buckets) in bytes; oldest entries by mtime are deleted past it
+  (default 1GB, 0 for no limit).
+- LATTICE_STRUCTURE_STORE_MAX_BYTES: memory budget of the uploaded-CIF store (default 64MB).
+- LATTICE_EXPORT_CACHE_MAX_BYTES: memory budget of the export file cache (default 32MB, 0 disables).
+- LATTICE_GRAPH_CACHE_MAX_BYTES: memory budget of the bond graph cache (default 64MB, 0 disables).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+# Bump when the scene payload layout changes so stale disk entries are ignored
+SCENE_CACHE_VERSION = "4"
+
+# Render settings read from the environment by structure_to_scene_dict
+_RENDER_ENV_VARS = (
+    "CT_LEGEND_COLOR_SCHEME",
+    "CT_AXES_MODE",
+    "CT_AXES_SCALE",
+    "CT_AXES_HEAD_LENGTH",
+    "CT_AXES_HEAD_WIDTH",
+    "CT_AXES_RADIUS",
+)
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by entry count and/or total size.
+
+    `sizeof` returns the cost of a value (default: len). A bound of None means
+    unbounded; a bound of 0 disables the cache.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries != 0 and self.max_bytes != 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        size = int(self._sizeof(value))
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+            }
+
+
+class DiskCache:
+    """Flat-file cache: one file per key under `<root>/<key[:2]>/<key>`.
+
+    Writes are atomic (temp file + rename), so concurrent workers never see partial entries.
+    With `max_bytes`, the oldest entries (by mtime, which a hit refreshes) are deleted
+    once the tier grows past it, down to 90% of the budget. Each process counts its
+    own writes and rescans the directory at least every SWEEP_INTERVAL seconds, so
+    the bound holds approximately when several workers write the same tier.
+    """
+
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None) -> None:
+        self.root = root
+        self.max_bytes = max_bytes or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Tier size as of the last scan plus this process's writes since; None until scanned
+        self._bytes: Optional[int] = None
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.max_bytes is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return data
+
+    def put(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(value)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            # Disk tier is best-effort; a failed write only costs a future miss
+            return
+        if self.max_bytes is not None:
+            self._account(len(value))
+
+    def _account(self, size: int) -> None:
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += size
+            stale = time.monotonic() - self._scanned > self.SWEEP_INTERVAL
+            if self._bytes is None or stale or self._bytes > self.max_bytes:
+                self._sweep()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every entry; other tiers' subdirectories are skipped."""
+        entries = []
+        try:
+            shards = [d for d in os.scandir(self.root) if len(d.name) == 2 and d.is_dir()]
+        except OSError:
+            return entries
+        for shard in shards:
+            try:
+                for entry in os.scandir(shard.path):
+                    if entry.name.startswith(".tmp-"):
+                        continue
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                continue
+        return entries
+
+    def _sweep(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                    self.evictions += 1
+                except OSError:
+                    pass  # Already evicted by another worker
+                total -= size
+        self._bytes = total
+        self._scanned = time.monotonic()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def disk_tier_max_bytes() -> int:
+    """Budget of each on-disk cache tier (LATTICE_SCENE_CACHE_DISK_MAX_BYTES; 0 for no limit)."""
+    return int(os.getenv("LATTICE_SCENE_CACHE_DISK_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def normalize_cif_bytes(data: bytes) -> bytes:
+    """Normalize CIF bytes for hashing: drop BOM, unify newlines, strip trailing whitespace."""
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return b"\n".join(line.rstrip() for line in data.strip().split(b"\n"))
+
+
+def cif_content_id(data: bytes) -> str:
+    """Content address of a CIF upload (independent of render options)."""
+    return hashlib.sha256(normalize_cif_bytes(data)).hexdigest()
+
+
+def scene_cache_key(data: bytes, **options: Any) -> str:
+    """Return the content address for a CIF upload rendered with the given options.
+
+    Options left at None are ignored, so adding a new option does not change existing keys.
+    """
+    h = hashlib.sha256()
+    h.update(f"v{SCENE_CACHE_VERSION}\0".encode("utf-8"))
+    for name in sorted(options):
+        if options[name] is not None:
+            h.update(f"{name}={options[name]}\0".encode("utf-8"))
+    for name in _RENDER_ENV_VARS:
+        h.update(f"{name}={os.getenv(name, '')}\0".encode("utf-8"))
+    h.update(normalize_cif_bytes(data))
+    return h.hexdigest()
+
+
+class SceneCache:
+    """Two-tier cache of serialized SceneResponse payloads (JSON bytes)."""
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: Optional[int] = None,
+    ) -> None:
+        self.memory = LRUCache(max_bytes=max_bytes)
+        self.disk = DiskCache(disk_dir, disk_max_bytes) if disk_dir else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: bytes) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        mem = self.memory.stats()
+        disk = self.disk.stats() if self.disk is not None else None
+        hits = mem["hits"] + (disk["hits"] if disk else 0)
+        misses = disk["misses"] if disk else mem["misses"]
+        return {"hits": hits, "misses": misses, "memory": mem, "disk": disk}
+
+
+_scene_cache: Optional[SceneCache] = None
+_scene_cache_lock = threading.Lock()
+
+
+def get_scene_cache() -> SceneCache:
+    """Return the process-wide scene cache, configured from env on first use."""
+    global _scene_cache
+    if _scene_cache is None:
+        with _scene_cache_lock:
+            if _scene_cache is None:
+                max_bytes = int(os.getenv("LATTICE_SCENE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+                disk_dir = os.getenv("LATTICE_SCENE_CACHE_DIR", "").strip() or None
+                _scene_cache = SceneCache(
+                    max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_tier_max_bytes()
+                )
+    return _scene_cache
+
+
+_structure_store: Optional[SceneCache] = None
+
+
+def get_structure_store() -> SceneCache:
+    """Return the process-wide store of uploaded CIF bytes keyed by cif_content_id.
+
+    Backs follow-up requests that refer to an earlier upload (e.g. deferred bonds).
+    Uses the same two-tier layout as the scene cache, under `<cache dir>/structures`.
+    """
+    global _structure_store
+    if _structure_store is None:
+        with _scene_cache_lock:
+            if _structure_store is None:
+                max_bytes = int(os.getenv("LATTICE_STRUCTURE_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+                disk_dir = os.getenv("LATTICE_SCENE_CACHE_DIR", "").strip() or None
+                if disk_dir:
+                    disk_dir = os.path.join(disk_dir, "structures")
+                _structure_store = SceneCache(
+                    max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_tier_max_bytes()
+                )
+    return _structure_store
+
+
+_export_cache: Optional[SceneCache] = None
+
+
+def get_export_cache() -> SceneCache:
+    """Return the process-wide cache of export files for deduplicated structures.
+
+    Keyed by dedup representative and export options (see routers/export.py), under
+    `<cache dir>/exports` on disk.
+    """
+    global _export_cache
+    if _export_cache is None:
+        with _scene_cache_lock:
+            if _export_cache is None:
+                max_bytes = int(os.getenv("LATTICE_EXPORT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+                disk_dir = os.getenv("LATTICE_SCENE_CACHE_DIR", "").strip() or None
+                if disk_dir:
+                    disk_dir = os.path.join(disk_dir, "exports")
+                _export_cache = SceneCache(
+                    max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_tier_max_bytes()
+                )
+    return _export_cache
+
+
+_graph_cache: Optional[SceneCache] = None
+
+
+def get_graph_cache() -> SceneCache:
+    """Return the process-wide cache of bond graph edges keyed by structure and strategy.
+
+    Lets renders that only change display options skip the neighbor search (see
+    services/bonding.py), under `<cache dir>/graphs` on disk. The memory tier is
+    per process; the API process also keeps the edges of rendered uploads here and
+    passes them to the pool on re-render (routers/scene.py `_render`).
+    """
+    global _graph_cache
+    if _graph_cache is None:
+        with _scene_cache_lock:
+            if _graph_cache is None:
+                max_bytes = int(os.getenv("LATTICE_GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+                disk_dir = os.getenv("LATTICE_SCENE_CACHE_DIR", "").strip() or None
+                if disk_dir:
+                    disk_dir = os.path.join(disk_dir, "graphs")
+                _graph_cache = SceneCache(
+                    max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_tier_max_bytes()
+                )
+    return _graph_cache
@@ -1,11 +1,26 @@
 from __future__ import annotations
 
-from io import StringIO
+import functools
+import io
+import itertools
+import re
+import zipfile
+import zlib
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 from fastapi import HTTPException, status
 
+from lattice_api.services.fastcif import fast_cif_enabled, read_p1_cif
+from lattice_api.services.metrics import note, stage
+
 
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_BATCH_ITEMS = 1000
+MAX_BATCH_UPLOAD_SIZE = 256 * 1024 * 1024  # whole /api/scene/batch body, so also any .zip in it
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Same block boundary as pymatgen's CifFile.from_str, matched on the raw bytes
+_BLOCK_HEADER = re.compile(rb"^[ \t]*data_(\S*)", re.MULTILINE)
 
 
 def ensure_cif_extension(filename: str | None) -> None:
@@ -25,23 +40,111 @@ def ensure_cif_extension(filename: str | None) -> None:
         )
 
 
+def upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="File too large. Max 10MB.",
+    )
+
+
 def ensure_size_limit(num_bytes: int) -> None:
     """Enforce 10 MB size limit.
 
     Raises HTTP 413 if exceeded.
     """
     if num_bytes > MAX_UPLOAD_SIZE:
+        raise upload_too_large()
+
+
+async def read_upload(upload) -> bytes:
+    """Read an UploadFile in chunks, enforcing the size limit as bytes arrive.
+
+    Raises HTTP 413 without reading further once the limit is crossed (or up
+    front when the part size is known). Chunks go into a BytesIO whose
+    getvalue() hands over its buffer, so the upload is held once.
+    """
+    if upload.size is not None:
+        ensure_size_limit(upload.size)
+    buf = io.BytesIO()
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        ensure_size_limit(buf.tell() + len(chunk))
+        buf.write(chunk)
+    return buf.getvalue()
+
+
+def cif_block_spans(data: bytes) -> Iterator[Tuple[str, int, int]]:
+    """Yield (name, start, end) byte ranges of the data blocks in a CIF, lazily.
+
+    Only the `data_` header lines are scanned; block contents are not decoded or
+    parsed. Powder-pattern blocks are skipped, as pymatgen does.
+    """
+    matches = _BLOCK_HEADER.finditer(data)
+    current = next(matches, None)
+    while current is not None:
+        following = next(matches, None)
+        name = current.group(1).decode("utf-8", errors="replace")
+        if "powder_pattern" not in name:
+            yield name, current.start(), following.start() if following else len(data)
+        current = following
+
+
+def iter_cif_blocks(data: bytes) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, bytes) for each data block; every item is a standalone CIF."""
+    for name, start, end in cif_block_spans(data):
+        yield name, data[start:end]
+
+
+def select_cif_block(data: bytes, block: str) -> Tuple[str, bytes]:
+    """Return (name, bytes) of one data block, by index ("0", "1", ...) or name.
+
+    Blocks after the selected one are not scanned. Raises HTTP 400 if there is
+    no such block.
+    """
+    key = block.strip()
+    if key.isdigit():
+        found = next(itertools.islice(cif_block_spans(data), int(key), None), None)
+    else:
+        wanted = key[5:] if key.lower().startswith("data_") else key
+        # CIF block names are case-insensitive
+        found = next((span for span in cif_block_spans(data) if span[0].lower() == wanted.lower()), None)
+    if found is None:
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="File too large. Max 10MB.",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CIF block {block!r} not found.",
         )
+    name, start, end = found
+    return name, data[start:end]
 
 
-def parse_cif_bytes(data: bytes):
+def parse_cif_bytes(data: bytes, *, primitive: bool = True):
     """Parse CIF bytes into a pymatgen Structure.
 
+    Returns the structure of the first data block that has one. Multi-block files
+    are parsed block by block, so the blocks after it are never parsed. With
+    `primitive=False` the cell and site order are kept as written.
+
     Raises HTTP 422 on parse failure.
     """
+    spans = list(itertools.islice(cif_block_spans(data), 2))
+    if len(spans) < 2:
+        return _parse_structure(data, primitive)
+    view = memoryview(data)
+    error: Optional[HTTPException] = None
+    for _name, start, end in cif_block_spans(data):
+        try:
+            return _parse_structure(view[start:end], primitive)
+        except HTTPException as exc:
+            if exc.status_code != status.HTTP_422_UNPROCESSABLE_ENTITY:
+                raise
+            error = error or exc
+    assert error is not None
+    raise error
+
+
+def _parse_structure(data: Union[bytes, memoryview], primitive: bool = True):
     try:
         from pymatgen.io.cif import CifParser  # type: ignore
     except Exception as exc:  # pragma: no cover
@@ -50,21 +153,95 @@ def parse_cif_bytes(data: bytes):
             detail=f"pymatgen not available: {exc}",
         ) from exc
 
-    # Try UTF-8 first, then latin-1 as a permissive fallback
-    try:
-        text = data.decode("utf-8")
-    except UnicodeDecodeError:
-        text = data.decode("latin-1", errors="ignore")
+    # Try UTF-8 first, then latin-1 as a permissive fallback. The text goes to
+    # CifParser.from_str directly: a StringIO would hold (and hand back) a second copy.
+    with stage("decode"):
+        try:
+            text = str(data, "utf-8")
+        except UnicodeDecodeError:
+            text = str(data, "latin-1", errors="ignore")
 
     try:
-        parser = CifParser(StringIO(text))
-        structures = parser.get_structures()
-        if not structures:
-            raise ValueError("CIF produced no structures")
-        structure = structures[0]
+        with stage("parse"):
+            # Plain P1 files skip CifParser (services/fastcif.py); None means "not one"
+            structure = read_p1_cif(text, primitive) if fast_cif_enabled() else None
+            if structure is None:
+                structures = CifParser.from_str(text).get_structures(primitive=primitive)
+                if not structures:
+                    raise ValueError("CIF produced no structures")
+                structure = structures[0]
+        note("n_sites", len(structure))
         return structure
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Failed to parse CIF: {exc}",
         ) from exc
+
+
+def _read_capped(fileobj) -> bytes:
+    """Read a file object from the start, stopping one byte past the size limit (HTTP 413)."""
+    fileobj.seek(0)
+    data = fileobj.read(MAX_UPLOAD_SIZE + 1)
+    ensure_size_limit(len(data))
+    return data
+
+
+def _read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # The declared size first, then the inflated bytes themselves (it may lie)
+    ensure_size_limit(info.file_size)
+    try:
+        with zf.open(info) as member:
+            data = member.read(MAX_UPLOAD_SIZE + 1)
+    except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unreadable zip member {info.filename}: {exc}",
+        ) from exc
+    ensure_size_limit(len(data))
+    return data
+
+
+def _raise(exc: HTTPException) -> Callable[[], bytes]:
+    def load() -> bytes:
+        raise exc
+
+    return load
+
+
+def expand_batch_upload(filename: str | None, fileobj) -> List[Tuple[str, Callable[[], bytes]]]:
+    """(name, load) items of one batch upload; nothing is read until `load()` is called.
+
+    A .zip upload gives one item per .cif member (directories and other files are
+    skipped), found from the central directory without inflating anything;
+    anything else is one item. `load()` returns the item's bytes or raises
+    HTTPException for that item alone: 413 over the size limit, 400 for a corrupt
+    member. An unreadable archive becomes a single item whose load raises 400.
+
+    Raises HTTP 413 (for the whole upload) if a .zip is over MAX_BATCH_UPLOAD_SIZE
+    or has more than MAX_BATCH_ITEMS .cif members.
+    """
+    name = filename or ""
+    if not name.lower().endswith(".zip"):
+        return [(name, functools.partial(_read_capped, fileobj))]
+    size = fileobj.seek(0, io.SEEK_END)
+    if size > MAX_BATCH_UPLOAD_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Zip archive {name} too large. Max {MAX_BATCH_UPLOAD_SIZE // (1024 * 1024)}MB.",
+        )
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, EOFError) as exc:
+        error = HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid zip archive {name}: {exc}",
+        )
+        return [(name, _raise(error))]
+    members = [info for info in zf.infolist() if not info.is_dir() and info.filename.lower().endswith(".cif")]
+    if len(members) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many items in batch. Max {MAX_BATCH_ITEMS}.",
+        )
+    return [(info.filename, functools.partial(_read_member, zf, info)) for info in members]
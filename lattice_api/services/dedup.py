@@ -0,0 +1,292 @@
+"""Deduplication of equivalent structures across uploads.
+
+Byte-hash caching misses the same structure written differently (reordered
+atoms, another cell setting, extra comments). The dedup index maps each
+structure to the first equivalent structure it has seen (its representative),
+so work keyed by the representative's id is reused:
+
+- candidates are pruned by a cheap fingerprint: reduced formula, spacegroup
+  number and a bucket of volume per atom. Each fingerprint is a hash bucket of
+  at most LATTICE_DEDUP_MAX_CANDIDATES representatives, and a lookup reads the
+  bucket and its two volume neighbours, so its cost does not grow with the index;
+- representatives are stored as reduced primitive cells, so a lookup reduces only
+  the new structure, and skips candidates whose primitive site count or reduced
+  cell lengths already rule out a match;
+- a candidate is mapped onto the structure with pymatgen's StructureMatcher
+  (without volume scaling) and then accepted only if the two are the same up to
+  rounding: reduced cell parameters within EXACT_LTOL (relative) and every mapped
+  fractional coordinate within EXACT_FTOL. The matcher's own tolerances are far
+  looser and would also pair a slightly strained or displaced structure.
+
+The index is kept by the API process, not by pool workers (each of which would
+otherwise have its own and find a duplicate only when it happened to see the
+original): a worker parses the upload and returns its fingerprint and reduced
+cell (dedup_candidate), the API process reads the buckets and, if a candidate
+survives the cheap checks, has a worker run the matcher (match_candidate).
+
+Buckets live in the same two-tier layout as the scene cache (services/cache.py):
+a memory LRU per process and, with LATTICE_SCENE_CACHE_DIR, one file per bucket
+under `<cache dir>/dedup` shared by all uvicorn workers. Bucket updates hold a
+file lock (`<cache dir>/dedup/.lock`) so concurrent adds are not lost.
+
+Env vars:
+- LATTICE_DEDUP: set to 0 to disable deduplication (default 1).
+- LATTICE_DEDUP_MAX_SITES: larger structures are not deduplicated (default 1000).
+- LATTICE_DEDUP_MAX_CANDIDATES: representatives kept per bucket (default 16).
+- LATTICE_DEDUP_MAX_BYTES: memory budget of the index per process (default 32MB).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: bucket updates are then only locked within a process
+    fcntl = None
+
+from lattice_api.services.cache import SceneCache, disk_tier_max_bytes
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import stage
+from lattice_api.services.symmetry import get_symmetry, structure_fingerprint
+
+
+# Relative width of a volume-per-atom bucket
+VOLUME_BUCKET = 0.05
+SYMPREC = 1e-2
+# Loose enough for the matcher to find the site mapping; the match itself is
+# decided by the EXACT_* tolerances below. Both sides are already reduced
+# primitive cells (see _reduce), so the matcher does not reduce them again.
+MATCHER_KWARGS = {
+    "ltol": 0.02,
+    "stol": 0.05,
+    "angle_tol": 1.0,
+    "primitive_cell": False,
+    "scale": False,
+    "attempt_supercell": False,
+}
+# Same structure up to formatting: coordinate rounding, not distortions
+EXACT_LTOL = 1e-5
+EXACT_FTOL = 1e-4
+
+
+def dedup_enabled() -> bool:
+    return os.getenv("LATTICE_DEDUP", "1").strip() != "0"
+
+
+def max_dedup_sites() -> int:
+    return int(os.getenv("LATTICE_DEDUP_MAX_SITES", "1000"))
+
+
+def dedup_fingerprint(structure) -> Tuple[str, int, int]:
+    """(reduced formula, spacegroup number, volume-per-atom bucket) of a structure."""
+    try:
+        number = get_symmetry(structure, symprec=SYMPREC).spacegroup_number
+    except Exception:
+        number = 0
+    per_atom = structure.volume / max(1, len(structure))
+    bucket = math.floor(math.log(per_atom) / math.log1p(VOLUME_BUCKET))
+    return structure.composition.reduced_formula, number, bucket
+
+
+def _bucket_key(formula: str, number: int, bucket: int) -> str:
+    return hashlib.sha256(f"{formula}|{number}|{bucket}".encode("utf-8")).hexdigest()
+
+
+def _same_up_to_rounding(reduced, mapped) -> bool:
+    """Whether `mapped` (a candidate put in `reduced`'s basis and site order by
+    StructureMatcher.get_s2_like_s1) differs from `reduced` only by rounding."""
+    import numpy as np
+
+    if mapped is None or len(mapped) != len(reduced):
+        return False
+    ours = np.array(reduced.lattice.parameters)
+    theirs = np.array(mapped.lattice.parameters)
+    if np.any(np.abs(ours - theirs) > EXACT_LTOL * np.abs(ours)):
+        return False
+    delta = mapped.frac_coords - reduced.frac_coords
+    return bool(np.all(np.abs(delta - np.round(delta)) <= EXACT_FTOL))
+
+
+def _reduce(structure, primitive: bool = False):
+    """Niggli-reduced primitive cell, the form StructureMatcher compares.
+
+    `primitive=True` skips the primitive cell search for structures already
+    reduced to it (CIFs parsed with primitive=True).
+    """
+    if not primitive:
+        structure = structure.get_primitive_structure()
+    return structure.get_reduced_structure()
+
+
+def _may_match(candidate: Dict[str, Any], entry: Dict[str, Any]) -> bool:
+    if entry["n"] != candidate["n"]:
+        return False
+    # Generous against EXACT_LTOL: a wrong rejection only costs a miss
+    limit = 10 * EXACT_LTOL
+    return all(abs(x - y) <= limit * y for x, y in zip(candidate["abc"], entry["abc"]))
+
+
+def dedup_candidate(structure, primitive: bool = False) -> Optional[Dict[str, Any]]:
+    """What DedupIndex needs to know about `structure`: its fingerprint, its own id
+    and its reduced primitive cell. None if dedup is off or the structure is too large.
+
+    Top-level so it can run in a process pool worker; the index itself is kept by
+    the parent process (see DedupIndex.resolve).
+    """
+    if not dedup_enabled() or len(structure) > max_dedup_sites():
+        return None
+    with stage("dedup"):
+        reduced = _reduce(structure, primitive)
+        return {
+            "fingerprint": list(dedup_fingerprint(structure)),
+            "id": structure_fingerprint(structure),
+            "n": len(reduced),
+            "abc": sorted(reduced.lattice.abc),
+            "structure": reduced.as_dict(verbosity=0),
+        }
+
+
+def cif_dedup_candidate(data: bytes) -> Optional[Dict[str, Any]]:
+    """dedup_candidate of a CIF upload, parsed like /api/scene parses it."""
+    return dedup_candidate(parse_cif_bytes(data), primitive=True)
+
+
+_matcher = None
+
+
+def match_candidate(candidate: Dict[str, Any], entries: List[Dict[str, Any]]) -> Optional[str]:
+    """Id of the first of `entries` equivalent to `candidate`, or None.
+
+    Top-level so it can run in a process pool worker.
+    """
+    global _matcher
+    from pymatgen.core import Structure
+
+    if _matcher is None:
+        from pymatgen.analysis.structure_matcher import StructureMatcher
+
+        _matcher = StructureMatcher(**MATCHER_KWARGS)
+    with stage("dedup"):
+        reduced = Structure.from_dict(candidate["structure"])
+        for entry in entries:
+            mapped = _matcher.get_s2_like_s1(reduced, Structure.from_dict(entry["structure"]))
+            if _same_up_to_rounding(reduced, mapped):
+                return entry["id"]
+    return None
+
+
+class DedupIndex:
+    """Fingerprint buckets of representative structures, confirmed by StructureMatcher
+    and an exact comparison of the mapped structures.
+
+    Lives in the parent process, so every pool worker shares it: workers only compute
+    candidates (dedup_candidate) and confirm matches (match_candidate). Bucket updates
+    on the disk tier hold an advisory file lock, since other uvicorn processes write
+    the same buckets.
+    """
+
+    def __init__(self, store: SceneCache, *, max_candidates: int = 16) -> None:
+        self.store = store
+        self.max_candidates = max(1, max_candidates)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _load(self, key: str) -> List[Dict[str, Any]]:
+        value = self.store.get(key)
+        return json.loads(value) if value is not None else []
+
+    @contextlib.contextmanager
+    def _bucket_lock(self) -> Iterator[None]:
+        if self.store.disk is None or fcntl is None:
+            yield
+            return
+        os.makedirs(self.store.disk.root, exist_ok=True)
+        with open(os.path.join(self.store.disk.root, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def candidates(self, candidate: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Representatives that may be equivalent to `candidate` (cheap checks only)."""
+        formula, number, bucket = candidate["fingerprint"]
+        found = []
+        # A structure near a bucket edge may have its match in the next bucket
+        for offset in (0, -1, 1):
+            for entry in self._load(_bucket_key(formula, number, bucket + offset)):
+                if _may_match(candidate, entry):
+                    found.append(entry)
+        return found
+
+    def lookup(self, candidate: Dict[str, Any]) -> Optional[str]:
+        """Id of the representative equivalent to `candidate`, or None. Runs the
+        matcher in this process; see resolve for the pool version."""
+        return match_candidate(candidate, self.candidates(candidate))
+
+    def add(self, candidate: Dict[str, Any]) -> None:
+        """Make `candidate` a representative; the oldest one goes when the bucket is full."""
+        key = _bucket_key(*candidate["fingerprint"])
+        entry = {name: candidate[name] for name in ("id", "n", "abc", "structure")}
+        with self._lock, self._bucket_lock():
+            # Read the disk tier under the lock: another process may have updated the bucket
+            value = self.store.disk.get(key) if self.store.disk is not None else self.store.get(key)
+            entries = [e for e in json.loads(value or b"[]") if e["id"] != entry["id"]]
+            entries.append(entry)
+            self.store.put(key, json.dumps(entries[-self.max_candidates :]).encode("utf-8"))
+
+    async def resolve(self, candidate: Dict[str, Any]) -> Tuple[str, bool]:
+        """(representative id, matched): the id of an equivalent structure already
+        indexed, or the candidate's own id after adding it. The matcher runs in the pool."""
+        entries = self.candidates(candidate)
+        if entries:
+            found = await get_executor().run(match_candidate, candidate, entries)
+            if found is not None:
+                self.hits += 1
+                return found, True
+        self.misses += 1
+        self.add(candidate)
+        return candidate["id"], False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "buckets": self.store.stats()}
+
+
+_index: Optional[DedupIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_dedup_index() -> DedupIndex:
+    """Return the process-wide dedup index, configured from env on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                max_bytes = int(os.getenv("LATTICE_DEDUP_MAX_BYTES", str(32 * 1024 * 1024)))
+                disk_dir = os.getenv("LATTICE_SCENE_CACHE_DIR", "").strip() or None
+                if disk_dir:
+                    disk_dir = os.path.join(disk_dir, "dedup")
+                store = SceneCache(
+                    max_bytes=max_bytes, disk_dir=disk_dir, disk_max_bytes=disk_tier_max_bytes()
+                )
+                _index = DedupIndex(
+                    store,
+                    max_candidates=int(os.getenv("LATTICE_DEDUP_MAX_CANDIDATES", "16")),
+                )
+    return _index
+
+
+async def canonical_id(candidate: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Representative id for a dedup_candidate (None stays None)."""
+    if candidate is None:
+        return None
+    return (await get_dedup_index().resolve(candidate))[0]
@@ -0,0 +1,218 @@
+"""Compact binary scene encoding.
+
+Layout (little-endian):
+
+    b"LSCN" | uint32 version | uint32 header_len | header JSON (utf-8) | buffers
+
+The header is `{"buffers": [...], "data": ...}` where `data` is the original
+document with bulky arrays replaced by `{"$buffer": i}`. Each buffer entry has
+`offset` (from the start of the payload, 4-byte aligned), `byteLength`, `dtype`
+and `shape`, so a browser can wrap it in a typed array view with no per-element
+parsing:
+
+- `positions`      -> float32, shape (n, 3)
+- `positionPairs`  -> float32, shape (n, 2, 3)
+- `framePositions` / `frameLattices` (trajectories) -> float32, shape (frames, n, 3)
+- `colors`/`color` given as per-vertex hex strings -> uint8 RGB, shape (n, 3)
+
+Sibling sphere/cylinder primitives that differ only in geometry (CTK emits one
+sphere primitive per atom) are merged into one instanced batch first. Per-atom
+tooltips are dropped in the process: they only repeat the species and position,
+which the client already has.
+
+`dumps_json` is the JSON counterpart used for the default response encoding: it
+uses orjson when installed (`pip install lattice-api[fast]`) and pydantic-core's
+serializer otherwise (several times faster than the standard library's).
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import struct
+from typing import Any, Dict, List
+
+import pydantic_core
+
+
+SCENE_BINARY_MEDIA_TYPE = "application/x-lattice-scene"
+MAGIC = b"LSCN"
+VERSION = 1
+
+_FLOAT_KEYS = {"positions": 2, "positionPairs": 3, "framePositions": 3, "frameLattices": 3}
+_COLOR_KEYS = ("colors", "color")
+_BATCHABLE = {"spheres": "positions", "cylinders": "positionPairs"}
+
+try:  # optional fast path
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - depends on environment
+    _orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    # NumPy arrays and scalars, without importing numpy here
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Compact JSON bytes for `obj`; NumPy arrays/scalars are serialized as lists/numbers."""
+    if _orjson is not None:
+        return _orjson.dumps(obj, default=_json_default, option=_orjson.OPT_SERIALIZE_NUMPY)
+    return pydantic_core.to_json(obj, fallback=_json_default)
+
+
+def _batch_primitives(contents: List[Any]) -> List[Any]:
+    """Merge primitives of the same type and style into single instanced primitives."""
+    out: List[Any] = []
+    batches: Dict[str, Dict[str, Any]] = {}
+    for item in contents:
+        geom_key = _BATCHABLE.get(item.get("type")) if isinstance(item, dict) else None
+        if geom_key is None or not isinstance(item.get(geom_key), list):
+            out.append(item)
+            continue
+        style = {k: v for k, v in item.items() if k not in (geom_key, "tooltip")}
+        signature = json.dumps(style, sort_keys=True, default=str)
+        batch = batches.get(signature)
+        if batch is None:
+            batch = dict(style, **{geom_key: []})
+            batches[signature] = batch
+            out.append(batch)
+        batch[geom_key].extend(item[geom_key])
+    return out
+
+
+def _pack_floats(value: Any, ndim: int):
+    import numpy as np
+
+    # Nested lists, or NumPy arrays passed through as-is
+    if not (isinstance(value, list) and value) and not getattr(value, "size", 0):
+        return None
+    try:
+        arr = np.asarray(value, dtype="<f4")
+    except (TypeError, ValueError):
+        return None
+    if arr.ndim != ndim or arr.shape[-1] != 3:
+        return None
+    return arr
+
+
+def _pack_colors(value: Any):
+    import numpy as np
+
+    if not isinstance(value, list) or not value:
+        return None
+    if not all(isinstance(c, str) and len(c) == 7 and c.startswith("#") for c in value):
+        return None
+    try:
+        raw = bytes.fromhex("".join(c[1:] for c in value))
+    except ValueError:
+        return None
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+
+
+def encode_scene(doc: Dict[str, Any]) -> bytes:
+    """Encode a scene (or SceneResponse) document into the binary layout."""
+    buffers: List[Any] = []
+
+    def walk(node: Any) -> Any:
+        if isinstance(node, list):
+            return [walk(v) for v in node]
+        if not isinstance(node, dict):
+            return node
+        out = {}
+        for key, value in node.items():
+            if key == "contents" and isinstance(value, list):
+                value = _batch_primitives(value)
+            arr = None
+            if key in _FLOAT_KEYS:
+                arr = _pack_floats(value, _FLOAT_KEYS[key])
+            elif key in _COLOR_KEYS:
+                arr = _pack_colors(value)
+            if arr is not None:
+                buffers.append(arr)
+                out[key] = {"$buffer": len(buffers) - 1}
+            else:
+                out[key] = walk(value)
+        return out
+
+    data = walk(doc)
+
+    # Header length depends on offsets and offsets depend on header length: lay out
+    # buffers relative to the buffer section first, then shift once the header is sized.
+    specs = []
+    rel = 0
+    for arr in buffers:
+        specs.append(
+            {"offset": rel, "byteLength": arr.nbytes, "dtype": arr.dtype.name, "shape": list(arr.shape)}
+        )
+        rel += arr.nbytes + (-arr.nbytes % 4)
+
+    def header_bytes(base: int) -> bytes:
+        shifted = [dict(s, offset=s["offset"] + base) for s in specs]
+        raw = dumps_json({"buffers": shifted, "data": data})
+        return raw + b" " * (-(12 + len(raw)) % 4)
+
+    header = header_bytes(0)
+    while True:
+        base = 12 + len(header)
+        candidate = header_bytes(base)
+        if len(candidate) == len(header):
+            header = candidate
+            break
+        header = candidate
+
+    parts = [MAGIC, struct.pack("<II", VERSION, len(header)), header]
+    for arr in buffers:
+        raw = arr.tobytes()
+        parts.append(raw)
+        parts.append(b"\0" * (-len(raw) % 4))
+    return b"".join(parts)
+
+
+def decode_scene(payload: bytes) -> Dict[str, Any]:
+    """Decode the binary layout back into a plain JSON document (with batched primitives)."""
+    import numpy as np
+
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a lattice scene payload")
+    version, header_len = struct.unpack_from("<II", payload, 4)
+    if version != VERSION:
+        raise ValueError(f"Unsupported scene payload version: {version}")
+    header = json.loads(payload[12 : 12 + header_len])
+    specs = header["buffers"]
+
+    def load(index: int, key: str) -> Any:
+        spec = specs[index]
+        dtype = np.dtype(spec["dtype"]).newbyteorder("<")
+        count = math.prod(spec["shape"])
+        arr = np.frombuffer(payload, dtype=dtype, count=count, offset=spec["offset"]).reshape(spec["shape"])
+        if key in _COLOR_KEYS:
+            return ["#" + bytes(row).hex() for row in arr]
+        return arr.astype(float).tolist()
+
+    def walk(node: Any, key: str = "") -> Any:
+        if isinstance(node, list):
+            return [walk(v) for v in node]
+        if isinstance(node, dict):
+            if set(node) == {"$buffer"}:
+                return load(node["$buffer"], key)
+            return {k: walk(v, k) for k, v in node.items()}
+        return node
+
+    return walk(header["data"])
+
+
+def wants_binary_scene(accept: str | None) -> bool:
+    """True if the Accept header asks for the binary scene encoding."""
+    for part in (accept or "").split(","):
+        media_type, *params = [f.strip() for f in part.split(";")]
+        if media_type.lower() != SCENE_BINARY_MEDIA_TYPE:
+            continue
+        q = next((p.partition("=")[2] for p in params if p.startswith("q=")), "1")
+        try:
+            return float(q) > 0
+        except ValueError:
+            return False
+    return False
@@ -0,0 +1,223 @@
+"""Executor layer for CPU-bound work (CIF parsing, scene generation, exports).
+
+Request handlers submit blocking work here instead of running it on the event
+loop. The pool is created lazily and bounded: when more than
+`LATTICE_EXECUTOR_MAX_QUEUE` tasks are pending, new submissions are rejected with
+503 and a Retry-After header.
+
+Env vars:
+- LATTICE_EXECUTOR: 'process' (default) or 'thread'.
+- LATTICE_EXECUTOR_WORKERS: pool size (default: CPU count).
+- LATTICE_EXECUTOR_MAX_QUEUE: max pending tasks, running included (default: 4 x workers).
+- LATTICE_EXECUTOR_RETRY_AFTER: Retry-After seconds sent with 503 (default: 1).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+
+# Heavy modules imported once per worker so the first task does not pay for them
+WARM_MODULES = (
+    "pymatgen.core",
+    "pymatgen.io.cif",
+    "pymatgen.analysis.graphs",
+    "pymatgen.analysis.local_env",
+    "crystal_toolkit.core.legend",
+    "crystal_toolkit.renderables.structuregraph",
+)
+
+
+class WorkerHTTPError(Exception):
+    """Picklable stand-in for HTTPException raised inside a pool worker."""
+
+    def __init__(self, status_code: int, detail: Any = None, headers: Optional[Dict[str, str]] = None):
+        super().__init__(status_code, detail, headers)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def warm_worker() -> None:
+    """Import heavy dependencies; failures are left for the task itself to report."""
+    import importlib
+
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def _invoke(fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    try:
+        return fn(*args, **kwargs)
+    except HTTPException as exc:
+        raise WorkerHTTPError(exc.status_code, exc.detail, exc.headers) from None
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    if "forkserver" in methods:
+        ctx = multiprocessing.get_context("forkserver")
+        # Workers fork from a server that already has the heavy modules loaded
+        ctx.set_forkserver_preload(list(WARM_MODULES))
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class WorkExecutor:
+    """Bounded wrapper around a process or thread pool."""
+
+    def __init__(
+        self,
+        *,
+        kind: str = "process",
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        retry_after: int = 1,
+    ) -> None:
+        if kind not in {"process", "thread"}:
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.max_pending = max(1, max_pending or 4 * self.max_workers)
+        self.retry_after = retry_after
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=_mp_context(),
+                        initializer=warm_worker,
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="lattice-worker",
+                        initializer=warm_worker,
+                    )
+            return self._pool
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _reserve(self) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, _future: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _reject(self) -> None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "ServiceUnavailable",
+                "message": "Server is busy; retry later.",
+                "detail": {"pending": self._pending, "max_pending": self.max_pending},
+            },
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def run(self, fn: Callable[..., Any], *args: Any, wait: bool = False, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool and await its result.
+
+        If the queue is full, raise 503 (or, with wait=True, poll until a slot frees up).
+        HTTPExceptions raised by `fn` are re-raised here unchanged.
+        """
+        while not self._reserve():
+            if not wait:
+                self._reject()
+            await asyncio.sleep(0.05)
+
+        try:
+            task = self._get_pool().submit(_invoke, fn, args, kwargs)
+        except BaseException:
+            self._release()
+            raise
+        # Free the slot when the pool task finishes, not when the awaiting request
+        # is cancelled (e.g. client disconnect) while the task keeps running
+        task.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(task)
+        except WorkerHTTPError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail, headers=exc.headers) from None
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); drop the pool so the next call starts a fresh one
+            self.shutdown(wait=False)
+            self._reject()
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool and block until it returns.
+
+        For threads outside the event loop (e.g. job workers, which bound their
+        own concurrency); not counted against max_pending.
+        """
+        try:
+            return self._get_pool().submit(_invoke, fn, args, kwargs).result()
+        except WorkerHTTPError as exc:
+            raise HTTPException(status_code=exc.status_code, detail=exc.detail, headers=exc.headers) from None
+        except BrokenProcessPool:
+            self.shutdown(wait=False)
+            self._reject()
+
+    def warm(self) -> None:
+        """Start all workers now instead of on first use."""
+        pool = self._get_pool()
+        futures = [pool.submit(warm_worker) for _ in range(self.max_workers)]
+        for f in futures:
+            f.result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_executor: Optional[WorkExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> WorkExecutor:
+    """Return the process-wide executor, configured from env on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = os.getenv("LATTICE_EXECUTOR_WORKERS", "").strip()
+                max_queue = os.getenv("LATTICE_EXECUTOR_MAX_QUEUE", "").strip()
+                _executor = WorkExecutor(
+                    kind=os.getenv("LATTICE_EXECUTOR", "process").strip().lower() or "process",
+                    max_workers=int(workers) if workers else None,
+                    max_pending=int(max_queue) if max_queue else None,
+                    retry_after=int(os.getenv("LATTICE_EXECUTOR_RETRY_AFTER", "1")),
+                )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
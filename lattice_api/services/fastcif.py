@@ -0,0 +1,204 @@
+"""Fast path for plain P1 CIFs.
+
+pymatgen's CifParser is pure Python: it tokenizes the whole file, applies the
+symmetry operations site by site and merges coincident sites with a pairwise
+search that is quadratic in the number of sites (about 30 s for 10k sites).
+Most machine-generated CIFs are P1 with a single `_atom_site` loop.
+`read_p1_cif` splits that loop straight into NumPy arrays and builds the
+Structure CifParser would return: same cell, site order, coordinates and labels.
+
+It returns None for anything else, and the caller falls back to CifParser:
+- symmetry operations other than x,y,z (or, without operations, a space group
+  other than P1);
+- partial occupancies, oxidation states, magnetic or modulated structures;
+- quotes, uncertainties or comments in the atom-site loop, multi-line text
+  fields or non-ASCII text anywhere;
+- type symbols that are not plain element symbols, or elements without an
+  electronegativity (CifParser orders sites by it);
+- sites CifParser would merge (closer than its site tolerance) and cells thinner
+  than it accepts.
+
+Env vars:
+- LATTICE_FAST_CIF: set to 0 to always use CifParser (default 1).
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from functools import reduce
+from typing import List, Optional
+
+# CifParser defaults (site_tolerance, frac_tolerance) and its minimal cell thickness
+SITE_TOLERANCE = 1e-4
+FRAC_TOLERANCE = 1e-4
+MIN_THICKNESS = 0.01
+
+_LOOP_HEADER = re.compile(r"^[ \t]*loop_[ \t]*\n((?:[ \t]*_\S+[ \t]*\n)+)", re.MULTILINE)
+_SECTION_END = re.compile(r"^[ \t]*(?:_|loop_)", re.MULTILINE)
+_UNSUPPORTED_TAG = re.compile(
+    r"^[ \t]*_\S*(?:magn|moment|modulation|oxidation)", re.MULTILINE | re.IGNORECASE
+)
+_VALUE = re.compile(r"""'([^'\n]*)'|"([^"\n]*)"|(\S+)""")
+_UNCERTAINTY = re.compile(r"\(.+\)*")
+
+# Looked up in this order by CifParser.get_symops
+_SYMOP_TAGS = (
+    "_symmetry_equiv_pos_as_xyz",
+    "_symmetry_equiv_pos_as_xyz_",
+    "_space_group_symop_operation_xyz",
+    "_space_group_symop_operation_xyz_",
+)
+_SPACE_GROUP_TAGS = (
+    "_symmetry_space_group_name_H-M",
+    "_symmetry_space_group_name_H_M",
+    "_space_group_name_H-M_alt",
+    "_symmetry_Int_Tables_number",
+    "_space_group_IT_number",
+)
+_ATOM_COLUMNS = (
+    "_atom_site_label",
+    "_atom_site_type_symbol",
+    "_atom_site_fract_x",
+    "_atom_site_fract_y",
+    "_atom_site_fract_z",
+)
+# CifParser._parse_symbol maps these prefixes to other elements
+_SPECIAL_SYMBOLS = re.compile("Hw|Ow|Wat|wat|OH|OH2|NO3")
+
+
+def fast_cif_enabled() -> bool:
+    return os.getenv("LATTICE_FAST_CIF", "1").strip() != "0"
+
+
+def _item(text: str, tag: str) -> Optional[str]:
+    """Value of a single-valued item (quotes removed), or None if absent."""
+    match = re.search(rf"^[ \t]*{re.escape(tag)}\s+(.*)$", text, re.MULTILINE)
+    if match is None:
+        return None
+    value = _VALUE.match(match.group(1).strip())
+    return next(g for g in value.groups() if g is not None) if value else None
+
+
+def _loops(text: str):
+    """(tags, body) for every loop whose tags are one per line."""
+    for match in _LOOP_HEADER.finditer(text):
+        end = _SECTION_END.search(text, match.end())
+        yield match.group(1).split(), text[match.end() : end.start() if end else len(text)]
+
+
+def _is_p1(text: str, loops) -> bool:
+    for tag in _SYMOP_TAGS:
+        for tags, body in loops:
+            if tag in tags:
+                ops = [next(g for g in m.groups() if g is not None) for m in _VALUE.finditer(body)]
+                ops = ops[tags.index(tag) :: len(tags)]
+                return len(ops) == 1 and ops[0].replace(" ", "").lower() in ("x,y,z", "+x,+y,+z")
+        value = _item(text, tag)
+        if value is not None:
+            return value.replace(" ", "").lower() in ("x,y,z", "+x,+y,+z")
+    # No operations: CifParser derives them from the space group
+    for tag in _SPACE_GROUP_TAGS:
+        value = _item(text, tag)
+        if value is not None:
+            return re.sub(r"[\s_]", "", value) in ("P1", "1")
+    return False
+
+
+def _float(value: Optional[str]) -> float:
+    if value is None:
+        raise ValueError("missing value")
+    return float(_UNCERTAINTY.sub("", value))
+
+
+def _species_order(symbols: List[str]):
+    """Validated Elements for `symbols` and their CifParser sort keys, or None."""
+    from pymatgen.core import Element
+
+    elements, keys = [], []
+    for symbol in symbols:
+        # Exactly what CifParser._parse_symbol would read from the type symbol
+        valid = Element.is_valid_symbol(symbol) and symbol[:2].title() == symbol
+        if not valid or _SPECIAL_SYMBOLS.match(symbol):
+            return None
+        element = Element(symbol)
+        electronegativity = float(element.X)
+        if math.isnan(electronegativity):
+            return None
+        elements.append(element)
+        # Site.__lt__: average electronegativity, then species string
+        keys.append((electronegativity, symbol))
+    return elements, keys
+
+
+def read_p1_cif(text: str, primitive: bool = True):
+    """Structure for a plain P1 CIF block as CifParser builds it, or None if the
+    file needs CifParser (see module docstring)."""
+    if not text.isascii() or "\n;" in text or _UNSUPPORTED_TAG.search(text):
+        return None
+    loops = list(_loops(text))
+    atoms = next(((tags, body) for tags, body in loops if "_atom_site_fract_x" in tags), None)
+    if atoms is None or not _is_p1(text, loops):
+        return None
+    tags, body = atoms
+    if any(tag not in tags for tag in _ATOM_COLUMNS) or any(c in body for c in "'\"#()"):
+        return None
+
+    import numpy as np
+
+    tokens = body.split()
+    if not tokens or len(tokens) % len(tags):
+        return None
+    table = np.array(tokens).reshape(-1, len(tags))
+    try:
+        lengths = [_float(_item(text, f"_cell_length_{axis}")) for axis in "abc"]
+        angles = [_float(_item(text, f"_cell_angle_{name}")) for name in ("alpha", "beta", "gamma")]
+        coords = table[:, [tags.index(f"_atom_site_fract_{axis}") for axis in "xyz"]].astype(float)
+        if "_atom_site_occupancy" in tags:
+            occupancy = table[:, tags.index("_atom_site_occupancy")].astype(float)
+            if not np.all(occupancy == 1.0):
+                return None
+    except ValueError:
+        return None
+    if not np.all(np.isfinite(coords)):
+        return None
+
+    from pymatgen.core import Lattice, Structure
+
+    lattice = Lattice.from_parameters(*lengths, *angles)
+    if min(lattice.d_hkl(hkl) for hkl in ((1, 0, 0), (0, 1, 0), (0, 0, 1))) < MIN_THICKNESS:
+        return None
+
+    # CifParser snaps finite-precision thirds (0.6667 -> 2/3) before anything else
+    for ideal in (1 / 3, 2 / 3):
+        coords[np.abs(coords / ideal - 1) <= FRAC_TOLERANCE] = ideal
+    coords -= np.floor(coords)
+
+    # CifParser merges sites within its tolerance into one disordered site
+    from scipy.spatial import cKDTree
+
+    tree = cKDTree(np.where(coords >= 1.0, 0.0, coords), boxsize=1.0)
+    if len(tree.query_pairs(SITE_TOLERANCE, p=np.inf, output_type="ndarray")):
+        return None
+
+    unique, inverse, counts = np.unique(
+        table[:, tags.index("_atom_site_type_symbol")], return_inverse=True, return_counts=True
+    )
+    species = _species_order([str(symbol) for symbol in unique])
+    if species is None:
+        return None
+    elements, keys = species
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[sorted(range(len(unique)), key=keys.__getitem__)] = np.arange(len(unique))
+    # Sites sorted like CifParser's get_sorted_structure (stable, so file order within a species)
+    order = np.argsort(rank[inverse], kind="stable")
+    labels = table[order, tags.index("_atom_site_label")].tolist()
+    structure = Structure(lattice, [elements[i] for i in inverse[order]], coords[order], labels=labels)
+    if primitive:
+        # get_primitive_structure returns the cell unchanged when the species counts
+        # share no factor, after a search that dominates large P1 files
+        if reduce(math.gcd, counts.tolist()) > 1:
+            structure = structure.get_primitive_structure()
+        structure = structure.get_reduced_structure()
+    return structure
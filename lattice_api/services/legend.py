@@ -0,0 +1,122 @@
+"""Shared legend (color/radius) tables for scene rendering.
+
+CTK's Legend is rebuilt per scene and looks colors and radii up again for every
+site. Both only depend on the species (with oxidation state), the radius scheme
+and the element color scheme, so per-species tables are cached per process under
+that key and shared by every structure with the same chemistry.
+
+Structures whose sites carry `display_color`/`display_radius` overrides, or a
+color scheme keyed on site properties, get a plain Legend instead.
+
+Env vars:
+- LATTICE_LEGEND_CACHE_SIZE: cached (species, schemes) tables per process (default 256, 0 disables).
+- CT_LEGEND_COLOR_SCHEME: element color scheme (VESTA, Jmol or accessible).
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from lattice_api.services.cache import LRUCache
+
+
+ELEMENT_COLOR_SCHEMES = ("VESTA", "Jmol", "accessible")
+_OVERRIDE_PROPS = ("display_color", "display_radius")
+
+
+class LegendTables:
+    """Per-species colors and radii computed once by a template Legend."""
+
+    def __init__(self, legend) -> None:
+        self.legend = legend
+        self.colors: Dict[str, str] = {}
+        self.radii: Dict[str, float] = {}
+
+    def color(self, sp) -> str:
+        key = str(sp)
+        value = self.colors.get(key)
+        if value is None:
+            value = self.colors[key] = self.legend.get_color(sp)
+        return value
+
+    def radius(self, sp) -> float:
+        key = str(sp)
+        value = self.radii.get(key)
+        if value is None:
+            value = self.radii[key] = self.legend.get_radius(sp)
+        return value
+
+
+class SharedLegend:
+    """Legend for one structure backed by shared LegendTables.
+
+    Implements the lookups CTK renderers use (`get_color`, `get_radius`) from the
+    tables and defers everything else to the template Legend.
+    """
+
+    def __init__(self, tables: LegendTables, structure) -> None:
+        self._tables = tables
+        self.site_collection = structure
+
+    def get_color(self, sp, site=None) -> str:
+        return self._tables.color(sp)
+
+    def get_radius(self, sp, site=None) -> float:
+        return self._tables.radius(sp)
+
+    def get_legend(self) -> Dict[str, Any]:
+        legend = copy.copy(self._tables.legend)
+        legend.site_collection = self.site_collection
+        return legend.get_legend()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._tables.legend, name)
+
+
+_cache: Optional[LRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_legend_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                size = int(os.getenv("LATTICE_LEGEND_CACHE_SIZE", "256"))
+                _cache = LRUCache(max_entries=size, sizeof=lambda _: 1)
+    return _cache
+
+
+def legend_color_scheme() -> str:
+    from crystal_toolkit.core.legend import Legend
+
+    return os.getenv("CT_LEGEND_COLOR_SCHEME") or Legend.default_color_scheme
+
+
+def _has_display_overrides(structure) -> bool:
+    return any(prop in site.properties for site in structure for prop in _OVERRIDE_PROPS)
+
+
+def get_legend(structure, radius_scheme: str = "uniform"):
+    """Return a legend for `structure`, sharing lookup tables across structures
+    with the same species set, radius scheme and color scheme."""
+    from crystal_toolkit.core.legend import Legend
+
+    color_scheme = legend_color_scheme()
+    cache = get_legend_cache()
+    if not cache.enabled or color_scheme not in ELEMENT_COLOR_SCHEMES or _has_display_overrides(structure):
+        return Legend(structure, color_scheme=color_scheme, radius_scheme=radius_scheme)
+
+    species = tuple(sorted(str(sp) for sp in structure.composition))
+    key = (species, radius_scheme, color_scheme)
+    tables = cache.get(key)
+    if tables is None:
+        template = Legend(structure, color_scheme=color_scheme, radius_scheme=radius_scheme)
+        # Do not pin the first structure in the cache; SharedLegend supplies its own
+        template.site_collection = None
+        tables = LegendTables(template)
+        cache.put(key, tables)
+    return SharedLegend(tables, structure)
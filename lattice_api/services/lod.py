@@ -0,0 +1,163 @@
+"""Level-of-detail scene rendering for large structures.
+
+CTK's renderer walks every site (and every periodic image around the cell) in
+Python and emits one primitive per atom and per half-bond, so scene size and
+generation time grow quickly with n_sites. The reduced levels here are rendered
+directly from arrays instead:
+
+- "full":    the regular CTK scene (image atoms, bonds outside the cell)
+- "reduced": unit-cell atoms only, one instanced sphere batch per (color, radius)
+             and one instanced cylinder batch per bond color (half-bonds, as CTK)
+- "atoms":   like "reduced" without bonds; the bonds group can be fetched later
+             (GET /api/scene/{scene_id}/bonds)
+- "auto":    "full" while n_sites + 2 x bonds fits the primitive budget, "reduced"
+             above it, "atoms" once n_sites alone exceeds it (no bond search at all)
+
+Disordered sites are drawn with their majority species in the reduced levels.
+
+Both reduced levels can tile a diagonal supercell (services/supercell.py): the
+geometry computed for the unit cell is broadcast over the lattice translations,
+and half-bonds crossing a cell face meet the stubs of the neighboring cell.
+
+Env vars:
+- LATTICE_SCENE_PRIMITIVE_BUDGET: primitive budget for lod=auto (default 20000).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from lattice_api.services.supercell import translations
+
+LOD_LEVELS = ("full", "reduced", "atoms")
+BOND_RADIUS = 0.1  # CTK's default bond_radius
+
+
+def default_primitive_budget() -> int:
+    return int(os.getenv("LATTICE_SCENE_PRIMITIVE_BUDGET", "20000"))
+
+
+def choose_lod(n_sites: int, n_bonds: Optional[int], budget: int) -> str:
+    """Pick the level for lod=auto; `n_bonds` may be None when n_sites already exceeds the budget."""
+    if n_sites > budget or n_bonds is None:
+        return "atoms"
+    # CTK draws one sphere per atom and two half-cylinders per bond (image atoms come on top)
+    if n_sites + 2 * n_bonds <= budget:
+        return "full"
+    return "reduced"
+
+
+def scene_origin(structure, repeats: Optional[Sequence[int]] = None) -> List[float]:
+    center = [0.5 * n for n in repeats] if repeats else [0.5, 0.5, 0.5]
+    return [float(x) for x in -structure.lattice.get_cartesian_coords(center)]
+
+
+def _tile(points, offsets):
+    """Broadcast (n, ..., 3) points over (t, 3) offsets into (t * n, ..., 3)."""
+    if offsets is None:
+        return points
+    shape = (len(offsets),) + (1,) * (points.ndim - 1) + (3,)
+    return (offsets.reshape(shape) + points[None]).reshape((-1,) + points.shape[1:])
+
+
+def _site_styles(structure, legend):
+    """Per-site (color, radius) of the majority species."""
+    species = [max(site.species.items(), key=lambda item: item[1])[0] for site in structure]
+    return [legend.get_color(sp) for sp in species], [legend.get_radius(sp) for sp in species]
+
+
+def atoms_group(
+    structure, legend, origin: List[float], offsets=None, with_sites: bool = False
+) -> Dict[str, Any]:
+    """Spheres batched per (color, radius); `with_sites` lists each batch's site indices."""
+    import numpy as np
+
+    colors, radii = _site_styles(structure, legend)
+    coords = structure.cart_coords
+    batches: Dict[tuple, List[int]] = {}
+    for i, style in enumerate(zip(colors, radii)):
+        batches.setdefault(style, []).append(i)
+    contents = [
+        {
+            "type": "spheres",
+            "positions": _tile(coords[np.asarray(idx)], offsets).tolist(),
+            "color": color,
+            "radius": radius,
+            "clickable": True,
+            **({"sites": idx} if with_sites else {}),
+        }
+        for (color, radius), idx in batches.items()
+    ]
+    return {"name": "atoms", "contents": contents, "origin": origin, "visible": True}
+
+
+def bonds_group(structure, graph, legend, origin: List[float], offsets=None) -> Dict[str, Any]:
+    """Half-bond cylinders batched per color.
+
+    Each edge u-v (v in image `to_jimage`) becomes [u, midpoint] colored as u and
+    [v, v - half-vector] colored as v, so bonds across the cell boundary show as
+    stubs on both sides instead of requiring image atoms.
+    """
+    import numpy as np
+
+    colors, _ = _site_styles(structure, legend)
+    edges = list(graph.graph.edges(data="to_jimage"))
+    if not edges:
+        return {"name": "bonds", "contents": [], "origin": origin, "visible": True}
+    frm = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+    to = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+    images = np.array([e[2] for e in edges], dtype=float)
+
+    frac = structure.frac_coords
+    cart = structure.cart_coords
+    far = structure.lattice.get_cartesian_coords(frac[to] + images)
+    half = (far - cart[frm]) / 2.0
+
+    starts = np.concatenate([cart[frm], cart[to]])
+    ends = np.concatenate([cart[frm] + half, cart[to] - half])
+    owners = np.concatenate([frm, to])
+    pairs = np.stack([starts, ends], axis=1)
+
+    by_color: Dict[str, List[int]] = {}
+    for k, site in enumerate(owners.tolist()):
+        by_color.setdefault(colors[site], []).append(k)
+    contents = [
+        {
+            "type": "cylinders",
+            "positionPairs": _tile(pairs[np.asarray(idx)], offsets).tolist(),
+            "color": color,
+            "radius": BOND_RADIUS,
+            "clickable": True,
+        }
+        for color, idx in by_color.items()
+    ]
+    return {"name": "bonds", "contents": contents, "origin": origin, "visible": True}
+
+
+def unit_cell_group(structure, origin: List[float], repeats: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    # Importing the structuregraph renderable also patches Lattice.get_scene
+    from crystal_toolkit.renderables import structuregraph as _ct_structuregraph  # noqa: F401
+    from pymatgen.core import Lattice
+
+    lattice = structure.lattice
+    if repeats:
+        lattice = Lattice(lattice.matrix * [[n] for n in repeats])
+    return {
+        "name": "unit_cell",
+        "contents": [lattice.get_scene().to_json()],
+        "origin": origin,
+        "visible": True,
+    }
+
+
+def reduced_scene_dict(structure, legend, graph=None, repeats: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """Scene JSON for the "reduced" (with `graph`) or "atoms" (without) level,
+    optionally tiled na x nb x nc times (`repeats`)."""
+    origin = scene_origin(structure, repeats)
+    offsets = translations(structure.lattice, repeats) if repeats else None
+    groups = [atoms_group(structure, legend, origin, offsets)]
+    if graph is not None:
+        groups.append(bonds_group(structure, graph, legend, origin, offsets))
+    groups.append(unit_cell_group(structure, origin, repeats))
+    return {"name": "StructureGraph", "contents": groups, "origin": origin, "visible": True}
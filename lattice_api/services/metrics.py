@@ -0,0 +1,226 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Pipelines mark their stages with `stage("name")`. Stage durations and values such
+as n_sites are collected per call by `timed_call`, which works inside executor
+workers (threads or processes): the collected timings travel back with the result
+and are recorded into the histograms by the request handler. Outside `timed_call`,
+`stage()` and `note()` are no-ops.
+
+Env vars:
+- LATTICE_SERVER_TIMING: set to 1 to add a Server-Timing header with per-stage
+  durations to scene and export responses.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SITES_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+_BYTES_BUCKETS = tuple(float(4**i * 1024) for i in range(10))  # 1KB .. 256MB
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labelnames, labels)} {_fmt_num(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets=_LATENCY_BUCKETS) -> None:
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            series[idx] += 1
+            series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._values.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += n
+                    le = 'le="' + _fmt_num(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {int(cumulative)}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_fmt_num(series[-1])}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {int(cumulative)}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        self.name, self.help, self._read = name, help, read
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self._read())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_fmt_num(value)}"]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(
+    Counter("lattice_requests_total", "Pipeline requests by outcome.", ("pipeline", "outcome"))
+)
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("lattice_stage_seconds", "Per-stage latency of the scene and export pipelines.", ("pipeline", "stage"))
+)
+N_SITES = REGISTRY.register(
+    Histogram("lattice_structure_sites", "Number of sites of processed structures.", ("pipeline",), _SITES_BUCKETS)
+)
+PAYLOAD_BYTES = REGISTRY.register(
+    Histogram("lattice_payload_bytes", "Response payload sizes.", ("pipeline",), _BYTES_BUCKETS)
+)
+
+
+# ---- per-call stage collection -------------------------------------------------
+
+_current: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("lattice_stages", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as stage `name` of the current `timed_call` (no-op outside one)."""
+    stages = _current.get()
+    if stages is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = stages["timings"]
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+
+
+def note(name: str, value: Any) -> None:
+    """Attach a value (e.g. n_sites) to the current `timed_call`."""
+    stages = _current.get()
+    if stages is not None:
+        stages["values"][name] = value
+
+
+def timed_call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+    """Call fn and return (result, {"timings": {...}, "values": {...}}).
+
+    Top-level so it can be submitted to a process pool. If fn raises, the exception
+    propagates and the partial timings are dropped.
+    """
+    stages: Dict[str, Any] = {"timings": {}, "values": {}}
+    token = _current.set(stages)
+    try:
+        return fn(*args, **kwargs), stages
+    finally:
+        _current.reset(token)
+
+
+def record(pipeline: str, stages: Dict[str, Any]) -> None:
+    """Record stages collected by `timed_call` (or by a handler) into the histograms."""
+    for name, seconds in stages.get("timings", {}).items():
+        STAGE_SECONDS.observe(seconds, pipeline, name)
+    n_sites = stages.get("values", {}).get("n_sites")
+    if n_sites is not None:
+        N_SITES.observe(float(n_sites), pipeline)
+
+
+def server_timing_enabled() -> bool:
+    return os.getenv("LATTICE_SERVER_TIMING", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format timings (seconds) as a Server-Timing header value (milliseconds)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
+
+
+def finish_request(
+    pipeline: str,
+    outcome: str,
+    stages: Dict[str, Any],
+    started: float,
+    payload_size: Optional[int] = None,
+) -> Dict[str, str]:
+    """Record one handled request and return extra response headers.
+
+    `stages` holds worker-side timings plus any the handler measured itself; a
+    "total" stage (wall time since `started`) is added here.
+    """
+    stages.setdefault("timings", {})["total"] = time.perf_counter() - started
+    REQUESTS.inc(pipeline, outcome)
+    record(pipeline, stages)
+    if payload_size is not None:
+        PAYLOAD_BYTES.observe(float(payload_size), pipeline)
+    if server_timing_enabled():
+        return {"Server-Timing": server_timing_header(stages["timings"])}
+    return {}
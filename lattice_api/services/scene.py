@@ -1,107 +1,137 @@
+"""Scene rendering pipeline: structure -> bond graph -> scene.
+
+The bond graph is the expensive stage and depends only on the structure and the
+bond strategy, so it is cached by structure fingerprint (services/bonding.py).
+Display options - radius scheme, level of detail, axes - only re-run the cheap
+legend and scene stages; POST /api/scene/render uses this to re-render a stored
+upload.
+"""
+
 from __future__ import annotations
 
+import os
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import HTTPException, status
 
+from lattice_api.services.bonding import cached_structure_graph, graph_edges
+from lattice_api.services.cache import cif_content_id
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.encoding import dumps_json, encode_scene
+from lattice_api.services.legend import get_legend
+from lattice_api.services.lod import (
+    LOD_LEVELS,
+    bonds_group,
+    choose_lod,
+    default_primitive_budget,
+    reduced_scene_dict,
+    scene_origin,
+)
+from lattice_api.services.metrics import stage
+from lattice_api.services.supercell import Matrix, cell_count, diagonal, translations
 
-def structure_to_scene_dict(structure, *, radius_strategy: str = "uniform") -> dict:
-    """Convert a pymatgen Structure to CrystalToolkitScene JSON with bonds (cylinders).
+# Render with MP-like defaults: include image atoms, bonds outside cell, hide incomplete
+SCENE_RENDER_OPTIONS = {
+    "draw_image_atoms": True,
+    "bonded_sites_outside_unit_cell": True,
+    "hide_incomplete_edges": True,
+}
 
-    Implementation mirrors MP: build a StructureGraph using a near-neighbor
-    strategy, then render via CTK's StructureGraph renderer which includes
-    bonds as cylinder primitives.
+
+def axes_options(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Axes settings: the CT_AXES_* env defaults, updated with non-None `overrides`."""
+    options = {
+        "visible": True,
+        "mode": os.getenv("CT_AXES_MODE", "lattice").lower(),  # 'lattice' or 'cartesian'
+        "scale": float(os.getenv("CT_AXES_SCALE", "1.6")),
+        "head_length": float(os.getenv("CT_AXES_HEAD_LENGTH", "0.32")),
+        "head_width": float(os.getenv("CT_AXES_HEAD_WIDTH", "0.18")),
+        "radius": float(os.getenv("CT_AXES_RADIUS", "0.07")),
+    }
+    options.update({name: value for name, value in (overrides or {}).items() if value is not None})
+    return options
+
+
+def render_scene(structure, **options: Any) -> Tuple[dict, str]:
+    """Render a structure to CrystalToolkitScene JSON; see render_scene_graph."""
+    scene_json, level, _ = render_scene_graph(structure, **options)
+    return scene_json, level
+
+
+def render_scene_graph(
+    structure,
+    *,
+    radius_strategy: str = "uniform",
+    bond_strategy: str = "minimum_distance",
+    lod: str = "full",
+    primitive_budget: Optional[int] = None,
+    supercell: Optional[Matrix] = None,
+    axes: Optional[Dict[str, Any]] = None,
+    edges: Optional[bytes] = None,
+) -> Tuple[dict, str, Any]:
+    """Render a structure to CrystalToolkitScene JSON at the requested level of detail.
+
+    Returns (scene_json, level, graph) where level is the one actually rendered
+    ("auto" resolves to "full", "reduced" or "atoms" against `primitive_budget`;
+    see services/lod.py) and graph the bond graph it used (None for "atoms").
+
+    A diagonal `supercell` matrix is rendered by tiling the unit cell's "reduced"
+    (or, for lod=atoms and oversized auto, "atoms") geometry; other matrices build
+    the supercell first and render it like any structure.
+
+    `axes` overrides the CT_AXES_* settings (see `axes_options`). The bond graph
+    is rebuilt from `edges` when given (see services/bonding.py graph_edges), and
+    otherwise comes from the graph cache when the structure was rendered before.
     """
+    if lod != "auto" and lod not in LOD_LEVELS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown lod '{lod}'. Choose from: auto, {', '.join(LOD_LEVELS)}.",
+        )
     try:  # pragma: no cover - environment dependent
-        # Build bonding graph
-        from pymatgen.analysis.graphs import StructureGraph  # type: ignore
-        from pymatgen.analysis.local_env import MinimumDistanceNN  # type: ignore
-        from crystal_toolkit.core.legend import Legend  # type: ignore
-
         # Ensure CTK monkey-patches StructureGraph.get_scene
         from crystal_toolkit.renderables import structuregraph as _ct_structuregraph  # type: ignore  # noqa: F401
 
-        graph = StructureGraph.from_local_env_strategy(structure, MinimumDistanceNN())
+        budget = default_primitive_budget() if primitive_budget is None else primitive_budget
+        repeats = diagonal(supercell)
+        if supercell is not None and repeats is None:
+            with stage("supercell"):
+                structure = structure.make_supercell(supercell, in_place=False)
 
-        # Render with MP-like defaults: include image atoms, bonds outside cell, hide incomplete
-        # Use CTK default color scheme (configurable via CT_LEGEND_COLOR_SCHEME)
-        legend = Legend(structure, radius_scheme=radius_strategy)
-        scene_obj = graph.get_scene(
-            draw_image_atoms=True,
-            bonded_sites_outside_unit_cell=True,
-            hide_incomplete_edges=True,
-            legend=legend,
-        )
-        # Serialize to dict first to avoid numpy types leaking into Pydantic
-        scene_json = scene_obj.to_json()
-
-        # Append axes (arrows) using pure Python lists to avoid numpy arrays
-        try:
-            lat = getattr(structure, "lattice", None)
-            if lat is not None:
-                # Axes configuration via env
-                import os as _os
-                mode = _os.getenv("CT_AXES_MODE", "lattice").lower()  # 'lattice' or 'cartesian'
-                scale = float(_os.getenv("CT_AXES_SCALE", "1.6"))
-                head_len = float(_os.getenv("CT_AXES_HEAD_LENGTH", "0.32"))
-                head_wid = float(_os.getenv("CT_AXES_HEAD_WIDTH", "0.18"))
-                radius = float(_os.getenv("CT_AXES_RADIUS", "0.07"))
-
-                if mode == "cartesian":
-                    au, bu, cu = [scale, 0.0, 0.0], [0.0, scale, 0.0], [0.0, 0.0, scale]
-                else:
-                    m = lat.matrix  # 3x3
-                    # Normalize basis vectors
-
-                    def _norm(v):
-                        return (v[0] ** 2 + v[1] ** 2 + v[2] ** 2) ** 0.5 or 1.0
-
-                    a = [float(m[0][0]), float(m[0][1]), float(m[0][2])]
-                    b = [float(m[1][0]), float(m[1][1]), float(m[1][2])]
-                    c = [float(m[2][0]), float(m[2][1]), float(m[2][2])]
-                    an = _norm(a); bn = _norm(b); cn = _norm(c)
-                    au = [a[0] / an * scale, a[1] / an * scale, a[2] / an * scale]
-                    bu = [b[0] / bn * scale, b[1] / bn * scale, b[2] / bn * scale]
-                    cu = [c[0] / cn * scale, c[1] / cn * scale, c[2] / cn * scale]
-
-                axes_group = {
-                    "name": "axes",
-                    "contents": [
-                        {
-                            "type": "arrows",
-                            "positionPairs": [[[0.0, 0.0, 0.0], au]],
-                            "color": "red",
-                            "radius": radius,
-                            "headLength": head_len,
-                            "headWidth": head_wid,
-                            "clickable": False,
-                        },
-                        {
-                            "type": "arrows",
-                            "positionPairs": [[[0.0, 0.0, 0.0], bu]],
-                            "color": "green",
-                            "radius": radius,
-                            "headLength": head_len,
-                            "headWidth": head_wid,
-                            "clickable": False,
-                        },
-                        {
-                            "type": "arrows",
-                            "positionPairs": [[[0.0, 0.0, 0.0], cu]],
-                            "color": "blue",
-                            "radius": radius,
-                            "headLength": head_len,
-                            "headWidth": head_wid,
-                            "clickable": False,
-                        },
-                    ],
-                    "origin": scene_json.get("origin", [0.0, 0.0, 0.0]),
-                    "visible": True,
-                }
-                scene_json.setdefault("contents", []).append(axes_group)
-        except Exception:
-            # Axes are optional; ignore failures
-            pass
-
-        return scene_json
+        level = lod
+        graph = None
+        if repeats is not None:
+            n_total = len(structure) * repeats[0] * repeats[1] * repeats[2]
+            level = "atoms" if lod == "atoms" or (lod == "auto" and n_total > budget) else "reduced"
+        elif lod == "auto" and len(structure) > budget:
+            level = "atoms"
+        if level != "atoms":
+            # Build bonding graph
+            with stage("graph"):
+                graph = cached_structure_graph(structure, bond_strategy, edges)
+            if level == "auto":
+                level = choose_lod(len(structure), graph.graph.number_of_edges(), budget)
+
+        # Use CTK default color scheme (configurable via CT_LEGEND_COLOR_SCHEME);
+        # color/radius tables are shared across structures with the same species
+        with stage("legend"):
+            legend = get_legend(structure, radius_scheme=radius_strategy)
+        if level == "full":
+            with stage("get_scene"):
+                scene_obj = graph.get_scene(legend=legend, **SCENE_RENDER_OPTIONS)
+            # Serialize to dict first to avoid numpy types leaking into Pydantic
+            with stage("to_json"):
+                scene_json = scene_obj.to_json()
+        else:
+            with stage("get_scene"):
+                scene_json = reduced_scene_dict(
+                    structure, legend, graph if level == "reduced" else None, repeats=repeats
+                )
+
+        _append_axes(scene_json, structure, axes)
+        return scene_json, level, graph
+    except HTTPException:
+        raise
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -110,3 +140,221 @@ def structure_to_scene_dict(structure, *, radius_strategy: str = "uniform") -> d
                 "Ensure 'crystal-toolkit' and 'pymatgen' are installed and compatible."
             ),
         )
+
+
+def structure_to_scene_dict(
+    structure,
+    *,
+    radius_strategy: str = "uniform",
+    bond_strategy: str = "minimum_distance",
+    lod: str = "full",
+    primitive_budget: Optional[int] = None,
+    supercell: Optional[Matrix] = None,
+) -> dict:
+    """Convert a pymatgen Structure to CrystalToolkitScene JSON with bonds (cylinders).
+
+    Implementation mirrors MP: build a StructureGraph using a near-neighbor
+    strategy, then render via CTK's StructureGraph renderer which includes
+    bonds as cylinder primitives. `bond_strategy` selects the neighbor search
+    (see services/bonding.py); both strategies produce the same bonds. `lod`
+    selects a cheaper rendering for large structures (see services/lod.py) and
+    `supercell` a 3x3 integer matrix to render instead of the unit cell.
+    """
+    scene_json, _ = render_scene(
+        structure,
+        radius_strategy=radius_strategy,
+        bond_strategy=bond_strategy,
+        lod=lod,
+        primitive_budget=primitive_budget,
+        supercell=supercell,
+    )
+    return scene_json
+
+
+def _append_axes(scene_json: dict, structure, overrides: Optional[Dict[str, Any]] = None) -> None:
+    """Append axes (arrows) using pure Python lists to avoid numpy arrays."""
+    try:
+        lat = getattr(structure, "lattice", None)
+        options = axes_options(overrides)
+        if lat is not None and options["visible"]:
+            scale = float(options["scale"])
+            head_len = float(options["head_length"])
+            head_wid = float(options["head_width"])
+            radius = float(options["radius"])
+
+            if options["mode"] == "cartesian":
+                au, bu, cu = [scale, 0.0, 0.0], [0.0, scale, 0.0], [0.0, 0.0, scale]
+            else:
+                m = lat.matrix  # 3x3
+                # Normalize basis vectors
+
+                def _norm(v):
+                    return (v[0] ** 2 + v[1] ** 2 + v[2] ** 2) ** 0.5 or 1.0
+
+                a = [float(m[0][0]), float(m[0][1]), float(m[0][2])]
+                b = [float(m[1][0]), float(m[1][1]), float(m[1][2])]
+                c = [float(m[2][0]), float(m[2][1]), float(m[2][2])]
+                an = _norm(a); bn = _norm(b); cn = _norm(c)
+                au = [a[0] / an * scale, a[1] / an * scale, a[2] / an * scale]
+                bu = [b[0] / bn * scale, b[1] / bn * scale, b[2] / bn * scale]
+                cu = [c[0] / cn * scale, c[1] / cn * scale, c[2] / cn * scale]
+
+            axes_group = {
+                "name": "axes",
+                "contents": [
+                    {
+                        "type": "arrows",
+                        "positionPairs": [[[0.0, 0.0, 0.0], au]],
+                        "color": "red",
+                        "radius": radius,
+                        "headLength": head_len,
+                        "headWidth": head_wid,
+                        "clickable": False,
+                    },
+                    {
+                        "type": "arrows",
+                        "positionPairs": [[[0.0, 0.0, 0.0], bu]],
+                        "color": "green",
+                        "radius": radius,
+                        "headLength": head_len,
+                        "headWidth": head_wid,
+                        "clickable": False,
+                    },
+                    {
+                        "type": "arrows",
+                        "positionPairs": [[[0.0, 0.0, 0.0], cu]],
+                        "color": "blue",
+                        "radius": radius,
+                        "headLength": head_len,
+                        "headWidth": head_wid,
+                        "clickable": False,
+                    },
+                ],
+                "origin": scene_json.get("origin", [0.0, 0.0, 0.0]),
+                "visible": True,
+            }
+            scene_json.setdefault("contents", []).append(axes_group)
+    except Exception:
+        # Axes are optional; ignore failures
+        pass
+
+
+def structure_lattice_dict(structure, supercell: Optional[Matrix] = None) -> Dict[str, float]:
+    lattice = structure.lattice
+    if supercell is not None:
+        import numpy as np
+        from pymatgen.core import Lattice
+
+        lattice = Lattice(np.dot(supercell, lattice.matrix))
+    return {
+        "a": float(lattice.a),
+        "b": float(lattice.b),
+        "c": float(lattice.c),
+        "alpha": float(lattice.alpha),
+        "beta": float(lattice.beta),
+        "gamma": float(lattice.gamma),
+        "volume": float(lattice.volume),
+    }
+
+
+def build_scene_payload(data: bytes, **options: Any) -> bytes:
+    """Parse CIF bytes and return the serialized SceneResponse; see build_scene_payload_with_edges.
+
+    Top-level and bytes-in/bytes-out so it can run in a process pool worker.
+    """
+    return build_scene_payload_with_edges(data, **options)[0]
+
+
+def build_scene_payload_with_edges(
+    data: bytes,
+    *,
+    radius_strategy: str = "uniform",
+    bond_strategy: str = "minimum_distance",
+    lod: str = "full",
+    primitive_budget: Optional[int] = None,
+    supercell: Optional[Matrix] = None,
+    axes: Optional[Dict[str, Any]] = None,
+    encoding: str = "json",
+    edges: Optional[bytes] = None,
+) -> Tuple[bytes, Optional[bytes]]:
+    """Parse CIF bytes and return (serialized SceneResponse, bond graph edges).
+
+    `encoding` is "json" or "binary" (see services/encoding.py). `scene_id`
+    identifies the upload for follow-up requests: re-rendering it with other
+    options, or the bonds deferred by the "atoms" level. With `supercell`,
+    `lattice` and `n_sites` describe the rendered supercell.
+
+    The edges (services/bonding.py graph_edges) are returned when a graph was
+    built here, so the caller can keep them and pass them back as `edges` for
+    the next render of this CIF with the same bond strategy and supercell; they
+    are None when `edges` was given or the level has no bonds. The CIF itself is
+    parsed again on every call (the parse stage, small next to the graph).
+
+    Top-level and bytes-in/bytes-out so it can run in a process pool worker.
+    """
+    structure = parse_cif_bytes(data)
+
+    scene_dict, level, graph = render_scene_graph(
+        structure,
+        radius_strategy=radius_strategy,
+        bond_strategy=bond_strategy,
+        lod=lod,
+        primitive_budget=primitive_budget,
+        supercell=supercell,
+        axes=axes,
+        edges=edges,
+    )
+
+    try:
+        formula = structure.composition.reduced_formula
+    except Exception:
+        formula = str(getattr(structure, "formula", ""))
+
+    # The scene is already plain JSON data from to_json(); build the response
+    # document directly instead of validating it field by field through
+    # SceneResponse (whose schema still documents this shape)
+    doc = {
+        "scene": scene_dict,
+        "formula": formula,
+        "lattice": structure_lattice_dict(structure, supercell),
+        "n_sites": int(structure.num_sites) * (cell_count(supercell) if supercell else 1),
+        "source": "upload",
+        "lod": level,
+        "scene_id": cif_content_id(data),
+        "supercell": supercell,
+    }
+    new_edges = graph_edges(graph) if graph is not None and edges is None else None
+    with stage("serialize"):
+        if encoding == "binary":
+            return encode_scene(doc), new_edges
+        return dumps_json(doc), new_edges
+
+
+def build_bonds_payload(
+    data: bytes,
+    *,
+    bond_strategy: str = "minimum_distance",
+    supercell: Optional[Matrix] = None,
+    encoding: str = "json",
+) -> bytes:
+    """Serialized `{"scene_id", "bonds"}` for a CIF: the bonds group omitted by lod=atoms.
+
+    Geometry uses the same origin, half-bond batching and supercell tiling as the
+    "reduced" level.
+    """
+    structure = parse_cif_bytes(data)
+    repeats = diagonal(supercell)
+    if supercell is not None and repeats is None:
+        structure = structure.make_supercell(supercell, in_place=False)
+    with stage("graph"):
+        graph = cached_structure_graph(structure, bond_strategy)
+    with stage("legend"):
+        legend = get_legend(structure)
+    with stage("get_scene"):
+        offsets = translations(structure.lattice, repeats) if repeats else None
+        group = bonds_group(structure, graph, legend, scene_origin(structure, repeats), offsets)
+    doc = {"scene_id": cif_content_id(data), "bonds": group}
+    with stage("serialize"):
+        if encoding == "binary":
+            return encode_scene(doc)
+        return dumps_json(doc)
@@ -0,0 +1,369 @@
+"""Stateful editing sessions with incremental scene patches.
+
+An EditSession keeps a Structure and its bond graph for one client (the
+/api/scene/session WebSocket) and applies edits in place:
+
+- substitute: new species on some sites (bonds are geometric, so only the
+  colors and radii of those atoms and their half-bonds change);
+- delete: remove sites, and redo the bonding shells of the sites that had them
+  in theirs;
+- move: new coordinates for one site, and redo the shells of its old neighbors
+  and of the sites it now comes close to;
+- strain: scale the lattice (every position moves, so every shell is redone).
+
+Bonds follow the MinimumDistanceNN rule used by /api/scene (a neighbor is
+bonded when closer than (1 + tol) x the site's nearest-neighbor distance),
+tracked per site as bonding shells (services/bonding.py). The graph is the union
+of the shells, so an edit only searches around the sites it affects.
+
+The scene is the "reduced" level of services/lod.py with one primitive per atom
+and per half-bond, each with a stable `id` ("atom:<site id>",
+"bond:<site id>-<site id>:<image>:<end>"). Site ids survive deletions. After an
+edit the client gets a patch of removed ids and added and changed primitives,
+plus whole groups (unit cell, axes) when the lattice changes.
+
+Env vars:
+- LATTICE_SESSION_MAX: concurrent sessions per process (default 16).
+- LATTICE_SESSION_MAX_SITES: largest structure a session accepts (default 20000).
+- LATTICE_SESSION_IDLE_TIMEOUT: seconds without a message before a session is
+  closed (default 600).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from lattice_api.services.bonding import bonding_shells
+from lattice_api.services.legend import get_legend
+from lattice_api.services.lod import BOND_RADIUS, scene_origin, unit_cell_group
+from lattice_api.services.scene import _append_axes, structure_lattice_dict
+
+Image = Tuple[int, int, int]
+BondKey = Tuple[int, int, Image]
+
+BOND_TOL = 0.1
+EDIT_OPS = ("substitute", "delete", "move", "strain")
+
+
+def max_sessions() -> int:
+    return int(os.getenv("LATTICE_SESSION_MAX", "16"))
+
+
+def max_session_sites() -> int:
+    return int(os.getenv("LATTICE_SESSION_MAX_SITES", "20000"))
+
+
+def session_idle_timeout() -> float:
+    return float(os.getenv("LATTICE_SESSION_IDLE_TIMEOUT", "600"))
+
+
+class EditError(ValueError):
+    """An edit that cannot be applied; the session is left unchanged."""
+
+
+def _canonical(a: int, b: int, image: Image) -> BondKey:
+    """StructureGraph's edge convention, on site ids: a <= b, self-edges point "up"."""
+    if a > b or (a == b and next((x for x in image if x), 0) < 0):
+        return b, a, (-image[0], -image[1], -image[2])
+    return a, b, image
+
+
+def _bond_id(key: BondKey) -> str:
+    a, b, image = key
+    return f"bond:{a}-{b}:{image[0]},{image[1]},{image[2]}"
+
+
+class EditSession:
+    """A structure, its bonding shells and the scene primitives derived from them."""
+
+    def __init__(self, structure, radius_strategy: str = "uniform") -> None:
+        if len(structure) > max_session_sites():
+            raise EditError(f"Structure too large for an editing session. Max {max_session_sites()} sites.")
+        self.structure = structure.copy()
+        self.radius_strategy = radius_strategy
+        self.version = 0
+        self.ids: List[int] = list(range(len(structure)))
+        self._next_id = len(structure)
+        self._index: Dict[int, int] = {site_id: i for i, site_id in enumerate(self.ids)}
+        # shells[i]: (neighbor id, image) bonded from site i; holders[j]: sites with j in their shell
+        self.shells: Dict[int, List[Tuple[int, Image]]] = {}
+        self.holders: Dict[int, Set[int]] = {site_id: set() for site_id in self.ids}
+        self.nearest: Dict[int, float] = {}
+        self.edges: Dict[BondKey, int] = {}
+        self._legend = None
+        self._update_shells(self.ids)
+
+    # Bond bookkeeping
+
+    def _update_shells(
+        self, site_ids: Iterable[int], recompute: bool = True
+    ) -> Tuple[Set[BondKey], Set[BondKey]]:
+        """Recompute (or with `recompute=False` drop) the shells of `site_ids`; return
+        (bonds added, bonds removed)."""
+        site_ids = sorted(set(site_ids))
+        added: Set[BondKey] = set()
+        removed: Set[BondKey] = set()
+        for site_id in site_ids:
+            for neighbor, image in self.shells.pop(site_id, []):
+                self.holders.get(neighbor, set()).discard(site_id)
+                key = _canonical(site_id, neighbor, image)
+                self.edges[key] -= 1
+                if not self.edges[key]:
+                    del self.edges[key]
+                    removed.add(key)
+            self.nearest.pop(site_id, None)
+        if not site_ids or not recompute:
+            return added, removed
+
+        frm, to, images, distances = bonding_shells(
+            self.structure, [self._index[i] for i in site_ids], tol=BOND_TOL, strict=False
+        )
+        for site_id in site_ids:
+            self.shells[site_id] = []
+        for i, j, image, d in zip(frm.tolist(), to.tolist(), images.tolist(), distances.tolist()):
+            site_id, neighbor = self.ids[i], self.ids[j]
+            image = (image[0], image[1], image[2])
+            self.shells[site_id].append((neighbor, image))
+            self.holders[neighbor].add(site_id)
+            self.nearest[site_id] = min(d, self.nearest.get(site_id, d))
+            key = _canonical(site_id, neighbor, image)
+            count = self.edges.get(key, 0)
+            self.edges[key] = count + 1
+            if not count:
+                added.add(key)
+        return added - removed, removed - added
+
+    # Scene primitives
+
+    def legend(self):
+        if self._legend is None:
+            self._legend = get_legend(self.structure, radius_scheme=self.radius_strategy)
+        return self._legend
+
+    def _style(self, index: int) -> Tuple[str, float]:
+        site = self.structure[index]
+        species = max(site.species.items(), key=lambda item: item[1])[0]
+        legend = self.legend()
+        return legend.get_color(species), legend.get_radius(species)
+
+    def atom_primitives(self, site_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        cart = self.structure.cart_coords
+        primitives = []
+        for site_id in site_ids:
+            index = self._index[site_id]
+            color, radius = self._style(index)
+            primitives.append(
+                {
+                    "id": f"atom:{site_id}",
+                    "type": "spheres",
+                    "positions": [cart[index].tolist()],
+                    "color": color,
+                    "radius": radius,
+                    "clickable": True,
+                }
+            )
+        return primitives
+
+    def bond_primitives(self, keys: Iterable[BondKey]) -> List[Dict[str, Any]]:
+        """Two half-bond cylinders per bond, colored by their own end (as services/lod.py)."""
+        import numpy as np
+
+        keys = list(keys)
+        if not keys:
+            return []
+        a = np.array([self._index[k[0]] for k in keys], dtype=np.int64)
+        b = np.array([self._index[k[1]] for k in keys], dtype=np.int64)
+        images = np.array([k[2] for k in keys], dtype=float)
+        cart = self.structure.cart_coords
+        far = self.structure.lattice.get_cartesian_coords(self.structure.frac_coords[b] + images)
+        half = (far - cart[a]) / 2.0
+        starts_a, ends_a = cart[a].tolist(), (cart[a] + half).tolist()
+        starts_b, ends_b = cart[b].tolist(), (cart[b] - half).tolist()
+        colors = {}
+        primitives = []
+        for k, key in enumerate(keys):
+            bond_id = _bond_id(key)
+            for end, index, pair in ((0, a[k], (starts_a[k], ends_a[k])), (1, b[k], (starts_b[k], ends_b[k]))):
+                index = int(index)
+                if index not in colors:
+                    colors[index] = self._style(index)[0]
+                primitives.append(
+                    {
+                        "id": f"{bond_id}:{end}",
+                        "type": "cylinders",
+                        "positionPairs": [list(pair)],
+                        "color": colors[index],
+                        "radius": BOND_RADIUS,
+                        "clickable": True,
+                    }
+                )
+        return primitives
+
+    def _bonds_of(self, site_ids: Set[int]) -> Set[BondKey]:
+        keys = set()
+        for site_id in site_ids:
+            for neighbor, image in self.shells.get(site_id, []):
+                keys.add(_canonical(site_id, neighbor, image))
+            for holder in self.holders.get(site_id, ()):
+                for neighbor, image in self.shells[holder]:
+                    if neighbor == site_id:
+                        keys.add(_canonical(holder, neighbor, image))
+        return keys
+
+    def _lattice_groups(self) -> List[Dict[str, Any]]:
+        origin = scene_origin(self.structure)
+        doc = {"contents": [unit_cell_group(self.structure, origin)], "origin": origin}
+        _append_axes(doc, self.structure)
+        return doc["contents"]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "formula": self.structure.composition.reduced_formula,
+            "lattice": structure_lattice_dict(self.structure),
+            "n_sites": len(self.structure),
+        }
+
+    def scene(self) -> Dict[str, Any]:
+        """The whole scene; later edits are sent as patches against it."""
+        origin = scene_origin(self.structure)
+        groups = [
+            {"name": "atoms", "contents": self.atom_primitives(self.ids), "origin": origin, "visible": True},
+            {"name": "bonds", "contents": self.bond_primitives(self.edges), "origin": origin, "visible": True},
+        ]
+        groups.extend(self._lattice_groups())
+        return {"name": "StructureGraph", "contents": groups, "origin": origin, "visible": True}
+
+    # Edits
+
+    def _site_indices(self, site_ids: Any) -> List[int]:
+        if isinstance(site_ids, int) and not isinstance(site_ids, bool):
+            site_ids = [site_ids]
+        if not isinstance(site_ids, list) or not site_ids:
+            raise EditError("'sites' must be a non-empty list of site ids.")
+        invalid = [s for s in site_ids if not isinstance(s, int) or isinstance(s, bool)]
+        if invalid:
+            raise EditError(f"Site ids must be integers, got: {invalid[:10]}")
+        unknown = [s for s in site_ids if s not in self._index]
+        if unknown:
+            raise EditError(f"Unknown site ids: {unknown[:10]}")
+        return sorted({self._index[s] for s in site_ids})
+
+    def apply(self, edit: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one edit and return its patch.
+
+        Raises EditError for invalid edits, before anything changes.
+        """
+        op = edit.get("op")
+        if op not in EDIT_OPS:
+            raise EditError(f"Unknown op '{op}'. Choose from: {', '.join(EDIT_OPS)}.")
+        bonds_before = None
+        lattice_changed = False
+        if op == "substitute":
+            changed_atoms, added, removed, gone = self._substitute(edit)
+        elif op == "delete":
+            changed_atoms, added, removed, gone = self._delete(edit)
+        elif op == "move":
+            changed_atoms, added, removed, gone = self._move(edit)
+        else:
+            bonds_before = set(self.edges)
+            changed_atoms, added, removed, gone = self._strain(edit)
+            lattice_changed = True
+        self.version += 1
+
+        # Surviving bonds that touch a changed atom are redrawn
+        if bonds_before is not None:
+            changed_bonds = bonds_before & set(self.edges)
+        else:
+            changed_bonds = self._bonds_of(changed_atoms) - added
+        patch: Dict[str, Any] = {
+            "type": "patch",
+            **self.summary(),
+            "removed": [f"atom:{s}" for s in sorted(gone)]
+            + [f"{_bond_id(key)}:{end}" for key in sorted(removed) for end in (0, 1)],
+            "added": self.bond_primitives(sorted(added)),
+            "changed": self.atom_primitives(sorted(changed_atoms)) + self.bond_primitives(sorted(changed_bonds)),
+        }
+        if lattice_changed:
+            patch["origin"] = scene_origin(self.structure)
+            patch["groups"] = self._lattice_groups()
+        return patch
+
+    def _substitute(self, edit: Dict[str, Any]):
+        from pymatgen.core.periodic_table import DummySpecies, get_el_sp
+
+        indices = self._site_indices(edit.get("sites"))
+        try:
+            species = get_el_sp(edit.get("species"))
+        except Exception:
+            species = None
+        # get_el_sp turns unknown symbols into dummy species
+        if species is None or isinstance(species, DummySpecies):
+            raise EditError(f"Invalid species: {edit.get('species')!r}")
+        for index in indices:
+            site = self.structure[index]
+            self.structure.replace(index, species, site.frac_coords, properties=site.properties, label=site.label)
+        self._legend = None
+        return {self.ids[i] for i in indices}, set(), set(), set()
+
+    def _delete(self, edit: Dict[str, Any]):
+        indices = self._site_indices(edit.get("sites"))
+        if len(indices) >= len(self.structure):
+            raise EditError("Cannot delete every site.")
+        gone = {self.ids[i] for i in indices}
+        affected = set().union(*(self.holders[s] for s in gone)) - gone
+        # Bonds also held by surviving sites go when those shells are redone
+        _, removed = self._update_shells(gone, recompute=False)
+        self.structure.remove_sites(indices)
+        self.ids = [s for s in self.ids if s not in gone]
+        self._index = {site_id: i for i, site_id in enumerate(self.ids)}
+        for site_id in gone:
+            self.holders.pop(site_id, None)
+            self.shells.pop(site_id, None)
+        added, removed_more = self._update_shells(affected)
+        self._legend = None
+        return set(), added, removed | removed_more, gone
+
+    def _move(self, edit: Dict[str, Any]):
+        import numpy as np
+
+        indices = self._site_indices(edit.get("site"))
+        if len(indices) != 1:
+            raise EditError("'move' takes one site.")
+        index = indices[0]
+        coords = edit.get("coords")
+        try:
+            coords = np.array(coords, dtype=float).reshape(3)
+        except Exception:
+            raise EditError("'coords' must be three numbers.")
+        if not np.all(np.isfinite(coords)):
+            raise EditError("'coords' must be finite.")
+
+        site_id = self.ids[index]
+        affected = {site_id} | self.holders[site_id]
+        if edit.get("cartesian", False):
+            coords = self.structure.lattice.get_fractional_coords(coords)
+        site = self.structure[index]
+        self.structure.replace(index, site.species, coords % 1.0, properties=site.properties, label=site.label)
+        # Sites whose shell the moved site now enters
+        reach = (1 + BOND_TOL) * max(self.nearest.values(), default=0.0)
+        point = self.structure[index].coords
+        for neighbor in self.structure.get_sites_in_sphere(point, reach):
+            other = self.ids[neighbor.index]
+            if neighbor.nn_distance < (1 + BOND_TOL) * self.nearest.get(other, float("inf")):
+                affected.add(other)
+        added, removed = self._update_shells(affected)
+        return {site_id}, added, removed, set()
+
+    def _strain(self, edit: Dict[str, Any]):
+        strain = edit.get("strain")
+        try:
+            values = [float(strain)] * 3 if isinstance(strain, (int, float)) else [float(x) for x in strain]
+        except Exception:
+            raise EditError("'strain' must be a number or three numbers (a, b, c).")
+        if len(values) != 3 or any(not -0.5 < x < 1.0 for x in values):
+            raise EditError("'strain' must be a number or three numbers (a, b, c), each in (-0.5, 1).")
+        self.structure.apply_strain(values)
+        added, removed = self._update_shells(self.ids)
+        return set(self.ids), added, removed, set()
@@ -0,0 +1,99 @@
+"""Supercell requests for scene rendering.
+
+A diagonal matrix with positive entries (NxMxK) is rendered by computing the bond graph and styles on
+the unit cell once and broadcasting atom and half-bond geometry over the lattice
+translations (see services/lod.py). Other matrices build the supercell with
+pymatgen and go through the regular path.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import List, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+
+MAX_SUPERCELL_CELLS = 1000  # 10x10x10
+
+Matrix = List[List[int]]
+
+
+def _bad(message: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid supercell: {message}")
+
+
+def parse_supercell(spec: Optional[str]) -> Optional[Matrix]:
+    """Parse "2x2x2", "2,2,2", "2 2 2", nine integers or a JSON 3x3 list into a 3x3 matrix.
+
+    Returns None for an empty spec or the identity. Raises HTTP 400 for anything
+    that is not an integer matrix with positive determinant, or larger than
+    MAX_SUPERCELL_CELLS unit cells.
+    """
+    if spec is None or not spec.strip():
+        return None
+    text = spec.strip()
+    try:
+        if text.startswith("["):
+            values = json.loads(text)
+            flat = [v for row in values for v in row] if isinstance(values[0], list) else list(values)
+        else:
+            flat = [int(v) for v in re.split(r"[\sx,;]+", text.lower()) if v]
+    except (ValueError, TypeError, IndexError):
+        raise _bad("expected 3 or 9 integers, e.g. '2x2x2'") from None
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in flat):
+        raise _bad("entries must be integers")
+    if len(flat) == 3:
+        matrix = [[flat[0], 0, 0], [0, flat[1], 0], [0, 0, flat[2]]]
+    elif len(flat) == 9:
+        matrix = [flat[0:3], flat[3:6], flat[6:9]]
+    else:
+        raise _bad("expected 3 or 9 integers, e.g. '2x2x2'")
+
+    cells = cell_count(matrix)
+    if cells <= 0:
+        raise _bad("determinant must be positive")
+    if cells > MAX_SUPERCELL_CELLS:
+        raise _bad(f"{cells} unit cells requested, max {MAX_SUPERCELL_CELLS}")
+    if matrix == [[1, 0, 0], [0, 1, 0], [0, 0, 1]]:
+        return None
+    return matrix
+
+
+def cell_count(m: Matrix) -> int:
+    """Number of unit cells in the supercell (the matrix determinant)."""
+    return (
+        m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+        - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+        + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0])
+    )
+
+
+def diagonal(matrix: Optional[Matrix]) -> Optional[Sequence[int]]:
+    """The (na, nb, nc) repeats of a diagonal matrix with positive entries, else None.
+
+    Negative entries (e.g. "-1,-1,1", determinant still positive) flip axes, which
+    tiling cannot express; such matrices are built with pymatgen instead.
+    """
+    if matrix is None:
+        return None
+    if any(matrix[i][j] for i in range(3) for j in range(3) if i != j):
+        return None
+    repeats = (matrix[0][0], matrix[1][1], matrix[2][2])
+    return repeats if min(repeats) > 0 else None
+
+
+def supercell_spec(matrix: Optional[Matrix]) -> Optional[str]:
+    """Canonical string form, used in cache keys."""
+    if matrix is None:
+        return None
+    return ",".join(str(v) for row in matrix for v in row)
+
+
+def translations(lattice, repeats: Sequence[int]):
+    """Cartesian offsets of every unit cell in an na x nb x nc tiling, shape (na*nb*nc, 3)."""
+    import numpy as np
+
+    grid = np.stack(np.meshgrid(*(np.arange(n) for n in repeats), indexing="ij"), axis=-1).reshape(-1, 3)
+    return grid @ lattice.matrix
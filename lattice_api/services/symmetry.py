@@ -0,0 +1,109 @@
+"""Memoized symmetry analysis.
+
+Exports of the same structure (CIF, POSCAR, MPR zip, primitive/conventional cells)
+used to run spglib again on every request. Results are cached per process by
+structure fingerprint and symprec, and each derived product (primitive cell,
+conventional cell, symmetrized CIF) is computed on first use only.
+
+Env vars:
+- LATTICE_SYMMETRY_CACHE_MAX_BYTES: memory budget of the cache per process, estimated from
+  the site count of each structure (default 64MB, 0 disables).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from lattice_api.services.cache import LRUCache
+
+
+# Estimated memory of a cached result: the structure copy and the analyzer come to
+# about 3.5KB per site; the derived cells and CIF text can add as much again
+SYMMETRY_BYTES_PER_SITE = 8 * 1024
+SYMMETRY_BASE_BYTES = 32 * 1024
+
+def structure_fingerprint(structure) -> str:
+    """Stable hash of lattice, species, labels and fractional coordinates.
+
+    Values are rounded to 1e-8 so float noise from serialization round-trips does
+    not produce distinct keys.
+    """
+    import numpy as np
+
+    h = hashlib.sha256()
+    h.update(np.round(structure.lattice.matrix, 8).tobytes())
+    h.update(np.round(structure.frac_coords, 8).tobytes())
+    for site in structure:
+        h.update(f"{site.species_string}|{getattr(site, 'label', '')}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+class SymmetryResult:
+    """Spacegroup data and standard cells for one structure at one symprec."""
+
+    def __init__(self, structure, symprec: float) -> None:
+        from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+
+        self.symprec = symprec
+        self._structure = structure.copy()
+        self.n_sites = len(self._structure)
+        self._analyzer = SpacegroupAnalyzer(self._structure, symprec=symprec)
+        self.spacegroup_symbol: str = self._analyzer.get_space_group_symbol()
+        self.spacegroup_number: int = self._analyzer.get_space_group_number()
+        self.crystal_system: str = self._analyzer.get_crystal_system()
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, build):
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+    @property
+    def primitive(self):
+        """Primitive standard cell (a copy; safe to mutate)."""
+        return self._get("primitive", self._analyzer.get_primitive_standard_structure).copy()
+
+    @property
+    def conventional(self):
+        """Conventional standard cell (a copy; safe to mutate)."""
+        return self._get("conventional", self._analyzer.get_conventional_standard_structure).copy()
+
+    def symmetrized_cif(self) -> str:
+        """CIF text as written by CifWriter(structure, symprec=self.symprec)."""
+        from pymatgen.io.cif import CifWriter
+
+        return self._get("cif", lambda: str(CifWriter(self._structure, symprec=self.symprec)))
+
+
+_cache: Optional[LRUCache] = None
+_cache_lock = threading.Lock()
+
+
+def _result_size(result: SymmetryResult) -> int:
+    return SYMMETRY_BASE_BYTES + SYMMETRY_BYTES_PER_SITE * result.n_sites
+
+
+def get_symmetry_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_bytes = int(os.getenv("LATTICE_SYMMETRY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+                _cache = LRUCache(max_bytes=max_bytes, sizeof=_result_size)
+    return _cache
+
+
+def get_symmetry(structure, symprec: float = 1e-3) -> SymmetryResult:
+    """Return the (possibly cached) symmetry analysis of `structure`."""
+    cache = get_symmetry_cache()
+    key = (structure_fingerprint(structure), float(symprec))
+    result = cache.get(key)
+    if result is None:
+        result = SymmetryResult(structure, symprec)
+        cache.put(key, result)
+    return result
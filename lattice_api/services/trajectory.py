@@ -0,0 +1,238 @@
+"""Trajectory scenes (relaxations, MD) with a shared bond topology.
+
+Rendering every frame with `structure_to_scene_dict` repeats the bond search and
+the whole scene per frame. A trajectory is returned instead as:
+
+- `scene`: a static template at the "reduced" level (services/lod.py) rendered
+  from the first frame. Its atom batches list the site indices they draw
+  (`sites`), so a client can move them with the per-frame positions.
+- `topologies`: `[{"frame": k, "bonds": [[i, j, a, b, c], ...]}]`, i.e. site i is
+  bonded to site j in image (a, b, c) from frame k on. The bond graph is only
+  rebuilt once an atom has moved more than LATTICE_TRAJECTORY_REBUILD_DISTANCE
+  since the last build, and a new entry is added only if the bonds changed.
+- `frames`: Cartesian positions per frame in site order, unwrapped across
+  periodic boundaries so atoms move continuously (bond images refer to these
+  unwrapped positions). The binary encoding carries them as one float32 array
+  (`framePositions`); JSON carries integer deltas from the previous frame in
+  units of `scale` Angstrom.
+- `lattice`: the first frame's lattice matrix, plus `frameLattices` only when the
+  cell changes along the trajectory.
+
+Inputs are multi-block CIFs (one frame per data block, see services/cif.py) and
+VASP XDATCAR files.
+
+Env vars:
+- LATTICE_TRAJECTORY_REBUILD_DISTANCE: displacement in Angstrom that triggers a
+  bond graph rebuild (default 0.3).
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from lattice_api.services.bonding import build_structure_graph
+from lattice_api.services.cif import cif_block_spans, iter_cif_blocks, parse_cif_bytes
+from lattice_api.services.encoding import dumps_json, encode_scene
+from lattice_api.services.legend import get_legend
+from lattice_api.services.lod import atoms_group, bonds_group, scene_origin, unit_cell_group
+from lattice_api.services.metrics import note, stage
+
+
+MAX_TRAJECTORY_FRAMES = 5000
+POSITION_SCALE = 1e-4  # Angstrom per unit in the JSON delta encoding
+
+Edge = Tuple[int, int, int, int, int]
+
+
+def rebuild_distance() -> float:
+    return float(os.getenv("LATTICE_TRAJECTORY_REBUILD_DISTANCE", "0.3"))
+
+
+def is_xdatcar(filename: Optional[str]) -> bool:
+    return "XDATCAR" in os.path.basename(filename or "").upper()
+
+
+def ensure_trajectory_filename(filename: Optional[str]) -> None:
+    """Raise HTTP 400 unless the upload is a .cif or an XDATCAR."""
+    if not ((filename or "").lower().endswith(".cif") or is_xdatcar(filename)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only multi-block .cif files and XDATCAR files are accepted.",
+        )
+
+
+def _parse_xdatcar(data: bytes) -> List[Any]:
+    from pymatgen.io.vasp.outputs import Xdatcar  # type: ignore
+
+    # Xdatcar only reads from a path
+    fd, path = tempfile.mkstemp(prefix="XDATCAR-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return list(Xdatcar(path).structures)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Failed to parse XDATCAR: {exc}",
+        ) from exc
+    finally:
+        os.unlink(path)
+
+
+def _check_frame_count(n_frames: int) -> None:
+    if n_frames > MAX_TRAJECTORY_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many frames. Max {MAX_TRAJECTORY_FRAMES}.",
+        )
+
+
+def parse_trajectory(data: bytes, filename: Optional[str]) -> List[Any]:
+    """Parse the frames of a trajectory upload into Structures with identical sites.
+
+    Raises HTTP 422 on parse failure or when frames differ in their sites, 413
+    over MAX_TRAJECTORY_FRAMES frames (counted from the block or configuration
+    headers, before any frame is parsed).
+    """
+    if is_xdatcar(filename):
+        _check_frame_count(data.count(b"configuration="))
+        with stage("parse"):
+            frames = _parse_xdatcar(data)
+    else:
+        _check_frame_count(sum(1 for _ in cif_block_spans(data)))
+        # Keep every frame's cell and site order: no primitive reduction
+        frames = [parse_cif_bytes(block, primitive=False) for _, block in iter_cif_blocks(data)]
+        if not frames:
+            frames = [parse_cif_bytes(data, primitive=False)]
+    _check_frame_count(len(frames))
+    species = [site.species for site in frames[0]]
+    for k, frame in enumerate(frames[1:], start=1):
+        if len(frame) != len(species) or any(site.species != sp for site, sp in zip(frame, species)):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Frame {k} does not have the same sites as frame 0.",
+            )
+    note("n_sites", len(species))
+    return frames
+
+
+def unwrapped_coords(frames: List[Any]):
+    """(frac, cart, lattices) arrays of shape (frames, n, 3), (frames, n, 3), (frames, 3, 3).
+
+    Fractional steps between consecutive frames are taken to the nearest image,
+    so an atom crossing a cell face keeps moving instead of jumping back.
+    """
+    import numpy as np
+
+    wrapped = np.stack([frame.frac_coords for frame in frames])
+    steps = np.diff(wrapped, axis=0)
+    steps -= np.round(steps)
+    frac = np.concatenate([wrapped[:1], wrapped[:1] + np.cumsum(steps, axis=0)])
+    lattices = np.stack([frame.lattice.matrix for frame in frames])
+    return frac, np.einsum("fij,fjk->fik", frac, lattices), lattices
+
+
+def _edges(graph, shifts) -> Set[Edge]:
+    """Bond set with images relative to unwrapped positions (`shifts` = unwrapped - wrapped cell)."""
+    edges: Set[Edge] = set()
+    for u, v, image in graph.graph.edges(data="to_jimage"):
+        a, b, c = (int(image[i] + shifts[u][i] - shifts[v][i]) for i in range(3))
+        # The same bond seen from the other end
+        edges.add(min((u, v, a, b, c), (v, u, -a, -b, -c)))
+    return edges
+
+
+def topology_segments(
+    frames: List[Any], frac, cart, graph, bond_strategy: str, tolerance: float
+) -> List[Tuple[int, Set[Edge]]]:
+    """[(first_frame, bonds)], starting from frame 0's `graph` and rebuilding only
+    after large displacements."""
+    import numpy as np
+
+    def build(k: int, graph=None) -> Set[Edge]:
+        if graph is None:
+            graph = build_structure_graph(frames[k], bond_strategy)
+        return _edges(graph, np.rint(frac[k] - frames[k].frac_coords).astype(int))
+
+    segments = [(0, build(0, graph))]
+    reference = 0
+    for k in range(1, len(frames)):
+        moved = float(np.linalg.norm(cart[k] - cart[reference], axis=1).max())
+        if moved <= tolerance:
+            continue
+        reference = k
+        edges = build(k)
+        if edges != segments[-1][1]:
+            segments.append((k, edges))
+    return segments
+
+
+def build_trajectory_payload(
+    data: bytes,
+    *,
+    filename: Optional[str] = None,
+    radius_strategy: str = "uniform",
+    bond_strategy: str = "minimum_distance",
+    encoding: str = "json",
+) -> bytes:
+    """Parse a trajectory upload and return the serialized TrajectoryResponse.
+
+    Top-level and bytes-in/bytes-out so it can run in a process pool worker.
+    """
+    import numpy as np
+
+    frames = parse_trajectory(data, filename)
+    first = frames[0]
+    frac, cart, lattices = unwrapped_coords(frames)
+
+    with stage("graph"):
+        graph = build_structure_graph(first, bond_strategy)
+        segments = topology_segments(frames, frac, cart, graph, bond_strategy, rebuild_distance())
+    with stage("legend"):
+        legend = get_legend(first, radius_strategy)
+    with stage("get_scene"):
+        origin = scene_origin(first)
+        scene = {
+            "name": "StructureGraph",
+            "contents": [
+                atoms_group(first, legend, origin, with_sites=True),
+                bonds_group(first, graph, legend, origin),
+                unit_cell_group(first, origin),
+            ],
+            "origin": origin,
+            "visible": True,
+        }
+
+    if encoding == "binary":
+        positions: Dict[str, Any] = {"encoding": "float32", "framePositions": cart}
+    else:
+        quantized = np.rint(cart.reshape(len(frames), -1) / POSITION_SCALE).astype(np.int64)
+        deltas = np.concatenate([quantized[:1], np.diff(quantized, axis=0)])
+        positions = {"encoding": "delta", "scale": POSITION_SCALE, "positions": deltas}
+    variable_cell = not np.allclose(lattices, lattices[0], atol=1e-8)
+
+    try:
+        formula = first.composition.reduced_formula
+    except Exception:
+        formula = first.formula
+    doc = {
+        "formula": formula,
+        "n_sites": len(first),
+        "n_frames": len(frames),
+        "source": "upload",
+        "scene": scene,
+        "topologies": [
+            {"frame": start, "bonds": sorted(list(edge) for edge in edges)} for start, edges in segments
+        ],
+        "lattice": lattices[0],
+        "frameLattices": lattices if variable_cell else None,
+        "frames": positions,
+    }
+    with stage("serialize"):
+        if encoding == "binary":
+            return encode_scene(doc)
+        return dumps_json(doc)
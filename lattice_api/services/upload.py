@@ -0,0 +1,70 @@
+"""Early request-size limits for upload endpoints.
+
+Starlette's multipart parser spools a whole file part to memory/disk before the
+endpoint runs, so a size check in the endpoint only fires after the upload has
+been received. This middleware rejects oversized bodies at the ASGI layer: from
+Content-Length before any body is read, and by counting bytes as they arrive for
+chunked requests.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from lattice_api.services.cif import MAX_UPLOAD_SIZE, upload_too_large
+
+# Room for the multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """Reply 413 to POST bodies over `max_bytes` on the given paths."""
+
+    def __init__(
+        self,
+        app,
+        *,
+        paths: Iterable[str],
+        max_bytes: int = MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD,
+        detail: Optional[str] = None,
+    ) -> None:
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+        self.detail = detail
+
+    def _too_large(self) -> HTTPException:
+        exc = upload_too_large()
+        if self.detail is not None:
+            exc.detail = self.detail
+        return exc
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                exc = self._too_large()
+                response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+                await response(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI re-raises HTTPExceptions from there
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
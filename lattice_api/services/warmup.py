@@ -0,0 +1,90 @@
+"""Startup policy: lazy heavy imports by default, opt-in warmup.
+
+Importing the app never imports pymatgen/crystal_toolkit; the first request that
+needs them pays the cost. With LATTICE_WARMUP=1 the app lifespan instead imports
+them and renders a tiny built-in structure once (in this process and in every
+executor worker) right after startup, and readiness stays false until that is done.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict
+
+# Two-site CsCl cell: exercises parsing, bonding, legend and scene rendering
+WARMUP_CIF = b"""data_CsCl
+_cell_length_a 4.123
+_cell_length_b 4.123
+_cell_length_c 4.123
+_cell_angle_alpha 90
+_cell_angle_beta 90
+_cell_angle_gamma 90
+_symmetry_space_group_name_H-M 'P 1'
+loop_
+_symmetry_equiv_pos_as_xyz
+'x, y, z'
+loop_
+_atom_site_type_symbol
+_atom_site_label
+_atom_site_fract_x
+_atom_site_fract_y
+_atom_site_fract_z
+_atom_site_occupancy
+Cs Cs1 0.0 0.0 0.0 1
+Cl Cl1 0.5 0.5 0.5 1
+"""
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"ready": True, "warmup": "disabled", "seconds": None, "error": None}
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("LATTICE_WARMUP", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def render_warmup_structure() -> int:
+    """Import heavy modules and render the built-in structure; returns payload size."""
+    from lattice_api.services.executor import warm_worker
+    from lattice_api.services.scene import build_scene_payload
+
+    warm_worker()
+    return len(build_scene_payload(WARMUP_CIF))
+
+
+def readiness() -> Dict[str, Any]:
+    with _lock:
+        return dict(_state)
+
+
+def _set_state(**values: Any) -> None:
+    with _lock:
+        _state.update(values)
+
+
+def mark_starting() -> None:
+    _set_state(ready=False, warmup="running", seconds=None, error=None)
+
+
+async def run_warmup() -> None:
+    """Warm this process and the executor pool, then flag the app as ready.
+
+    A failed warmup still marks the app ready (requests fall back to lazy imports)
+    but records the error for /health.
+    """
+    from lattice_api.services.executor import get_executor
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.to_thread(render_warmup_structure)
+        executor = get_executor()
+        await asyncio.to_thread(executor.warm)
+        await asyncio.gather(
+            *(executor.run(render_warmup_structure, wait=True) for _ in range(executor.max_workers))
+        )
+    except Exception as exc:
+        _set_state(ready=True, warmup="failed", seconds=time.perf_counter() - t0, error=str(exc))
+        return
+    _set_state(ready=True, warmup="done", seconds=time.perf_counter() - t0, error=None)
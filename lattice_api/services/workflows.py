@@ -1,9 +1,355 @@
-"""
-Workflow orchestration placeholders.
+"""Background jobs for long-running renders and exports.
+
+Work that can outlast client or proxy timeouts (large scenes, MPRelaxSet
+exports) is submitted as a job instead: submit -> job id -> poll or follow
+server-sent events -> fetch the result. No external broker is involved:
+
+- a bounded in-process queue with priority lanes ("high", "normal", "low");
+  submissions beyond LATTICE_JOB_MAX_QUEUE waiting jobs get 503 + Retry-After;
+- a few dispatcher threads that run jobs on the shared executor pool
+  (services/executor.py), one job each at a time;
+- a result store that keeps job status and result bytes until LATTICE_JOB_TTL
+  seconds after the job finished: in memory, or as files under LATTICE_JOBS_DIR
+  so every server process can answer for jobs submitted to any of them.
+
+Env vars:
+- LATTICE_JOB_WORKERS: dispatcher threads, i.e. jobs running at once (default: executor workers).
+- LATTICE_JOB_MAX_QUEUE: waiting jobs before submissions are rejected (default 100).
+- LATTICE_JOB_TTL: seconds results are kept after a job finishes (default 3600).
+- LATTICE_JOBS_DIR: directory for the shared file store; in-memory if unset.
 
-Roadmap:
-- Integrate VASP band/DOS calculations.
-- Add Agents/MCP agents to validate generated structures and properties.
-- Chain: Prompt -> Structure -> VASP (band/DOS) -> Agentic validation.
+Roadmap: chain Prompt -> Structure -> VASP (band/DOS) -> agentic validation as
+jobs on the same queue.
 """
 
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from lattice_api.services.executor import get_executor
+from lattice_api.services.metrics import record, timed_call
+
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED_STATES = ("done", "failed")
+
+
+def _expired(job: Dict[str, Any], ttl: float, now: float) -> bool:
+    return job["state"] in FINISHED_STATES and now - job["finished"] > ttl
+
+
+class MemoryJobStore:
+    """Job status dicts and result bytes in process memory."""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put(self, job: Dict[str, Any], result: Optional[bytes] = None) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+            if result is not None:
+                self._results[job["id"]] = result
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._results.get(job_id)
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Drop finished jobs older than the TTL; returns how many were dropped."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if _expired(job, self.ttl, now)]
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._results.pop(job_id, None)
+        return len(expired)
+
+
+class FileJobStore:
+    """Job status (`<id>.json`) and results (`<id>.result`) as files in one directory.
+
+    Writes are atomic (temp file + rename), so other processes never read partial files.
+    """
+
+    def __init__(self, root: str, ttl: float) -> None:
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        # Ids come from URLs: never let them name a file outside the store
+        if not job_id.isalnum():
+            raise KeyError(job_id)
+        return os.path.join(self.root, f"{job_id}{suffix}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def put(self, job: Dict[str, Any], result: Optional[bytes] = None) -> None:
+        # Result first, so a reader that sees state "done" can always load it
+        if result is not None:
+            self._write(self._path(job["id"], ".result"), result)
+        self._write(self._path(job["id"], ".json"), json.dumps(job).encode("utf-8"))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(job_id, ".json"), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        try:
+            with open(self._path(job_id, ".result"), "rb") as f:
+                return f.read()
+        except (OSError, KeyError):
+            return None
+
+    def purge(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        dropped = 0
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            job = self.get(name[: -len(".json")])
+            if job is None or not _expired(job, self.ttl, now):
+                continue
+            for suffix in (".json", ".result"):
+                try:
+                    os.unlink(self._path(job["id"], suffix))
+                except OSError:
+                    pass
+            dropped += 1
+        return dropped
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job (JobStatus): the stored fields plus its URLs."""
+    base = f"/api/jobs/{job['id']}"
+    return dict(job, links={"self": base, "events": f"{base}/events", "result": f"{base}/result"})
+
+
+def _normalize_result(value: Any, media_type: str) -> Tuple[bytes, str, Optional[str]]:
+    """Job functions return bytes, or (bytes, media_type, filename) like the export builder."""
+    if isinstance(value, tuple):
+        payload, media_type, filename = value
+        return payload, media_type, filename
+    return value, media_type, None
+
+
+class JobQueue:
+    """Bounded priority queue of jobs run by dispatcher threads on the executor pool."""
+
+    def __init__(self, store, *, workers: int, max_queue: int, retry_after: int = 1) -> None:
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.retry_after = retry_after
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Any]]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._dispatch, name=f"lattice-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge > 60:
+            self._last_purge = now
+            self.store.purge(now)
+
+    def _new_job(self, kind: str, priority: str) -> Dict[str, Any]:
+        if priority not in PRIORITIES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}.",
+            )
+        return {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "priority": priority,
+            "state": "queued",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "status_code": None,
+            "error": None,
+            "media_type": None,
+            "filename": None,
+        }
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: str = "normal",
+        media_type: str = "application/octet-stream",
+        on_done: Optional[Callable[[bytes], None]] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """Queue `fn(*args, **kwargs)` (run in the executor pool) and return the job status.
+
+        Raises 400 for an unknown priority and 503 when the queue is full.
+        `on_done(result)` runs in the dispatcher thread after success (e.g. to fill a cache).
+        """
+        job = self._new_job(kind, priority)
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail={
+                        "error": "ServiceUnavailable",
+                        "message": "Job queue is full; retry later.",
+                        "detail": {"waiting": self._waiting, "max_queue": self.max_queue},
+                    },
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._waiting += 1
+        self._maybe_purge()
+        self.store.put(job)
+        self._start()
+        task = (job, fn, args, kwargs, media_type, on_done)
+        self._queue.put((PRIORITIES[priority], next(self._seq), task))
+        return job
+
+    def complete(
+        self,
+        kind: str,
+        result: bytes,
+        media_type: str,
+        priority: str = "normal",
+        filename: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Record a job that is already done (e.g. served from cache) without queueing it."""
+        job = self._new_job(kind, priority)
+        now = time.time()
+        job.update(
+            state="done", started=now, finished=now, status_code=200, media_type=media_type, filename=filename
+        )
+        self.store.put(job, result)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status, or None if unknown or expired."""
+        job = self.store.get(job_id)
+        if job is not None and _expired(job, self.store.ttl, time.time()):
+            return None
+        return job
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        return self.store.result(job_id)
+
+    def _dispatch(self) -> None:
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+            with self._lock:
+                self._waiting -= 1
+            try:
+                self._run(*task)
+            except Exception:
+                # Only the job store itself failing gets here; keep serving the queue
+                pass
+
+    def _run(self, job, fn, args, kwargs, media_type, on_done) -> None:
+        """Run one job; any failure, including recording the result, marks it failed."""
+        try:
+            job.update(state="running", started=time.time())
+            self.store.put(job)
+            value, stages = get_executor().call(timed_call, fn, *args, **kwargs)
+            payload, media_type, filename = _normalize_result(value, media_type)
+            record(f"job_{job['kind']}", stages)
+            if on_done is not None:
+                on_done(payload)
+            job.update(
+                state="done", finished=time.time(), status_code=200, media_type=media_type, filename=filename
+            )
+            self.store.put(job, payload)
+        except HTTPException as exc:
+            self._fail(job, exc.status_code, exc.detail)
+        except Exception as exc:
+            self._fail(job, 500, str(exc))
+
+    def _fail(self, job, status_code: int, error: Any) -> None:
+        job.update(
+            state="failed", finished=time.time(), status_code=status_code, error=error, media_type=None, filename=None
+        )
+        self.store.put(job)
+
+    def shutdown(self) -> None:
+        """Stop the dispatcher threads after their current job; waiting jobs are dropped."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put((-1, -1, None))
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, configured from env on first use."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                ttl = float(os.getenv("LATTICE_JOB_TTL", "3600"))
+                jobs_dir = os.getenv("LATTICE_JOBS_DIR", "").strip()
+                store = FileJobStore(jobs_dir, ttl) if jobs_dir else MemoryJobStore(ttl)
+                workers = os.getenv("LATTICE_JOB_WORKERS", "").strip()
+                _job_queue = JobQueue(
+                    store,
+                    workers=int(workers) if workers else get_executor().max_workers,
+                    max_queue=int(os.getenv("LATTICE_JOB_MAX_QUEUE", "100")),
+                    retry_after=int(os.getenv("LATTICE_EXECUTOR_RETRY_AFTER", "1")),
+                )
+    return _job_queue
+
+
+def shutdown_job_queue() -> None:
+    global _job_queue
+    with _job_queue_lock:
+        job_queue, _job_queue = _job_queue, None
+    if job_queue is not None:
+        job_queue.shutdown()
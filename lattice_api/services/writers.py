@@ -0,0 +1,333 @@
+"""Fast CIF and POSCAR writers for large structures.
+
+pymatgen's CifWriter and Poscar format every site in Python, one `str.format`
+per number, and Poscar reads `Structure.site_properties` (a pass over all sites)
+once per site, so its cost is quadratic: about 6 minutes for 50k sites. The
+writers here produce the same bytes as `str(CifWriter(structure))` and
+`str(Poscar(structure))` with the header built as pymatgen builds it and the
+site rows formatted in bulk from NumPy arrays, and write them to a binary
+stream in blocks instead of building one `str` to encode.
+
+Fixed-point numbers ("%.8f", "%21.16f") are formatted without going through
+Python floats: x * 10**decimals is computed exactly as a sum of two doubles and
+rounded to the nearest integer, half to even, which is the correctly rounded
+result Python prints. The few values within 1e-9 of a rounding tie (or too large
+for int64) are formatted by Python instead.
+
+`write_p1_cif` and `write_poscar` return False without writing anything for
+structures they do not cover, and the caller falls back to pymatgen:
+- CIF: site properties or species spins that make CifWriter write magnetic
+  labels (`magmom`), site labels that need quoting or are not ASCII, rows long
+  enough for CifWriter to wrap;
+- POSCAR: disordered structures and selective dynamics, velocities or predictor
+  corrector data.
+
+Env vars:
+- LATTICE_FAST_WRITERS: set to 0 to always use pymatgen's writers (default 1).
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from typing import BinaryIO, List, Sequence
+
+# Sites formatted and written per block
+BLOCK_SITES = 8192
+
+# CifWriter and Poscar defaults
+CIF_DECIMALS = 8
+POSCAR_DECIMALS = 16
+POSCAR_WIDTH = POSCAR_DECIMALS + 5
+
+_POSCAR_SITE_PROPERTIES = ("selective_dynamics", "velocities", "predictor_corrector")
+_POSCAR_PROPERTIES = ("predictor_corrector_preamble", "lattice_velocities")
+_TIE_MARGIN = 1e-9
+_SPLITTER = 134217729.0  # 2**27 + 1
+
+
+def _digit_pairs():
+    import numpy as np
+
+    pairs = np.frombuffer("".join(f"{i:02d}" for i in range(100)).encode("ascii"), dtype=np.uint8)
+    return pairs[0::2].copy(), pairs[1::2].copy()
+
+
+_DIGITS = None  # ASCII tens and units of 0..99, built on first use
+
+
+def fast_writers_enabled() -> bool:
+    return os.getenv("LATTICE_FAST_WRITERS", "1").strip() != "0"
+
+
+def _split(a):
+    c = _SPLITTER * a
+    hi = c - (c - a)
+    return hi, a - hi
+
+
+def format_fixed(values, decimals: int, width: int = 0):
+    """Format a float array like `"%{width}.{decimals}f" % x`, element-wise.
+
+    Returns a (w, n) uint8 array: character k of value i is `out[k, i]`,
+    right-aligned, with zero bytes where a value is shorter than the widest one
+    (and not padded to `width` with spaces).
+    """
+    import numpy as np
+
+    global _DIGITS
+    if _DIGITS is None:
+        _DIGITS = _digit_pairs()
+    tens, units = _DIGITS
+    x = np.ascontiguousarray(values, dtype=float).ravel()
+    n = len(x)
+    scale = 10.0**decimals
+    with np.errstate(invalid="ignore", over="ignore"):
+        # Dekker's product: hi + lo == x * scale exactly
+        hi = x * scale
+        xh, xl = _split(x)
+        sh, sl = _split(scale)
+        lo = ((xh * sh - hi) + xh * sl + xl * sh) + xl * sl
+        base = np.rint(hi)
+        rest = (hi - base) + lo
+        step = np.rint(rest)
+        fallback = ~(np.abs(hi) < 2.0**62) | (np.abs(np.abs(rest - step) - 0.5) < _TIE_MARGIN)
+    base[fallback] = 0.0
+    step[fallback] = 0.0
+    q = np.abs(base.astype(np.int64) + step.astype(np.int64))
+    negative = np.signbit(x)
+    exceptions = {
+        i: ("%*.*f" % (width, decimals, x[i])).encode("ascii") for i in np.nonzero(fallback)[0].tolist()
+    }
+
+    # Integer digits (at least one) and the widest value
+    unit = 10**decimals
+    int_part = q // unit
+    n_int = np.ones(n, dtype=np.int64)
+    rest_int = int_part // 10
+    while np.any(rest_int):
+        n_int += rest_int > 0
+        rest_int //= 10
+    max_int = int(n_int.max()) if n else 1
+    length = n_int + 1 + decimals + negative
+    w = max([max_int + 1 + decimals + 1, width] + [len(text) for text in exceptions.values()])
+
+    # Fraction digits from the right, in 8-digit uint32 chunks, two digits at a time
+    out = np.zeros((w, n), dtype=np.uint8)
+    col = w - 1
+    fraction = q - int_part * unit
+    remaining = decimals
+    while remaining:
+        size = min(8, remaining)
+        fraction, chunk = np.divmod(fraction, 10**size)
+        chunk = chunk.astype(np.uint32)
+        for _ in range(size // 2):
+            chunk, pair = np.divmod(chunk, np.uint32(100))
+            out[col] = np.take(units, pair)
+            out[col - 1] = np.take(tens, pair)
+            col -= 2
+        if size % 2:
+            out[col] = 48 + chunk % 10
+            col -= 1
+        remaining -= size
+    out[col] = ord(".")
+    col -= 1
+    for k in range(max_int):
+        out[col] = np.where(n_int > k, 48 + int_part % 10, 0)
+        int_part //= 10
+        col -= 1
+    rows = np.nonzero(negative)[0]
+    out[(w - length)[rows], rows] = ord("-")
+    if width:
+        pad = width - length
+        for k in range(int(pad.max()) if n else 0):
+            out[w - width + k, pad > k] = ord(" ")
+
+    for i, text in exceptions.items():
+        out[:, i] = 0
+        out[w - len(text):, i] = np.frombuffer(text, dtype=np.uint8)
+    return out
+
+
+def _text_column(strings: Sequence[str]):
+    """(w, n) uint8 array of ASCII strings, zero-padded."""
+    import numpy as np
+
+    array = np.array(strings, dtype="S")
+    return array.view(np.uint8).reshape(len(strings), array.itemsize).T
+
+
+def _constant_column(text: str, n: int):
+    import numpy as np
+
+    return np.broadcast_to(np.frombuffer(text.encode("ascii"), dtype=np.uint8)[:, None], (len(text), n))
+
+
+def _join_rows(columns: List) -> bytes:
+    """Concatenate (w_i, n) character blocks into n lines, dropping zero padding."""
+    import numpy as np
+
+    flat = np.concatenate(columns, axis=0).T.ravel()
+    return flat[flat != 0].tobytes()
+
+
+def _cif_header(structure) -> str:
+    """Everything CifWriter writes before the atom-site rows (symprec=None)."""
+    from pymatgen.io.cif import CifBlock
+
+    lattice = structure.lattice
+    comp = structure.composition
+    no_oxi_comp = comp.element_composition
+    fmt = f"{{:.{CIF_DECIMALS}f}}"
+    blocks = {"_symmetry_space_group_name_H-M": "P 1"}
+    for cell_attr in ("a", "b", "c"):
+        blocks[f"_cell_length_{cell_attr}"] = fmt.format(getattr(lattice, cell_attr))
+    for cell_attr in ("alpha", "beta", "gamma"):
+        blocks[f"_cell_angle_{cell_attr}"] = fmt.format(getattr(lattice, cell_attr))
+    blocks["_symmetry_Int_Tables_number"] = 1
+    blocks["_chemical_formula_structural"] = no_oxi_comp.reduced_formula
+    blocks["_chemical_formula_sum"] = no_oxi_comp.formula
+    blocks["_cell_volume"] = fmt.format(lattice.volume)
+    _, fu = no_oxi_comp.get_reduced_composition_and_factor()
+    blocks["_cell_formula_units_Z"] = str(int(fu))
+    blocks["_symmetry_equiv_pos_site_id"] = ["1"]
+    blocks["_symmetry_equiv_pos_as_xyz"] = ["x, y, z"]
+    loops = [["_symmetry_equiv_pos_site_id", "_symmetry_equiv_pos_as_xyz"]]
+    try:
+        symbol_to_oxi_num = {str(el): float(el.oxi_state or 0) for el in sorted(comp.elements)}
+        blocks["_atom_type_symbol"] = list(symbol_to_oxi_num)
+        blocks["_atom_type_oxidation_number"] = symbol_to_oxi_num.values()
+        loops.append(["_atom_type_symbol", "_atom_type_oxidation_number"])
+    except (TypeError, AttributeError):
+        pass
+    atom_site = [
+        "_atom_site_type_symbol",
+        "_atom_site_label",
+        "_atom_site_symmetry_multiplicity",
+        "_atom_site_fract_x",
+        "_atom_site_fract_y",
+        "_atom_site_fract_z",
+        "_atom_site_occupancy",
+    ]
+    # An empty loop: CifBlock writes the loop header with no rows
+    blocks.update({key: [] for key in atom_site})
+    loops.append(atom_site)
+    return f"# generated using pymatgen\n{CifBlock(blocks, loops, comp.reduced_formula)}"
+
+
+def write_p1_cif(structure, out: BinaryIO) -> bool:
+    """Write `str(CifWriter(structure))` to `out` as UTF-8; False if not covered."""
+    import numpy as np
+    from pymatgen.io.cif import CifBlock
+
+    if "magmom" in structure.site_properties:
+        return False
+    if any(getattr(sp, "spin", None) is not None for sp in structure.composition):
+        return False
+
+    # One row per (site, species) in CifWriter's order
+    sites: List[int] = []
+    symbols: List[str] = []
+    labels: List[str] = []
+    occupancies: List[str] = []
+    custom = set()
+    count = 0
+    for index, site in enumerate(structure):
+        label = site.label
+        own_label = label != site.species_string
+        if own_label:
+            custom.add(label)
+        for sp, occu in sorted(site.species.items()):
+            sites.append(index)
+            symbols.append(str(sp))
+            labels.append(label if own_label else f"{sp.symbol}{count}")
+            occupancies.append(str(occu))
+            count += 1
+    block = CifBlock({}, [], "")
+    if any(not label.isascii() or block._format_field(label) != label for label in custom):
+        return False
+
+    frac = structure.frac_coords[np.asarray(sites, dtype=np.int64)] if sites else np.zeros((0, 3))
+    # CifBlock wraps rows that reach 70 characters; keep those to pymatgen
+    widths = [
+        max((len(s) for s in column), default=0) for column in (symbols, labels, occupancies)
+    ]
+    coords = format_fixed(frac, CIF_DECIMALS)
+    if 1 + 14 + sum(widths) + 1 + 3 * coords.shape[0] >= 70:
+        return False
+
+    out.write(_cif_header(structure).encode("utf-8"))
+    for start in range(0, len(sites), BLOCK_SITES):
+        stop = min(start + BLOCK_SITES, len(sites))
+        rows = stop - start
+        sep = _constant_column("  ", rows)
+        out.write(
+            _join_rows(
+                [
+                    _constant_column("\n  ", rows),
+                    _text_column(symbols[start:stop]),
+                    sep,
+                    _text_column(labels[start:stop]),
+                    _constant_column("  1  ", rows),
+                    coords[:, 3 * start:3 * stop:3],
+                    sep,
+                    coords[:, 3 * start + 1:3 * stop:3],
+                    sep,
+                    coords[:, 3 * start + 2:3 * stop:3],
+                    sep,
+                    _text_column(occupancies[start:stop]),
+                ]
+            )
+        )
+    out.write(b"\n")
+    return True
+
+
+def write_poscar(structure, out: BinaryIO) -> bool:
+    """Write `str(Poscar(structure))` to `out` as UTF-8; False if not covered."""
+    import numpy as np
+    from pymatgen.core import Lattice
+
+    if not structure.is_ordered:
+        return False
+    if any(key in structure.properties for key in _POSCAR_PROPERTIES):
+        return False
+    if any(key in structure.site_properties for key in _POSCAR_SITE_PROPERTIES):
+        return False
+
+    lattice = structure.lattice
+    if np.linalg.det(lattice.matrix) < 0:
+        lattice = Lattice(-lattice.matrix)
+    fmt = f"{{:{POSCAR_WIDTH}.{POSCAR_DECIMALS}f}}"
+    species = [site.specie for site in structure]
+    groups = [(symbol, len(list(group))) for symbol, group in itertools.groupby(sp.symbol for sp in species)]
+    lines = [structure.formula, "1.0"]
+    lines.extend(" ".join(fmt.format(c) for c in vec) for vec in lattice.matrix)
+    lines.append(" ".join(symbol for symbol, _ in groups))
+    lines.append(" ".join(str(count) for _, count in groups))
+    lines.append("direct")
+    out.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+    names = {sp: str(sp) for sp in set(species)}
+    strings = [names[sp] for sp in species]
+    frac = structure.frac_coords
+    for start in range(0, len(structure), BLOCK_SITES):
+        stop = min(start + BLOCK_SITES, len(structure))
+        rows = stop - start
+        coords = format_fixed(frac[start:stop], POSCAR_DECIMALS, POSCAR_WIDTH)
+        sep = _constant_column(" ", rows)
+        out.write(
+            _join_rows(
+                [
+                    coords[:, 0::3],
+                    sep,
+                    coords[:, 1::3],
+                    sep,
+                    coords[:, 2::3],
+                    sep,
+                    _text_column(strings[start:stop]),
+                    _constant_column("\n", rows),
+                ]
+            )
+        )
+    return True
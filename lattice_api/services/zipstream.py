@@ -0,0 +1,64 @@
+"""Incremental zip writer for streamed downloads.
+
+The archive is written to a non-seekable sink (zipfile then uses data descriptors),
+and every call returns only the bytes produced since the previous call, so a
+response can forward them immediately and memory stays bounded by one entry.
+"""
+
+from __future__ import annotations
+
+import io
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+
+class _Sink(io.RawIOBase):
+    def __init__(self) -> None:
+        self._chunks: list = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def write(self, b) -> int:
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+class ZipStreamWriter:
+    """Write zip entries one at a time, handing back the encoded bytes."""
+
+    def __init__(self, compression: int = zipfile.ZIP_DEFLATED) -> None:
+        self._sink = _Sink()
+        self._zf = zipfile.ZipFile(self._sink, mode="w", compression=compression)
+
+    def add(self, name: str, data: bytes | str) -> bytes:
+        self._zf.writestr(name, data)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zf.close()
+        return self._sink.drain()
+
+
+def iter_zip(entries: Iterable[Tuple[str, bytes | str]]) -> Iterator[bytes]:
+    """Yield a zip archive of `entries` chunk by chunk."""
+    writer = ZipStreamWriter()
+    for name, data in entries:
+        chunk = writer.add(name, data)
+        if chunk:
+            yield chunk
+    yield writer.close()
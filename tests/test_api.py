@@ -1,8 +1,11 @@
+import json
 from pathlib import Path
 
 from fastapi.testclient import TestClient
 
 from lattice_api.main import app
+from lattice_api.routers.scene import _edges_key
+from lattice_api.services.cache import cif_content_id, get_graph_cache
 
 
 client = TestClient(app)
@@ -35,3 +38,410 @@ def test_api_export_cif_and_poscar():
     assert resp.status_code == 200, resp.text
     assert resp.headers.get("content-type") == "text/plain; charset=utf-8"
     assert len(resp.content) > 0
+
+
+def test_api_scene_cache_hit():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    files = {"file": ("si.cif", file_bytes, "chemical/x-cif")}
+    first = client.post("/api/scene", files=files, data={"radius_strategy": "covalent"})
+    assert first.status_code == 200, first.text
+    before = client.get("/api/scene/cache").json()
+    second = client.post("/api/scene", files=files, data={"radius_strategy": "covalent"})
+    assert second.status_code == 200, second.text
+    assert second.headers.get("x-scene-cache") == "HIT"
+    assert second.json() == first.json()
+    after = client.get("/api/scene/cache").json()
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_api_scene_and_export_etags_and_compression():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    files = {"file": ("si.cif", file_bytes, "chemical/x-cif")}
+    first = client.post("/api/scene", files=files, headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200, first.text
+    assert first.headers["content-encoding"] == "gzip"
+    tag = first.headers["etag"]
+    plain = client.post("/api/scene", files=files, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == first.content and plain.headers["etag"] != tag
+
+    revisit = client.post("/api/scene", files=files, headers={"If-None-Match": tag})
+    assert revisit.status_code == 304 and revisit.content == b""
+    assert revisit.headers["etag"] == tag
+    other = client.post(
+        "/api/scene", files=files, data={"radius_strategy": "atomic"}, headers={"If-None-Match": tag}
+    )
+    assert other.status_code == 200
+
+    body = {"format": "cif", "cif": file_bytes.decode("utf-8")}
+    export = client.post("/api/export", json=body)
+    assert export.status_code == 200
+    revisit = client.post("/api/export", json=body, headers={"If-None-Match": export.headers["etag"]})
+    assert revisit.status_code == 304
+    body["options"] = {"cell": "conventional"}
+    changed = client.post("/api/export", json=body, headers={"If-None-Match": export.headers["etag"]})
+    assert changed.status_code == 200
+
+
+def test_api_scene_binary_negotiation():
+    from lattice_api.services.encoding import SCENE_BINARY_MEDIA_TYPE, decode_scene
+
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        headers={"Accept": SCENE_BINARY_MEDIA_TYPE},
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"] == SCENE_BINARY_MEDIA_TYPE
+    data = decode_scene(resp.content)
+    assert data["formula"] == "Si"
+    assert data["source"] == "upload"
+
+
+def test_api_scene_batch_streams_ndjson_with_per_item_errors():
+    import io
+    import json
+    import zipfile
+
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a/si.cif", file_bytes)
+        zf.writestr("broken.cif", "not a cif")
+        zf.writestr("notes.txt", "ignored")
+
+    resp = client.post(
+        "/api/scene/batch",
+        files=[
+            ("files", ("si.cif", file_bytes, "chemical/x-cif")),
+            ("files", ("bundle.zip", archive.getvalue(), "application/zip")),
+            ("files", ("readme.md", b"# not a cif", "text/markdown")),
+        ],
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[0]["status"] == 200 and by_index[0]["result"]["formula"] == "Si"
+    assert by_index[1]["filename"] == "a/si.cif" and by_index[1]["status"] == 200
+    assert by_index[2]["status"] == 422
+    assert by_index[3]["status"] == 400
+
+
+def test_api_scene_batch_reports_bad_items_per_line(monkeypatch):
+    import io
+    import json
+    import zipfile
+
+    from lattice_api.services import cif
+
+    si = (FIXTURES / "si.cif").read_bytes()
+    monkeypatch.setattr(cif, "MAX_UPLOAD_SIZE", len(si) + 100)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("good.cif", si)
+        zf.writestr("corrupt.cif", si)
+        zf.writestr("big.cif", si * 2)
+    # Flip a byte inside the second member's data: its CRC check fails
+    raw = bytearray(archive.getvalue())
+    raw[raw.index(si, raw.index(b"corrupt.cif")) + 10] ^= 0xFF
+
+    resp = client.post(
+        "/api/scene/batch",
+        files=[
+            ("files", ("bundle.zip", bytes(raw), "application/zip")),
+            ("files", ("large.cif", si * 2, "chemical/x-cif")),
+            ("files", ("broken.zip", b"not a zip", "application/zip")),
+            ("files", ("si.cif", si, "chemical/x-cif")),
+        ],
+    )
+    assert resp.status_code == 200, resp.text
+    by_index = {line["index"]: line for line in map(json.loads, resp.text.splitlines())}
+    assert [by_index[i]["status"] for i in range(6)] == [200, 400, 413, 413, 400, 200]
+    assert by_index[1]["filename"] == "corrupt.cif" and "CRC" in by_index[1]["error"]
+    assert by_index[4]["filename"] == "broken.zip"
+
+
+def test_api_scene_batch_counts_zip_members_before_inflating(monkeypatch):
+    import io
+    import zipfile
+
+    from lattice_api.services import cif
+
+    monkeypatch.setattr(cif, "MAX_BATCH_ITEMS", 2)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for k in range(3):
+            zf.writestr(f"{k}.cif", "data_x\n")
+    resp = client.post("/api/scene/batch", files=[("files", ("many.zip", archive.getvalue(), "application/zip"))])
+    assert resp.status_code == 413
+
+
+def test_api_scene_batch_caps_the_request_body():
+    from lattice_api.services.cif import MAX_BATCH_UPLOAD_SIZE
+
+    # Content-Length alone is enough to reject it
+    resp = client.post(
+        "/api/scene/batch",
+        content=b"",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": str(MAX_BATCH_UPLOAD_SIZE * 2)},
+    )
+    assert resp.status_code == 413 and "Batch upload too large" in resp.json()["detail"]
+
+
+def test_api_export_bulk_streams_zip():
+    import io
+    import json
+    import zipfile
+
+    cif_text = (FIXTURES / "si.cif").read_text()
+    payload = {
+        "items": [
+            {"name": "si", "cif": cif_text},
+            {"cif": cif_text},
+            {"name": "broken", "cif": "not a cif"},
+        ],
+        "formats": ["cif", "poscar", "mpr"],
+    }
+    resp = client.post("/api/export/bulk", json=payload)
+    assert resp.status_code == 200, resp.text
+    assert resp.headers.get("content-type") == "application/zip"
+
+    zf = zipfile.ZipFile(io.BytesIO(resp.content))
+    names = set(zf.namelist())
+    assert {"si/Si.cif", "si/POSCAR", "si/mpr/INCAR", "si/mpr/POTCAR.spec"} <= names
+    assert "0001_Si/POSCAR" in names
+    errors = json.loads(zf.read("errors.json"))
+    assert [e["index"] for e in errors] == [2]
+    assert errors[0]["status"] == 422
+
+
+def test_api_metrics_and_server_timing(monkeypatch):
+    monkeypatch.setenv("LATTICE_SERVER_TIMING", "1")
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"radius_strategy": "van_der_waals"},
+    )
+    assert resp.status_code == 200, resp.text
+    timing = resp.headers["server-timing"]
+    for name in ("read", "parse", "graph", "get_scene", "total"):
+        assert f"{name};dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    # Worker-side stages are recorded in the parent's registry
+    assert 'lattice_stage_seconds_count{pipeline="scene",stage="parse"}' in metrics.text
+    assert 'lattice_structure_sites_bucket{pipeline="scene",le="1.0"}' in metrics.text
+    assert "lattice_executor_pending" in metrics.text
+
+
+def test_api_scene_lod_atoms_defers_bonds():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"lod": "atoms"},
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["lod"] == "atoms"
+    assert "bonds" not in {g["name"] for g in data["scene"]["contents"]}
+
+    bonds = client.get(f"/api/scene/{data['scene_id']}/bonds", params={"bond_strategy": "cell_list"})
+    assert bonds.status_code == 200, bonds.text
+    assert bonds.json()["bonds"]["name"] == "bonds"
+    assert bonds.json()["bonds"]["contents"]
+
+    assert client.get("/api/scene/" + "0" * 64 + "/bonds").status_code == 404
+
+
+def test_api_scene_render_reuses_stored_upload_and_graph():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"bond_strategy": "cell_list"},
+    )
+    assert resp.status_code == 200, resp.text
+    scene_id = resp.json()["scene_id"]
+    # The API process keeps the edges and sends them to whichever worker re-renders
+    options = {"bond_strategy": "cell_list", "supercell": None}
+    edges = get_graph_cache().get(_edges_key(file_bytes, options))
+    assert edges is not None and len(edges) % 20 == 0
+
+    body = {"scene_id": scene_id, "bond_strategy": "cell_list", "radius_strategy": "covalent"}
+    body["axes"] = {"visible": False}
+    render = client.post("/api/scene/render", json=body)
+    assert render.status_code == 200, render.text
+    assert render.headers["x-graph-cache"] == "HIT"
+    data = render.json()
+    assert data["scene_id"] == scene_id and data["n_sites"] == resp.json()["n_sites"]
+    assert "axes" not in {g["name"] for g in data["scene"]["contents"]}
+    assert client.post("/api/scene/render", json=body).headers["x-scene-cache"] == "HIT"
+
+    body["axes"] = {"mode": "cartesian", "scale": 3.0}
+    axes = client.post("/api/scene/render", json=body).json()["scene"]["contents"][-1]
+    assert axes["name"] == "axes"
+    assert axes["contents"][0]["positionPairs"][0][1] == [3.0, 0.0, 0.0]
+
+    by_text = client.post("/api/scene/render", json={"cif": file_bytes.decode("utf-8")})
+    assert by_text.status_code == 200 and by_text.json()["scene_id"] == scene_id
+    assert client.post("/api/scene/render", json={"scene_id": "0" * 64}).status_code == 404
+    assert client.post("/api/scene/render", json={}).status_code == 400
+
+
+def test_api_scene_supercell():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"supercell": "2x2x2", "bond_strategy": "cell_list"},
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["lod"] == "reduced"
+    assert data["supercell"] == [[2, 0, 0], [0, 2, 0], [0, 0, 2]]
+    assert data["n_sites"] == 8
+    atoms = next(g for g in data["scene"]["contents"] if g["name"] == "atoms")
+    assert sum(len(p["positions"]) for p in atoms["contents"]) == 8
+
+    bad = client.post(
+        "/api/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"supercell": "0x1x1"},
+    )
+    assert bad.status_code == 400
+
+
+def test_api_scene_rejects_oversized_upload_early():
+    big = b"#" * (10 * 1024 * 1024 + 128 * 1024)
+    resp = client.post("/api/scene", files={"file": ("big.cif", big, "chemical/x-cif")})
+    assert resp.status_code == 413
+
+    # Without Content-Length the body is counted as it streams in
+    boundary = "lattice-boundary"
+    head = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="big.cif"\r\n'
+        "Content-Type: chemical/x-cif\r\n\r\n"
+    ).encode()
+
+    def chunks():
+        yield head
+        for _ in range(12):
+            yield b"#" * (1024 * 1024)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    resp = client.post(
+        "/api/scene",
+        content=chunks(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert resp.status_code == 413
+
+
+def test_api_scene_blocks():
+    si = (FIXTURES / "si.cif").read_bytes()
+    multi = si + si.replace(b"data_", b"data_second_", 1)
+    upload = {"file": ("multi.cif", multi, "chemical/x-cif")}
+
+    resp = client.post("/api/scene/blocks", files=upload)
+    assert resp.status_code == 200, resp.text
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted((line["index"], line["block"], line["status"]) for line in lines) == [
+        (0, "Si", 200),
+        (1, "second_Si", 200),
+    ]
+
+    listed = client.post("/api/scene/blocks", files=upload, headers={"Accept": "application/json"}).json()
+    assert [item["block"] for item in listed] == ["Si", "second_Si"]
+    assert listed[1]["result"]["formula"] == "Si"
+
+    resp = client.post("/api/scene", files=upload, data={"block": "1"})
+    assert resp.status_code == 200, resp.text
+    resp = client.post("/api/scene", files=upload, data={"block": "missing"})
+    assert resp.status_code == 400
+
+
+def test_api_trajectory():
+    si = (FIXTURES / "si.cif").read_bytes()
+    frames = si + si.replace(b"data_", b"data_next_", 1)
+    resp = client.post(
+        "/api/trajectory",
+        files={"file": ("md.cif", frames, "chemical/x-cif")},
+        data={"bond_strategy": "cell_list"},
+    )
+    assert resp.status_code == 200, resp.text
+    data = resp.json()
+    assert data["n_frames"] == 2
+    assert len(data["frames"]["positions"]) == 2
+    assert not any(data["frames"]["positions"][1])
+
+    bad = client.post("/api/trajectory", files={"file": ("md.txt", frames, "text/plain")})
+    assert bad.status_code == 400
+
+
+def test_api_scene_job():
+    file_bytes = (FIXTURES / "si.cif").read_bytes()
+    resp = client.post(
+        "/api/jobs/scene",
+        files={"file": ("si.cif", file_bytes, "chemical/x-cif")},
+        data={"bond_strategy": "cell_list", "priority": "high"},
+    )
+    assert resp.status_code == 202, resp.text
+    job = resp.json()
+    assert resp.headers["location"] == job["links"]["self"]
+
+    with client.stream("GET", job["links"]["events"]) as events:
+        body = events.read().decode()
+    assert "event: done" in body
+
+    result = client.get(job["links"]["result"])
+    assert result.status_code == 200
+    assert result.json()["formula"] == "Si"
+    assert client.get("/api/jobs/" + "0" * 32).status_code == 404
+
+
+def test_api_scene_dedup_serves_equivalent_upload():
+    si = (FIXTURES / "si.cif").read_bytes()
+    # Same crystal, reformatted: a comment and the atom moved to the cell centre
+    shifted = b"# moved origin\n" + si.replace(b"0.00000  0.00000  0.00000", b"0.50000  0.50000  0.50000")
+    form = {"radius_strategy": "atomic"}
+    first = client.post("/api/scene", files={"file": ("si.cif", si, "chemical/x-cif")}, data=form)
+    assert first.status_code == 200, first.text
+    second = client.post("/api/scene", files={"file": ("si2.cif", shifted, "chemical/x-cif")}, data=form)
+    assert second.status_code == 200, second.text
+    assert second.headers.get("x-scene-dedup") == "HIT"
+    first_doc, second_doc = first.json(), second.json()
+    # The shared scene, but follow-up requests address the second upload
+    assert second_doc.pop("scene_id") == cif_content_id(shifted) != first_doc.pop("scene_id")
+    assert second_doc == first_doc
+
+
+def test_api_export_dedup_shares_standardized_exports_across_workers():
+    from lattice_api.services.cache import get_export_cache
+
+    si = (FIXTURES / "si.cif").read_text()
+    shifted = "# moved origin\n" + si.replace("0.00000  0.00000  0.00000", "0.50000  0.50000  0.50000")
+    options = {"cell": "primitive"}
+    first = client.post("/api/export", json={"cif": si, "format": "poscar", "options": options})
+    assert first.status_code == 200, first.text
+    # The export cache is kept by the API process, whichever worker built the file
+    hits = get_export_cache().stats()["hits"]
+    second = client.post("/api/export", json={"cif": shifted, "format": "poscar", "options": options})
+    assert second.status_code == 200 and second.content == first.content
+    assert get_export_cache().stats()["hits"] == hits + 1
+
+    # A finished export job fills the cache; an equivalent job then completes at once
+    job = client.post("/api/jobs/export", json={"cif": shifted, "format": "cif", "options": options}).json()
+    with client.stream("GET", job["links"]["events"]) as events:
+        assert "event: done" in events.read().decode()
+    cached = client.post("/api/jobs/export", json={"cif": si, "format": "cif", "options": options}).json()
+    assert cached["state"] == "done"
+    result = client.get(cached["links"]["result"])
+    assert result.content == client.get(job["links"]["result"]).content
+    assert result.headers["content-disposition"] == 'attachment; filename="Si.cif"'
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+
+from lattice_api.services.bonding import build_structure_graph, cached_structure_graph, graph_edges
+from lattice_api.services.cache import get_graph_cache
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.scene import structure_to_scene_dict
+
+
+FIXTURES = Path(__file__).parent / "data"
+
+
+def _edges(graph):
+    return sorted((u, v, tuple(d["to_jimage"])) for u, v, d in graph.graph.edges(data=True))
+
+
+def _structures():
+    from pymatgen.core import Lattice, Structure
+
+    si = parse_cif_bytes((FIXTURES / "si.cif").read_bytes())
+    nacl = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(5.64), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    rattled = nacl * (2, 2, 1)
+    rattled.perturb(0.1, min_distance=0.02, seed=0)
+    return {"si": si, "si_222": si * (2, 2, 2), "nacl": nacl, "nacl_rattled": rattled}
+
+
+@pytest.mark.parametrize("name", ["si", "si_222", "nacl", "nacl_rattled"])
+def test_cell_list_matches_minimum_distance_nn(name):
+    structure = _structures()[name]
+    expected = _edges(build_structure_graph(structure, "minimum_distance"))
+    actual = _edges(build_structure_graph(structure, "cell_list"))
+    assert actual == expected
+
+
+def test_scene_with_cell_list_strategy_has_bonds():
+    structure = parse_cif_bytes((FIXTURES / "si.cif").read_bytes())
+    scene = structure_to_scene_dict(structure, bond_strategy="cell_list")
+    names = {c.get("name") for c in scene.get("contents") or []}
+    assert "bonds" in names
+
+
+@pytest.mark.parametrize("strategy", ["minimum_distance", "cell_list"])
+def test_cached_graph_renders_the_same_scene(strategy):
+    structure = _structures()["nacl_rattled"]
+    get_graph_cache().memory.clear()
+    fresh = cached_structure_graph(structure, strategy)
+    hits = get_graph_cache().memory.hits
+    cached = cached_structure_graph(structure, strategy)
+    assert get_graph_cache().memory.hits == hits + 1
+    assert list(cached.graph.edges(data="to_jimage")) == list(fresh.graph.edges(data="to_jimage"))
+    # The hit skips the neighbor search, not anything the renderer sees
+    assert cached.get_scene().to_json() == fresh.get_scene().to_json()
+    # So do edges handed over from another process
+    handed = cached_structure_graph(structure, strategy, graph_edges(fresh))
+    assert list(handed.graph.edges(data="to_jimage")) == list(fresh.graph.edges(data="to_jimage"))
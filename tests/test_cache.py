@@ -0,0 +1,66 @@
+from lattice_api.services.cache import (
+    LRUCache,
+    SceneCache,
+    normalize_cif_bytes,
+    scene_cache_key,
+)
+
+
+def test_lru_cache_evicts_by_size():
+    cache = LRUCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"  # "a" is now most recent
+    cache.put("c", b"123")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] <= 10
+
+
+def test_lru_cache_evicts_by_count():
+    cache = LRUCache(max_entries=2, sizeof=lambda v: 1)
+    for k in "abc":
+        cache.put(k, k)
+    assert "a" not in cache
+    assert len(cache) == 2
+
+
+def test_scene_cache_key_normalization_and_options():
+    a = b"data_x\r\n_cell_length_a 1.0  \r\n"
+    b = b"\xef\xbb\xbfdata_x\n_cell_length_a 1.0\n\n"
+    assert normalize_cif_bytes(a) == normalize_cif_bytes(b)
+    assert scene_cache_key(a) == scene_cache_key(b)
+    assert scene_cache_key(a) != scene_cache_key(a, radius_strategy="covalent")
+
+
+def test_scene_cache_disk_tier_survives_new_instance(tmp_path):
+    first = SceneCache(max_bytes=1024, disk_dir=str(tmp_path))
+    first.put("ab" * 32, b"{}")
+    second = SceneCache(max_bytes=1024, disk_dir=str(tmp_path))
+    assert second.get("ab" * 32) == b"{}"
+    assert second.stats()["disk"]["hits"] == 1
+    # Promoted to the memory tier
+    assert second.get("ab" * 32) == b"{}"
+    assert second.stats()["memory"]["hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_entries_past_its_budget(tmp_path):
+    import os
+
+    (tmp_path / "graphs").mkdir()  # another tier's subdirectory is left alone
+    cache = SceneCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=250)
+    keys = [f"{k:02d}" * 32 for k in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, b"x" * 100)
+        stamp = 1_000_000 + age
+        os.utime(tmp_path / key[:2] / key, (stamp, stamp))
+    # The third write went over 250 bytes: the oldest entry goes, down to 90%
+    assert [(tmp_path / key[:2] / key).exists() for key in keys] == [False, True, True]
+    assert cache.stats()["disk"]["evictions"] == 1
+    # A hit refreshes the entry, so the least recently used one goes next
+    assert cache.get(keys[1]) is not None
+    cache.put("ff" * 32, b"x" * 100)
+    assert cache.get(keys[1]) is not None and cache.get(keys[2]) is None
+    assert (tmp_path / "graphs").is_dir()
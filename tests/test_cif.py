@@ -6,9 +6,12 @@ import pytest
 from lattice_api.services.cif import (
     ensure_cif_extension,
     ensure_size_limit,
+    iter_cif_blocks,
     parse_cif_bytes,
+    read_upload,
+    select_cif_block,
 )
-from fastapi import HTTPException
+from fastapi import HTTPException, UploadFile
 
 
 FIXTURES = Path(__file__).parent / "data"
@@ -42,3 +45,46 @@ def test_parse_cif_bytes_failure():
     with pytest.raises(HTTPException):
         parse_cif_bytes(b"not a cif")
 
+
+
+def test_read_upload_enforces_limit_while_reading():
+    import asyncio
+    import io
+
+    data = (FIXTURES / "si.cif").read_bytes()
+    assert asyncio.run(read_upload(UploadFile(io.BytesIO(data)))) == data
+
+    # Size unknown up front: rejected once the running total crosses the limit
+    upload = UploadFile(io.BytesIO(b"#" * (11 * 1024 * 1024)))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(read_upload(upload))
+    assert exc.value.status_code == 413
+    assert upload.file.tell() < 11 * 1024 * 1024
+
+
+def _multi_block_cif() -> bytes:
+    si = (FIXTURES / "si.cif").read_bytes()
+    broken = b"data_broken\n_cell_length_a 1.0\n"
+    return b"# archive\n" + broken + si + si.replace(b"data_", b"data_Second_", 1)
+
+
+def test_cif_blocks_iterate_and_select():
+    data = _multi_block_cif()
+    blocks = list(iter_cif_blocks(data))
+    assert [name for name, _ in blocks] == ["broken", "Si", "Second_Si"]
+    assert all(block.startswith(b"data_") for _, block in blocks)
+
+    assert select_cif_block(data, "2") == blocks[2]
+    assert select_cif_block(data, "second_si") == blocks[2]
+    assert select_cif_block(data, "data_Si") == blocks[1]
+    with pytest.raises(HTTPException) as exc:
+        select_cif_block(data, "3")
+    assert exc.value.status_code == 400
+
+
+def test_parse_cif_bytes_returns_first_block_with_structure():
+    structure = parse_cif_bytes(_multi_block_cif())
+    assert structure.composition.reduced_formula == "Si"
+    with pytest.raises(HTTPException) as exc:
+        parse_cif_bytes(b"data_a\n_cell_length_a 1.0\ndata_b\n_cell_length_a 2.0\n")
+    assert exc.value.status_code == 422
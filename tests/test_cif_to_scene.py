@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).parent / "data"
+MANIFEST = "cif_to_scene.manifest.json"
+
+
+def _corpus(tmp_path: Path) -> Path:
+    corpus = tmp_path / "corpus"
+    (corpus / "sub").mkdir(parents=True)
+    si = (FIXTURES / "si.cif").read_bytes()
+    (corpus / "a.cif").write_bytes(si)
+    (corpus / "sub" / "b.cif").write_bytes(si)
+    (corpus / "bad.cif").write_bytes(b"data_bad\n_cell_length_a 5.0\n")
+    return corpus
+
+
+def _convert(corpus: Path, out: Path, skip: str, *options: str):
+    """Run the tool in batch mode; returns (exit code, manifest)."""
+    proc = subprocess.run(
+        [sys.executable, str(ROOT / "tools" / "cif_to_scene.py"), str(corpus), "--out-dir", str(out), "--skip", skip]
+        + list(options),
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    return proc.returncode, json.loads((out / MANIFEST).read_text())
+
+
+def _converted(manifest) -> set:
+    """Names of the inputs converted (not skipped) by a run."""
+    return {os.path.basename(path) for path, rec in manifest["files"].items() if not rec.get("skipped")}
+
+
+def test_batch_converts_a_directory_and_resumes_by_mtime(tmp_path):
+    corpus, out = _corpus(tmp_path), tmp_path / "out"
+    code, manifest = _convert(corpus, out, "mtime")
+    # The broken file fails without aborting the batch
+    assert code == 1
+    assert manifest["complete"] is True
+    assert manifest["summary"] == {"ok": 2, "failed": 1, "skipped": 0, "total": 3, "pending": 0}
+    bad = manifest["files"][str(corpus / "bad.cif")]
+    assert bad["status"] == "failed" and bad["stage"] == "parse" and bad["error"]
+    for name in ("a", "sub/b"):
+        record = manifest["files"][str(corpus / f"{name}.cif")]
+        assert record["status"] == "ok" and record["n_sites"] > 0
+        assert record["outputs"] == [str(out / f"{name}.structure.json"), str(out / f"{name}.scene.json")]
+        scene = json.loads((out / f"{name}.scene.json").read_text())
+        assert [group["name"] for group in scene["contents"]][:2] == ["atoms", "bonds"]
+
+    _, manifest = _convert(corpus, out, "mtime")
+    # Failed inputs have no outputs, so they are retried
+    assert _converted(manifest) == {"bad.cif"}
+    assert manifest["summary"]["skipped"] == 2
+
+    later = time.time() + 60
+    os.utime(corpus / "a.cif", (later, later))
+    _, manifest = _convert(corpus, out, "mtime")
+    assert _converted(manifest) == {"a.cif", "bad.cif"}
+    assert manifest["files"][str(corpus / "a.cif")]["status"] == "ok"
+
+    # Other conversion options make every output stale
+    _, manifest = _convert(corpus, out, "mtime", "--lod", "reduced")
+    assert _converted(manifest) == {"a.cif", "b.cif", "bad.cif"}
+    assert manifest["options"]["lod"] == "reduced"
+
+
+def test_batch_rerun_skips_unchanged_inputs_by_hash(tmp_path):
+    corpus, out = _corpus(tmp_path), tmp_path / "out"
+    _, manifest = _convert(corpus, out, "hash")
+    assert _converted(manifest) == {"a.cif", "b.cif", "bad.cif"}
+
+    # A newer mtime alone does not count as a change
+    later = time.time() + 60
+    os.utime(corpus / "a.cif", (later, later))
+    _, manifest = _convert(corpus, out, "hash")
+    assert _converted(manifest) == {"bad.cif"}
+
+    with open(corpus / "sub" / "b.cif", "ab") as f:
+        f.write(b"\n# edited\n")
+    _, manifest = _convert(corpus, out, "hash")
+    assert _converted(manifest) == {"b.cif", "bad.cif"}
+    assert manifest["summary"] == {"ok": 1, "failed": 1, "skipped": 1, "total": 3, "pending": 0}
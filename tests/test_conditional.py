@@ -0,0 +1,38 @@
+import gzip
+
+from lattice_api.services.conditional import (
+    available_codings,
+    choose_coding,
+    etag,
+    matching_etag,
+    negotiated_response,
+)
+
+
+def test_choose_coding_honors_q_values_threshold_and_type():
+    best = available_codings()[0]
+    assert choose_coding("gzip, deflate, br, zstd", "application/json", 4096) == best
+    assert choose_coding("br;q=0.5, gzip", "application/json", 4096) == "gzip"
+    assert choose_coding("*", "chemical/x-cif", 4096) == best
+    assert choose_coding("gzip;q=0", "application/json", 4096) is None
+    assert choose_coding("gzip", "application/json", 100) is None
+    assert choose_coding("gzip", "application/zip", 4096) is None
+    assert choose_coding(None, "application/json", 4096) is None
+
+
+def test_etag_validates_every_coding_of_the_same_content():
+    key = "ab" * 32
+    assert matching_etag(etag(key), key) == etag(key)
+    assert matching_etag(f'"other", W/{etag(key, "gzip")}', key) == etag(key, "gzip")
+    assert matching_etag("*", key) == etag(key)
+    assert matching_etag(etag("cd" * 32), key) is None
+    assert matching_etag(None, key) is None
+
+    payload = b'{"positions": [[0.125, 0.25, 0.5]]}' * 200
+    response = negotiated_response(
+        payload, key=key, media_type="application/json", accept_encoding="gzip", headers={"Vary": "Accept"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == etag(key, "gzip")
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert gzip.decompress(response.body) == payload
@@ -0,0 +1,83 @@
+import asyncio
+
+from lattice_api.services.cache import SceneCache
+from lattice_api.services.dedup import DedupIndex, dedup_candidate, dedup_fingerprint
+
+
+def _structure(c: float = 5.0, z: float = 0.3):
+    from pymatgen.core import Lattice, Structure
+
+    coords = [[0, 0, 0], [0.5, 0.5, z], [0.5, 0.5, 1 - z]]
+    return Structure(Lattice.tetragonal(3.0, c), ["Ti", "O", "O"], coords)
+
+
+def _index(disk_dir=None, **kwargs) -> DedupIndex:
+    return DedupIndex(SceneCache(max_bytes=1 << 20, disk_dir=disk_dir), **kwargs)
+
+
+def _resolve(index: DedupIndex, structure):
+    return asyncio.run(index.resolve(dedup_candidate(structure)))
+
+
+def test_equivalent_structures_resolve_to_first_representative():
+    from pymatgen.core import Structure
+
+    index = _index()
+    original = _structure()
+    first, matched = _resolve(index, original)
+    assert not matched
+
+    reordered = Structure.from_sites(list(reversed(original.sites)))
+    # Same crystal in another setting: axes relabelled and the origin moved
+    setting = original.make_supercell([[0, 1, 0], [0, 0, 1], [1, 0, 0]], in_place=False)
+    setting.translate_sites(list(range(len(setting))), [0.1, 0.2, 0.3])
+    for variant in (reordered, setting):
+        assert _resolve(index, variant) == (first, True)
+
+    strained, matched = _resolve(index, _structure(c=5.5))
+    assert not matched and strained != first
+    assert index.hits == 2 and index.misses == 2
+
+
+def test_fingerprint_prunes_and_buckets_stay_bounded():
+    assert dedup_fingerprint(_structure())[:2] == ("TiO2", 123)
+    assert dedup_fingerprint(_structure(c=5.5))[2] != dedup_fingerprint(_structure())[2]
+
+    index = _index(max_candidates=2)
+    structures = [_structure(z=0.3 + 0.05 * k) for k in range(3)]
+    assert len({dedup_fingerprint(s) for s in structures}) == 1
+    for k, structure in enumerate(structures):
+        index.add(dict(dedup_candidate(structure), id=f"id{k}"))
+    # The oldest representative was dropped from the full bucket
+    assert index.lookup(dedup_candidate(structures[0])) is None
+    assert index.lookup(dedup_candidate(structures[2])) == "id2"
+
+
+def test_strained_or_displaced_copies_are_not_deduplicated():
+    index = _index()
+    original = _structure()
+    first, _ = _resolve(index, original)
+
+    strained = original.copy()
+    strained.apply_strain([0.01, 0.0, 0.0])
+    displaced = original.copy()
+    displaced.translate_sites([1], [0.1, 0.0, 0.0], frac_coords=False)
+    for variant in (strained, displaced):
+        found, matched = _resolve(index, variant)
+        assert not matched and found != first
+
+    # Rounding noise alone still matches
+    rounded = original.copy()
+    rounded.translate_sites([1], [1e-6, 0.0, 0.0])
+    assert _resolve(index, rounded) == (first, True)
+
+
+def test_indexes_sharing_a_disk_tier_do_not_lose_updates(tmp_path):
+    # Two API processes: each add re-reads the bucket from disk under the file lock
+    first, second = _index(str(tmp_path)), _index(str(tmp_path))
+    structures = [_structure(z=0.3 + 0.05 * k) for k in range(3)]
+    first.add(dict(dedup_candidate(structures[0]), id="a"))
+    second.add(dict(dedup_candidate(structures[1]), id="b"))
+    first.add(dict(dedup_candidate(structures[2]), id="c"))
+    fresh = _index(str(tmp_path))
+    assert [fresh.lookup(dedup_candidate(s)) for s in structures] == ["a", "b", "c"]
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.executor import WorkExecutor
+
+
+def test_thread_executor_rejects_when_queue_full():
+    executor = WorkExecutor(kind="thread", max_workers=1, max_pending=1, retry_after=3)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as info:
+            await executor.run(sum, [1, 2])
+        release.set()
+        assert await blocked is True
+        assert await executor.run(sum, [1, 2]) == 3
+        return info.value
+
+    try:
+        exc = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert exc.status_code == 503
+    assert exc.headers == {"Retry-After": "3"}
+    assert executor.pending == 0
+
+
+def test_cancelled_request_keeps_its_slot_until_the_task_finishes():
+    executor = WorkExecutor(kind="thread", max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        abandoned = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        # The client went away, but the task is still running in the pool
+        abandoned.cancel()
+        await asyncio.sleep(0.05)
+        assert executor.pending == 1
+        with pytest.raises(HTTPException):
+            await executor.run(sum, [1, 2])
+        release.set()
+        return await executor.run(sum, [1, 2], wait=True)
+
+    try:
+        assert asyncio.run(scenario()) == 3
+    finally:
+        executor.shutdown()
+    assert executor.pending == 0
+
+
+def test_process_executor_propagates_http_errors():
+    executor = WorkExecutor(kind="process", max_workers=1)
+    try:
+        with pytest.raises(HTTPException) as info:
+            asyncio.run(executor.run(parse_cif_bytes, b"not a cif"))
+    finally:
+        executor.shutdown()
+    assert info.value.status_code == 422
+    assert "Failed to parse CIF" in info.value.detail
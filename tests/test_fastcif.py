@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.fastcif import read_p1_cif
+
+DATA = Path(__file__).parent / "data"
+
+
+def _random_p1(n: int = 40, seed: int = 0):
+    from pymatgen.core import Lattice, Structure
+
+    rng = np.random.default_rng(seed)
+    coords = rng.random((n, 3))
+    # Values CifParser snaps to exact thirds
+    coords[:4] = [[0.3333, 0.6667, 0.0], [0.66667, 0.33333, 0.5], [0.0, 0.333333, 0.25], [1.0, 0.5, 0.75]]
+    species = rng.choice(["O", "Fe", "Li", "P", "Na"], size=n)
+    return Structure(Lattice.from_parameters(8.1, 9.3, 10.7, 84, 97, 101), species.tolist(), coords)
+
+
+def _cif(structure) -> str:
+    from pymatgen.io.cif import CifWriter
+
+    return str(CifWriter(structure))
+
+
+def _reference(text: str, primitive: bool):
+    from pymatgen.io.cif import CifParser
+
+    return CifParser.from_str(text).get_structures(primitive=primitive)[0]
+
+
+def _assert_same(fast, reference):
+    assert np.allclose(fast.lattice.matrix, reference.lattice.matrix, atol=1e-8)
+    assert [s.species_string for s in fast] == [s.species_string for s in reference]
+    assert np.allclose(fast.frac_coords, reference.frac_coords, atol=1e-8)
+    assert fast.labels == reference.labels
+
+
+@pytest.mark.parametrize("primitive", [True, False])
+def test_fast_reader_matches_cifparser(primitive):
+    random = _random_p1()
+    # Species counts with a common factor go through the primitive cell search
+    doubled = random * (2, 1, 1)
+    texts = [_cif(random), _cif(doubled), (DATA / "si.cif").read_text()]
+    # Uncertainties on the cell parameters are stripped like CifParser does
+    texts.append(texts[0].replace("_cell_length_a   8.10000000", "_cell_length_a   8.10000000(3)"))
+    for text in texts:
+        fast = read_p1_cif(text, primitive)
+        assert fast is not None
+        _assert_same(fast, _reference(text, primitive))
+
+
+def test_fast_reader_falls_back_to_cifparser():
+    from pymatgen.core import Lattice, Structure
+    from pymatgen.io.cif import CifWriter
+
+    base = Structure(Lattice.cubic(4.0), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    text = _cif(base)
+    fallbacks = {
+        "symmetry": str(CifWriter(base, symprec=0.1)),
+        "partial": _cif(Structure(base.lattice, [{"Na": 0.5}, "Cl"], base.frac_coords)),
+        "oxidation": _cif(base.copy().add_oxidation_state_by_element({"Na": 1, "Cl": -1})),
+        "duplicate": text.rstrip("\n") + "\n  Cl  Cl2  1  0.50000  0.50005  0.50000  1\n",
+        "noble gas": text.replace("Cl", "Ar"),
+        "quoted": text.replace("Na0", "'Na 0'"),
+    }
+    assert read_p1_cif(text) is not None
+    for name, variant in fallbacks.items():
+        assert read_p1_cif(variant) is None, name
+        # parse_cif_bytes still reads them through CifParser
+        if name != "duplicate":
+            _assert_same(parse_cif_bytes(variant.encode("utf-8")), _reference(variant, True))
+
+
+def test_fast_reader_can_be_disabled(monkeypatch):
+    text = _cif(_random_p1(seed=1))
+    monkeypatch.setenv("LATTICE_FAST_CIF", "0")
+    _assert_same(parse_cif_bytes(text.encode("utf-8")), _reference(text, True))
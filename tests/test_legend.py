@@ -0,0 +1,51 @@
+import warnings
+
+import pytest
+from pymatgen.core import Lattice, Structure
+
+from lattice_api.services.legend import SharedLegend, get_legend, get_legend_cache
+
+
+def _nacl():
+    coords = [[0, 0, 0], [0.5, 0.5, 0.5]]
+    return Structure(Lattice.cubic(2.82), ["Na", "Cl"], coords)
+
+
+@pytest.mark.parametrize("radius_scheme", ["uniform", "covalent", "specified_or_average_ionic"])
+@pytest.mark.parametrize("oxidized", [False, True])
+def test_shared_legend_matches_ctk_legend(radius_scheme, oxidized):
+    from crystal_toolkit.core.legend import Legend
+
+    structure = _nacl()
+    if oxidized:
+        structure.add_oxidation_state_by_element({"Na": 1, "Cl": -1})
+    shared = get_legend(structure, radius_scheme=radius_scheme)
+    plain = Legend(structure, color_scheme=shared.color_scheme, radius_scheme=radius_scheme)
+    assert isinstance(shared, SharedLegend)
+    for site in structure:
+        for sp in site.species:
+            assert shared.get_color(sp, site) == plain.get_color(sp, site)
+            assert shared.get_radius(sp, site) == plain.get_radius(sp, site)
+    assert shared.get_legend() == plain.get_legend()
+
+
+def test_legend_tables_shared_by_chemistry_not_by_structure():
+    get_legend_cache().clear()
+    small = get_legend(_nacl(), radius_scheme="atomic")
+    big = get_legend(_nacl() * (2, 2, 2), radius_scheme="atomic")
+    assert small._tables is big._tables
+    assert big.site_collection is not small.site_collection
+
+    oxidized = _nacl()
+    oxidized.add_oxidation_state_by_element({"Na": 1, "Cl": -1})
+    assert get_legend(oxidized, radius_scheme="atomic")._tables is not small._tables
+
+
+def test_display_overrides_bypass_shared_tables():
+    structure = _nacl()
+    structure.add_site_property("display_color", ["#ff0000", "#00ff00"])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        legend = get_legend(structure)
+    assert not isinstance(legend, SharedLegend)
+    assert legend.get_color(structure[0].specie, structure[0]) == "#ff0000"
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from pymatgen.core import Lattice, Structure
+
+from lattice_api.services.bonding import build_structure_graph
+from lattice_api.services.lod import choose_lod
+from lattice_api.services.scene import render_scene
+
+
+FIXTURES = Path(__file__).parent / "data"
+
+
+def _nacl():
+    coords = [[0, 0, 0], [0.5, 0.5, 0.5]]
+    return Structure(Lattice.cubic(2.82), ["Na", "Cl"], coords) * (3, 3, 3)
+
+
+def _group(scene, name):
+    return next(g for g in scene["contents"] if g["name"] == name)
+
+
+def test_reduced_scene_batches_atoms_and_half_bonds():
+    structure = _nacl()
+    n_edges = build_structure_graph(structure, "cell_list").graph.number_of_edges()
+    scene, level = render_scene(structure, bond_strategy="cell_list", lod="reduced")
+    assert level == "reduced"
+
+    atoms = _group(scene, "atoms")["contents"]
+    bonds = _group(scene, "bonds")["contents"]
+    # One batch per species, no image atoms, two half-cylinders per bond
+    assert len(atoms) == 2 and len(bonds) == 2
+    assert sum(len(p["positions"]) for p in atoms) == len(structure)
+    assert sum(len(p["positionPairs"]) for p in bonds) == 2 * n_edges
+    assert {"unit_cell", "axes"} <= {g["name"] for g in scene["contents"]}
+
+
+def test_atoms_level_has_no_bonds_and_auto_follows_budget():
+    structure = _nacl()
+    scene, level = render_scene(structure, lod="atoms")
+    assert level == "atoms"
+    assert "bonds" not in {g["name"] for g in scene["contents"]}
+
+    assert render_scene(structure, bond_strategy="cell_list", lod="auto", primitive_budget=10**6)[1] == "full"
+    assert render_scene(structure, bond_strategy="cell_list", lod="auto", primitive_budget=100)[1] == "reduced"
+    assert render_scene(structure, lod="auto", primitive_budget=10)[1] == "atoms"
+    assert choose_lod(10, None, 100) == "atoms"
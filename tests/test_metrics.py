@@ -0,0 +1,29 @@
+from lattice_api.services.metrics import Histogram, note, stage, timed_call
+
+
+def _work(x):
+    with stage("double"):
+        y = x * 2
+    note("n_sites", y)
+    return y
+
+
+def test_timed_call_collects_stages_and_is_noop_outside():
+    result, stages = timed_call(_work, 21)
+    assert result == 42
+    assert set(stages["timings"]) == {"double"}
+    assert stages["values"] == {"n_sites": 42}
+    # Outside timed_call the markers do nothing
+    assert _work(1) == 2
+
+
+def test_histogram_exposition_is_cumulative():
+    hist = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "a")
+    hist.observe(0.5, "a")
+    hist.observe(5.0, "a")
+    text = "\n".join(hist.render())
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="a"} 3' in text
@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
 
+import pytest
+
 from lattice_api.services.cif import parse_cif_bytes
 from lattice_api.services.scene import structure_to_scene_dict
 
@@ -27,3 +29,51 @@ def test_structure_to_scene_is_json_serializable_and_has_groups():
     # Bonds are produced via StructureGraph path
     assert "bonds" in names
 
+
+
+def test_binary_scene_encoding_roundtrip_and_size():
+    from lattice_api.services.encoding import decode_scene, encode_scene
+
+    structure = parse_cif_bytes((FIXTURES / "si.cif").read_bytes()) * (4, 4, 4)
+    scene = structure_to_scene_dict(structure, bond_strategy="cell_list")
+    payload = encode_scene(scene)
+    assert len(payload) * 3 < len(json.dumps(scene))
+
+    decoded = decode_scene(payload)
+    atoms = next(c for c in decoded["contents"] if c.get("name") == "atoms")
+    original_atoms = next(c for c in scene["contents"] if c.get("name") == "atoms")
+    # Per-atom sphere primitives are merged into one instanced batch
+    assert len(atoms["contents"]) == 1
+    n_positions = sum(len(p["positions"]) for p in original_atoms["contents"])
+    assert len(atoms["contents"][0]["positions"]) == n_positions
+
+
+def test_scene_payload_fast_path_matches_response_model():
+    import numpy as np
+
+    from lattice_api.models import SceneResponse
+    from lattice_api.services.encoding import dumps_json
+    from lattice_api.services.scene import build_scene_payload
+
+    payload = build_scene_payload((FIXTURES / "si.cif").read_bytes())
+    # Bypassing validation must still produce a document the schema accepts
+    validated = SceneResponse.model_validate_json(payload)
+    assert json.loads(payload) == json.loads(validated.model_dump_json())
+    assert json.loads(dumps_json({"a": np.arange(3), "b": np.float32(1.5)})) == {"a": [0, 1, 2], "b": 1.5}
+
+
+def test_dumps_json_without_orjson(monkeypatch):
+    import numpy as np
+
+    from lattice_api.services import encoding
+    from lattice_api.services.scene import build_scene_payload
+
+    data = (FIXTURES / "si.cif").read_bytes()
+    with_orjson = build_scene_payload(data)
+    monkeypatch.setattr(encoding, "_orjson", None)
+    # The default install's path (pydantic-core), including NumPy values
+    assert json.loads(build_scene_payload(data)) == json.loads(with_orjson)
+    doc = {"a": np.arange(3), "b": np.float32(1.5), "c": [np.int64(2)], "d": "Fe²⁺"}
+    assert json.loads(encoding.dumps_json(doc)) == {"a": [0, 1, 2], "b": 1.5, "c": [2], "d": "Fe²⁺"}
+    with pytest.raises((TypeError, ValueError)):
+        encoding.dumps_json({"x": object()})
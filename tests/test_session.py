@@ -0,0 +1,177 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from lattice_api.main import app
+from lattice_api.services.bonding import cell_list_bonds
+from lattice_api.services.session import EditError, EditSession
+
+
+client = TestClient(app)
+FIXTURES = Path(__file__).parent / "data"
+
+
+def _rattled_nacl():
+    from pymatgen.core import Lattice, Structure
+
+    nacl = Structure.from_spacegroup(
+        "Fm-3m", Lattice.cubic(5.64), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]]
+    )
+    rattled = nacl * (2, 2, 1)
+    rattled.perturb(0.1, min_distance=0.02, seed=0)
+    return rattled
+
+
+def _primitives(scene):
+    """id -> primitive over the atoms and bonds groups."""
+    return {
+        p["id"]: p
+        for group in scene["contents"]
+        if group["name"] in ("atoms", "bonds")
+        for p in group["contents"]
+    }
+
+
+def _apply(primitives, patch):
+    for primitive_id in patch["removed"]:
+        del primitives[primitive_id]
+    for primitive in patch["added"]:
+        assert primitive["id"] not in primitives
+        primitives[primitive["id"]] = primitive
+    for primitive in patch["changed"]:
+        assert primitive["id"] in primitives
+        primitives[primitive["id"]] = primitive
+
+
+def _bonds_by_index(session):
+    """The session's bonds with site ids mapped to current indices (a <= b)."""
+    index = {site_id: i for i, site_id in enumerate(session.ids)}
+    bonds = set()
+    for a, b, image in session.edges:
+        a, b = index[a], index[b]
+        if a > b:
+            a, b, image = b, a, tuple(-x for x in image)
+        bonds.add((a, b, image))
+    return bonds
+
+
+def _reference_bonds(structure):
+    frm, to, images = cell_list_bonds(structure)
+    bonds = set()
+    for a, b, image in zip(frm.tolist(), to.tolist(), images.tolist()):
+        if a > b:
+            a, b, image = b, a, [-x for x in image]
+        bonds.add((a, b, tuple(image)))
+    return bonds
+
+
+def _same_primitives(a, b):
+    import numpy as np
+
+    assert a.keys() == b.keys()
+    for primitive_id, primitive in a.items():
+        expected = dict(b[primitive_id])
+        geometry = "positions" if "positions" in primitive else "positionPairs"
+        assert np.allclose(primitive[geometry], expected.pop(geometry))
+        assert {k: v for k, v in primitive.items() if k != geometry} == expected
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        {"op": "substitute", "sites": [0, 5], "species": "K"},
+        {"op": "delete", "sites": [3]},
+        {"op": "move", "site": 2, "coords": [0.26, 0.01, 0.02]},
+        {"op": "move", "site": 7, "coords": [1.0, 1.2, 0.9], "cartesian": True},
+        {"op": "strain", "strain": [0.02, 0.0, -0.01]},
+    ],
+)
+def test_patches_match_a_full_recompute(edit):
+    session = EditSession(_rattled_nacl())
+    primitives = _primitives(session.scene())
+    for step in (edit, {"op": "move", "site": 1, "coords": [0.1, 0.2, 0.3]}):
+        patch = session.apply(step)
+        _apply(primitives, patch)
+        # Incremental bonds equal a fresh neighbor search on the edited structure
+        assert _bonds_by_index(session) == _reference_bonds(session.structure)
+        _same_primitives(primitives, _primitives(session.scene()))
+    assert patch["version"] == 2
+    assert patch["n_sites"] == len(session.structure)
+
+
+def test_invalid_edits_leave_the_session_unchanged():
+    session = EditSession(_rattled_nacl())
+    edges = dict(session.edges)
+    for edit in (
+        {"op": "explode"},
+        {"op": "delete", "sites": [999]},
+        {"op": "substitute", "sites": [0], "species": "Xx"},
+        {"op": "move", "site": 0, "coords": [0.1, 0.2]},
+        {"op": "strain", "strain": 5},
+        {"op": "delete", "sites": [[1]]},
+        {"op": "delete", "sites": [True]},
+        {"op": "move", "site": False, "coords": [0.1, 0.2, 0.3]},
+    ):
+        with pytest.raises(EditError):
+            session.apply(edit)
+    assert session.version == 0 and session.edges == edges
+
+
+def test_websocket_session_round_trip():
+    cif = (FIXTURES / "si.cif").read_text()
+    with client.websocket_connect("/api/scene/session") as ws:
+        ws.send_json({"type": "edit", "op": "delete", "sites": [0]})
+        assert ws.receive_json()["status"] == 400
+
+        ws.send_json({"type": "open", "cif": cif})
+        opened = ws.receive_json()
+        assert opened["type"] == "scene" and opened["version"] == 0
+        names = [group["name"] for group in opened["scene"]["contents"]]
+        assert names[:3] == ["atoms", "bonds", "unit_cell"]
+        n_sites = opened["n_sites"]
+
+        ws.send_json({"type": "edit", "op": "substitute", "sites": [0], "species": "Ge", "ref": 7})
+        patch = ws.receive_json()
+        assert patch["type"] == "patch" and patch["ref"] == 7 and patch["formula"] == "Ge"
+        assert patch["removed"] == [] and patch["added"] == []
+        assert "atom:0" in [p["id"] for p in patch["changed"]]
+
+        ws.send_json({"type": "edit", "op": "delete", "sites": [42]})
+        error = ws.receive_json()
+        assert error["status"] == 400 and "42" in error["detail"]
+
+        ws.send_json({"type": "edit", "op": "strain", "strain": 0.01})
+        patch = ws.receive_json()
+        assert patch["version"] == 2 and patch["n_sites"] == n_sites
+        assert [group["name"] for group in patch["groups"]][:1] == ["unit_cell"]
+
+    with client.websocket_connect("/api/scene/session") as ws:
+        ws.send_json({"type": "open", "scene_id": opened["scene_id"]})
+        assert ws.receive_json()["type"] == "scene"
+        ws.send_json({"type": "open", "scene_id": "0" * 64})
+        assert ws.receive_json()["status"] == 404
+
+
+def test_websocket_session_survives_malformed_and_failing_edits(monkeypatch):
+    cif = (FIXTURES / "si.cif").read_text()
+    with client.websocket_connect("/api/scene/session") as ws:
+        ws.send_json({"type": "open", "cif": cif})
+        assert ws.receive_json()["type"] == "scene"
+        ws.send_json({"type": "edit", "op": "delete", "sites": [[1]]})
+        assert ws.receive_json()["status"] == 400
+        ws.send_json({"type": "edit", "op": "strain", "strain": 0.01})
+        assert ws.receive_json()["type"] == "patch"
+
+        def broken(self, edit):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(EditSession, "apply", broken)
+        ws.send_json({"type": "edit", "op": "strain", "strain": 0.01, "ref": 3})
+        error = ws.receive_json()
+        assert error["status"] == 500 and error["ref"] == 3 and "boom" in error["detail"]
+        # The socket is still open, but the session has to be opened again
+        ws.send_json({"type": "edit", "op": "strain", "strain": 0.01})
+        assert ws.receive_json()["detail"] == "Open a session first."
+        ws.send_json({"type": "open", "cif": cif})
+        assert ws.receive_json()["type"] == "scene"
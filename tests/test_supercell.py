@@ -0,0 +1,64 @@
+import pytest
+from fastapi import HTTPException
+from pymatgen.core import Lattice, Structure
+
+from lattice_api.services.bonding import build_structure_graph
+from lattice_api.services.scene import render_scene
+from lattice_api.services.supercell import diagonal, parse_supercell
+
+
+def _nacl():
+    return Structure(Lattice.cubic(5.64), ["Na", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+
+
+def _group(scene, name):
+    return next(g for g in scene["contents"] if g["name"] == name)
+
+
+def test_parse_supercell_forms():
+    diag = [[2, 0, 0], [0, 3, 0], [0, 0, 4]]
+    assert parse_supercell("2x3x4") == diag
+    assert parse_supercell("2, 3, 4") == diag
+    assert parse_supercell("[[2,0,0],[0,3,0],[0,0,4]]") == diag
+    assert parse_supercell("1 1 0 -1 1 0 0 0 1") == [[1, 1, 0], [-1, 1, 0], [0, 0, 1]]
+    assert parse_supercell("1x1x1") is None
+    assert parse_supercell("") is None
+    for bad in ("2x2", "2x0x2", "ax2x2", "[[1.5,0,0],[0,1,0],[0,0,1]]", "11x10x10"):
+        with pytest.raises(HTTPException) as exc:
+            parse_supercell(bad)
+        assert exc.value.status_code == 400
+
+
+def test_diagonal_supercell_tiles_unit_cell_geometry():
+    structure = _nacl()
+    n_edges = build_structure_graph(structure, "cell_list").graph.number_of_edges()
+    scene, level = render_scene(structure, bond_strategy="cell_list", supercell=parse_supercell("10x10x10"))
+    assert level == "reduced"
+
+    atoms = _group(scene, "atoms")["contents"]
+    bonds = _group(scene, "bonds")["contents"]
+    assert sum(len(p["positions"]) for p in atoms) == len(structure) * 1000
+    assert sum(len(p["positionPairs"]) for p in bonds) == 2 * n_edges * 1000
+
+    # Same atoms as rendering the explicit supercell
+    tiled = sorted(tuple(round(x, 6) for x in pos) for p in atoms for pos in p["positions"])
+    explicit = sorted(tuple(round(float(x), 6) for x in pos) for pos in (structure * (10, 10, 10)).cart_coords)
+    assert tiled == explicit
+
+
+def test_non_diagonal_supercell_builds_structure():
+    structure = _nacl()
+    scene, level = render_scene(
+        structure, bond_strategy="cell_list", lod="reduced", supercell=parse_supercell("1 1 0 -1 1 0 0 0 1")
+    )
+    assert level == "reduced"
+    assert sum(len(p["positions"]) for p in _group(scene, "atoms")["contents"]) == 2 * len(structure)
+
+
+def test_negative_diagonal_supercell_builds_structure():
+    structure = _nacl()
+    matrix = parse_supercell("-2x-1x1")
+    assert diagonal(matrix) is None
+    scene, _ = render_scene(structure, bond_strategy="cell_list", lod="reduced", supercell=matrix)
+    assert sum(len(p["positions"]) for p in _group(scene, "atoms")["contents"]) == 2 * len(structure)
+    assert sum(len(p["positionPairs"]) for p in _group(scene, "bonds")["contents"]) > 0
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.symmetry import get_symmetry, get_symmetry_cache, structure_fingerprint
+
+
+FIXTURES = Path(__file__).parent / "data"
+
+
+def _si():
+    return parse_cif_bytes((FIXTURES / "si.cif").read_bytes())
+
+
+def test_fingerprint_ignores_float_noise_but_not_geometry():
+    structure = _si()
+    noisy = structure.copy()
+    noisy.translate_sites([0], [1e-12, 0, 0], frac_coords=True, to_unit_cell=False)
+    moved = structure.copy()
+    moved.translate_sites([0], [0.1, 0, 0], frac_coords=True)
+    assert structure_fingerprint(structure) == structure_fingerprint(noisy)
+    assert structure_fingerprint(structure) != structure_fingerprint(moved)
+
+
+def test_symmetry_results_are_cached_per_structure_and_symprec(monkeypatch):
+    from pymatgen.symmetry import analyzer
+
+    calls = []
+    original = analyzer.SpacegroupAnalyzer.__init__
+
+    def counting_init(self, *args, **kwargs):
+        calls.append(1)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(analyzer.SpacegroupAnalyzer, "__init__", counting_init)
+    get_symmetry_cache().clear()
+
+    structure = _si() * (1, 1, 2)
+    first = get_symmetry(structure, symprec=1e-3)
+    assert first.spacegroup_number == 221  # fixture holds a single Si per cubic cell
+    conventional = first.conventional
+    n_calls = len(calls)
+
+    again = get_symmetry(structure.copy(), symprec=1e-3)
+    assert again is first
+    assert len(again.conventional) == len(conventional) == 1
+    assert len(calls) == n_calls
+
+    assert get_symmetry(structure, symprec=1e-2) is not first
+
+
+def test_symmetry_cache_is_bounded_by_estimated_size():
+    from lattice_api.services.cache import LRUCache
+    from lattice_api.services.symmetry import _result_size
+
+    small, large = get_symmetry(_si()), get_symmetry(_si() * (4, 4, 4))
+    assert _result_size(large) - _result_size(small) == 63 * 8 * 1024
+    cache = LRUCache(max_bytes=_result_size(large), sizeof=_result_size)
+    cache.put("small", small)
+    cache.put("large", large)
+    # Room for the large result only, so adding it evicts the small one
+    assert cache.get("small") is None and cache.get("large") is large
@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from pymatgen.core import Lattice, Structure
+from pymatgen.io.cif import CifWriter
+
+from lattice_api.services.encoding import decode_scene
+from lattice_api.services.trajectory import build_trajectory_payload
+
+
+def _cif_frames(structures):
+    return "\n".join(
+        str(CifWriter(s)).replace("data_", f"data_frame{k}_", 1) for k, s in enumerate(structures)
+    ).encode()
+
+
+def _frames(n_frames, step):
+    lattice = Lattice.cubic(2.8)
+    return [
+        Structure(lattice, ["Cs", "Cl"], [[(0.99 + step * k) % 1.0, 0, 0], [0.5, 0.5, 0.5]])
+        for k in range(n_frames)
+    ]
+
+
+def _positions(doc):
+    frames = doc["frames"]
+    return (np.cumsum(frames["positions"], axis=0) * frames["scale"]).reshape(doc["n_frames"], -1, 3)
+
+
+def test_trajectory_unwraps_positions_and_shares_topology():
+    data = _cif_frames(_frames(10, 0.004))
+    doc = json.loads(build_trajectory_payload(data, bond_strategy="cell_list"))
+    assert doc["n_frames"] == 10 and doc["n_sites"] == 2
+    assert doc["frameLattices"] is None
+
+    # The Cs atom crosses the cell face at x=1 but moves in even steps
+    steps = np.diff(_positions(doc)[:, 0, 0])
+    assert np.allclose(steps, 0.004 * 2.8, atol=1e-3)
+
+    # Small displacements: a single topology, atoms listed per batch
+    assert [t["frame"] for t in doc["topologies"]] == [0]
+    atoms = next(g for g in doc["scene"]["contents"] if g["name"] == "atoms")
+    assert sorted(i for batch in atoms["contents"] for i in batch["sites"]) == [0, 1]
+
+
+def test_trajectory_rebuilds_topology_when_bonds_change(monkeypatch):
+    monkeypatch.setenv("LATTICE_TRAJECTORY_REBUILD_DISTANCE", "0.05")
+    lattice = Lattice.cubic(10.0)
+    frames = [
+        Structure(lattice, ["Na", "Cl"], [[0.1, 0.1, 0.1], [0.1 + dx, 0.1, 0.1]]) for dx in (0.25, 0.27, 0.6)
+    ]
+    doc = json.loads(build_trajectory_payload(_cif_frames(frames), bond_strategy="cell_list"))
+    assert [t["frame"] for t in doc["topologies"]] == [0, 2]
+    assert doc["topologies"][1]["bonds"] != doc["topologies"][0]["bonds"]
+
+
+def test_trajectory_binary_and_xdatcar():
+    lines = ["Si", "1.0", "5.43 0 0", "0 5.43 0", "0 0 5.43", "Si", "2"]
+    for k in range(3):
+        lines += [f"Direct configuration= {k + 1}", f"{0.01 * k} 0 0", "0.25 0.25 0.25"]
+    data = ("\n".join(lines) + "\n").encode()
+    payload = build_trajectory_payload(data, filename="XDATCAR", bond_strategy="cell_list", encoding="binary")
+    doc = decode_scene(payload)
+    positions = np.array(doc["frames"]["framePositions"])
+    assert positions.shape == (3, 2, 3)
+    assert positions[2, 0, 0] == pytest.approx(0.02 * 5.43, abs=1e-4)
+
+
+def test_trajectory_rejects_mismatched_frames():
+    lattice = Lattice.cubic(2.8)
+    frames = [
+        Structure(lattice, ["Cs", "Cl"], [[0, 0, 0], [0.5, 0.5, 0.5]]),
+        Structure(lattice, ["Cs", "Br"], [[0, 0, 0], [0.5, 0.5, 0.5]]),
+    ]
+    with pytest.raises(HTTPException) as exc:
+        build_trajectory_payload(_cif_frames(frames))
+    assert exc.value.status_code == 422
+
+
+def test_trajectory_rejects_too_many_frames_before_parsing(monkeypatch):
+    from lattice_api.services import trajectory
+
+    def parse(*args, **kwargs):
+        raise AssertionError("frames parsed before the frame limit was checked")
+
+    monkeypatch.setattr(trajectory, "MAX_TRAJECTORY_FRAMES", 2)
+    monkeypatch.setattr(trajectory, "parse_cif_bytes", parse)
+    monkeypatch.setattr(trajectory, "_parse_xdatcar", parse)
+    cif = _cif_frames(_frames(3, 0.01))
+    xdatcar = b"Si\n1.0\n5 0 0\n0 5 0\n0 0 5\nSi\n1\n" + b"".join(
+        b"Direct configuration= %d\n0 0 0\n" % (k + 1) for k in range(3)
+    )
+    for data, filename in ((cif, "traj.cif"), (xdatcar, "XDATCAR")):
+        with pytest.raises(HTTPException) as exc:
+            trajectory.parse_trajectory(data, filename)
+        assert exc.value.status_code == 413
@@ -0,0 +1,39 @@
+import asyncio
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from lattice_api import main
+from lattice_api.services import executor as executor_mod
+from lattice_api.services import warmup
+
+
+def test_app_import_does_not_load_heavy_modules():
+    code = (
+        "import sys, lattice_api.main; "
+        "print(','.join(m for m in ('pymatgen', 'crystal_toolkit', 'numpy') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_health_reports_readiness(monkeypatch):
+    monkeypatch.setattr(warmup, "_state", dict(warmup._state))
+    client = TestClient(main.app)
+
+    warmup.mark_starting()
+    assert client.get("/health").json()["ready"] is False
+    assert client.get("/health/ready").status_code == 503
+
+    pool = executor_mod.WorkExecutor(kind="thread", max_workers=1)
+    monkeypatch.setattr(executor_mod, "_executor", pool)
+    try:
+        asyncio.run(warmup.run_warmup())
+    finally:
+        pool.shutdown()
+
+    state = client.get("/health").json()
+    assert state["ready"] is True
+    assert state["warmup"] == "done", state
+    assert client.get("/health/ready").status_code == 200
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from lattice_api.services.workflows import FileJobStore, JobQueue, MemoryJobStore
+
+
+def _wait(jobs, job_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_job_queue_runs_high_priority_first_and_bounds_waiting_jobs():
+    jobs = JobQueue(MemoryJobStore(ttl=60), workers=1, max_queue=3)
+    try:
+        blocker = jobs.submit("test", time.sleep, 1.0)
+        while jobs.get(blocker["id"])["state"] != "running":
+            time.sleep(0.01)
+        low = jobs.submit("test", bytes, 1, priority="low")
+        normal = jobs.submit("test", bytes, 2)
+        high = jobs.submit("test", bytes, 3, priority="high")
+        with pytest.raises(HTTPException) as exc:
+            jobs.submit("test", bytes, 4)
+        assert exc.value.status_code == 503
+
+        started = [_wait(jobs, job["id"])["started"] for job in (high, normal, low)]
+        assert started == sorted(started)
+        assert jobs.result(high["id"]) == b"\0\0\0"
+    finally:
+        jobs.shutdown()
+
+
+def test_job_queue_records_failures():
+    jobs = JobQueue(MemoryJobStore(ttl=60), workers=1, max_queue=10)
+    try:
+        job = _wait(jobs, jobs.submit("test", int, "not a number")["id"])
+        assert job["state"] == "failed" and job["status_code"] == 500
+        with pytest.raises(HTTPException):
+            jobs.submit("test", bytes, 1, priority="urgent")
+    finally:
+        jobs.shutdown()
+
+
+def test_job_queue_survives_failures_after_the_work():
+    class FlakyStore(MemoryJobStore):
+        fail = True
+
+        def put(self, job, result=None):
+            if result is not None and self.fail:
+                self.fail = False
+                raise OSError("disk full")
+            super().put(job, result)
+
+    def broken_cache(payload):
+        raise OSError("cache write failed")
+
+    jobs = JobQueue(FlakyStore(ttl=60), workers=1, max_queue=10)
+    try:
+        # Storing the result and the on_done hook fail: the jobs fail, the dispatcher lives
+        stored = _wait(jobs, jobs.submit("test", bytes, 1)["id"])
+        hooked = _wait(jobs, jobs.submit("test", bytes, 1, on_done=broken_cache)["id"])
+        for job, error in ((stored, "disk full"), (hooked, "cache write failed")):
+            assert job["state"] == "failed" and job["status_code"] == 500 and job["error"] == error
+        assert _wait(jobs, jobs.submit("test", bytes, 2)["id"])["state"] == "done"
+    finally:
+        jobs.shutdown()
+
+
+@pytest.mark.parametrize("kind", ["memory", "file"])
+def test_job_stores_expire_finished_jobs(tmp_path, kind):
+    store = MemoryJobStore(ttl=10) if kind == "memory" else FileJobStore(str(tmp_path), ttl=10)
+    done = {"id": "a1", "state": "done", "finished": 100.0}
+    running = {"id": "b2", "state": "running", "finished": None}
+    store.put(done, b"payload")
+    store.put(running)
+    assert store.get("a1") == done and store.result("a1") == b"payload"
+
+    assert store.purge(now=105.0) == 0
+    assert store.purge(now=200.0) == 1
+    assert store.get("a1") is None and store.result("a1") is None
+    assert store.get("b2") == running
+    assert store.get("../b2") is None
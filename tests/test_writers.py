@@ -0,0 +1,100 @@
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from lattice_api.services.cif import parse_cif_bytes
+from lattice_api.services.writers import format_fixed, write_p1_cif, write_poscar
+
+DATA = Path(__file__).parent / "data"
+
+
+def _random_structure(n: int = 200, seed: int = 0):
+    from pymatgen.core import Lattice, Structure
+
+    rng = np.random.default_rng(seed)
+    species = rng.choice(["O", "Fe", "Li", "P"], size=n).tolist()
+    # Some coordinates just outside the cell, as left by relaxations
+    coords = rng.random((n, 3)) * 1.2 - 0.1
+    coords[:3] = [[-0.0, 1e-12, -1e-12], [0.5, 0.125, 0.49999999999], [1.0, 0.001953125, 2**-30]]
+    return Structure(Lattice.from_parameters(12.1, 13.3, 14.7, 84, 97, 101), species, coords)
+
+
+def _structures():
+    from pymatgen.core import Lattice, Structure
+
+    random = _random_structure()
+    oxidized = random.copy()
+    oxidized.add_oxidation_state_by_element({"O": -2, "Fe": 3, "Li": 1, "P": 5})
+    labeled = random.copy()
+    for i, site in enumerate(labeled):
+        site.label = f"X{i}"
+    si = parse_cif_bytes((DATA / "si.cif").read_bytes())
+    flipped = Structure(Lattice(-5 * np.eye(3)), ["Si", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+    return [random, random.get_sorted_structure(), oxidized, labeled, si * (3, 3, 3), flipped]
+
+
+def _written(writer, structure) -> bytes:
+    out = io.BytesIO()
+    assert writer(structure, out)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("decimals, width", [(8, 0), (16, 21), (3, 7)])
+def test_format_fixed_matches_python(decimals, width):
+    rng = np.random.default_rng(decimals)
+    values = np.concatenate(
+        [
+            rng.random(5000),
+            rng.normal(0, 1000, 2000),
+            -rng.random(100) * 1e-9,
+            # Exact ties, signed zeros, carries and values Python formats itself
+            [0.0, -0.0, 0.5, 0.125, 0.001953125, 2**-30, 0.9999999999, -9.9999999999, 1e17],
+            [float("nan"), float("inf"), -float("inf")],
+        ]
+    )
+    chars = format_fixed(values, decimals, width).T
+    assert [bytes(row[row != 0]).decode() for row in chars] == [
+        "%*.*f" % (width, decimals, value) for value in values.tolist()
+    ]
+
+
+def test_writers_match_pymatgen():
+    from pymatgen.io.cif import CifWriter
+    from pymatgen.io.vasp.inputs import Poscar
+
+    for structure in _structures():
+        assert _written(write_p1_cif, structure) == str(CifWriter(structure)).encode("utf-8")
+        assert _written(write_poscar, structure) == str(Poscar(structure)).encode("utf-8")
+
+    disordered = _random_structure(20)
+    disordered.replace_species({"Fe": {"Fe": 0.5, "Mn": 0.5}})
+    assert _written(write_p1_cif, disordered) == str(CifWriter(disordered)).encode("utf-8")
+
+
+def test_writers_fall_back_to_pymatgen():
+    structure = _random_structure(20)
+    quoted = structure.copy()
+    quoted[0].label = "Fe 1"
+    magnetic = structure.copy()
+    magnetic.add_site_property("magmom", [1.0] * len(magnetic))
+    relaxing = structure.copy()
+    relaxing.add_site_property("selective_dynamics", [[True, True, False]] * len(relaxing))
+    disordered = structure.copy()
+    disordered.replace_species({"Fe": {"Fe": 0.5, "Mn": 0.5}})
+
+    cases = [(write_p1_cif, quoted), (write_p1_cif, magnetic), (write_poscar, relaxing), (write_poscar, disordered)]
+    for writer, unsupported in cases:
+        out = io.BytesIO()
+        assert not writer(unsupported, out)
+        assert out.getvalue() == b""
+
+
+def test_export_output_does_not_depend_on_fast_writers(monkeypatch):
+    from lattice_api.routers.export import _export_cif, _export_poscar
+
+    structure = _random_structure()
+    fast = _export_cif(structure, symm=False), _export_poscar(structure)
+    monkeypatch.setenv("LATTICE_FAST_WRITERS", "0")
+    assert (_export_cif(structure, symm=False), _export_poscar(structure)) == fast
@@ -1,24 +1,43 @@
 #!/usr/bin/env python3
-"""Convert a CIF file to pymatgen Structure JSON and CrystalToolkitScene JSON.
+"""Convert CIF files to pymatgen Structure JSON and CrystalToolkitScene JSON.
 
 Reuses lattice_api services to ensure parity with the API output.
 
+Inputs may be files, directories (searched recursively for *.cif) or glob
+patterns. With several inputs, files are converted by a worker pool (-j) whose
+workers import pymatgen/crystal_toolkit once, outputs that are already up to
+date are skipped (so interrupted runs resume), and a manifest with per-file
+timing and failures is written.
+
 Usage examples:
   python tools/cif_to_scene.py input.cif
   python tools/cif_to_scene.py input.cif --pretty
   python tools/cif_to_scene.py input.cif --scene-out scene.json --structure-out structure.json
   python tools/cif_to_scene.py input.cif --no-axes
+  python tools/cif_to_scene.py input.cif --binary
+  python tools/cif_to_scene.py input.cif --supercell 4x4x4 --lod reduced
+  python tools/cif_to_scene.py dump.cif --block 3
+  python tools/cif_to_scene.py dump.cif --block all --out-dir scenes/ -j 0
+  python tools/cif_to_scene.py corpus/ --out-dir scenes/ -j 0
+  python tools/cif_to_scene.py 'corpus/**/*.cif' --out-dir scenes/ -j 8 --skip hash
 """
 
 from __future__ import annotations
 
 import argparse
+import glob
+import hashlib
 import json
 import os
 import sys
+import tempfile
+import time
 from typing import Any
 
 
+MANIFEST_NAME = "cif_to_scene.manifest.json"
+
+
 def _strip_axes(scene: dict) -> dict:
     """Remove axes group from scene in-place and return scene.
 
@@ -30,9 +49,142 @@ def _strip_axes(scene: dict) -> dict:
     return scene
 
 
-def main(argv: list[str] | None = None) -> int:
+def _collect_inputs(patterns: list[str]) -> list[str]:
+    """Expand files, directories (recursive *.cif) and glob patterns; keep first-seen order."""
+    found: dict[str, None] = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _dirs, files in os.walk(pattern):
+                for name in sorted(files):
+                    if name.lower().endswith(".cif"):
+                        found[os.path.join(root, name)] = None
+        elif os.path.isfile(pattern):
+            found[pattern] = None
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found[path] = None
+    return list(found)
+
+
+def _output_paths(
+    cif_path: str, root: str | None, out_dir: str | None, binary: bool, block: str | None = None
+) -> tuple[str, str]:
+    """Return (scene_out, structure_out) for an input, mirroring its tree under out_dir.
+
+    With `block` (for --block all) the block label is appended to the stem.
+    """
+    if out_dir:
+        rel = os.path.relpath(cif_path, root) if root else os.path.basename(cif_path)
+        stem = os.path.join(out_dir, os.path.splitext(rel)[0])
+    else:
+        stem = os.path.splitext(cif_path)[0]
+    if block is not None:
+        stem = f"{stem}.{block}"
+    return (f"{stem}.scene.bin" if binary else f"{stem}.scene.json"), f"{stem}.structure.json"
+
+
+def _block_labels(cif_path: str) -> list[tuple[str, str]]:
+    """(selector, output label) for every data block of a CIF, for --block all."""
+    from lattice_api.services.cif import cif_block_spans  # type: ignore
+
+    with open(cif_path, "rb") as f:
+        data = f.read()
+    labels = []
+    for index, (name, _start, _end) in enumerate(cif_block_spans(data)):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        labels.append((str(index), f"{index}-{safe}" if safe else str(index)))
+    return labels or [("0", "0")]
+
+
+def _file_hash(path: str, options_key: str) -> str:
+    h = hashlib.sha256(options_key.encode("utf-8"))
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def convert_one(
+    cif_path: str, scene_out: str, structure_out: str, options: dict[str, Any], block: str | None = None
+) -> dict[str, Any]:
+    """Convert one CIF (or one data block of it); never raises. Returns a manifest record.
+
+    `block` (index or name) overrides options["block"]. Outputs are written
+    atomically so an interrupted run never leaves a partial file that would
+    later look up to date.
+    """
+    record: dict[str, Any] = {"status": "ok", "outputs": [structure_out, scene_out], "warnings": []}
+    t0 = time.perf_counter()
+    try:
+        from lattice_api.services.cif import parse_cif_bytes, select_cif_block  # type: ignore
+        from lattice_api.services.encoding import encode_scene  # type: ignore
+        from lattice_api.services.scene import structure_to_scene_dict  # type: ignore
+        from lattice_api.services.supercell import parse_supercell  # type: ignore
+    except Exception as exc:
+        return dict(record, status="failed", stage="import", error=str(exc), seconds=0.0)
+
+    stage = "parse"
+    try:
+        with open(cif_path, "rb") as f:
+            data = f.read()
+        block = block if block is not None else options.get("block")
+        if block is not None:
+            record["block"], data = select_cif_block(data, block)
+        structure = parse_cif_bytes(data)
+        timings = {"parse": time.perf_counter() - t0}
+
+        # Write Structure JSON (MSON-compatible)
+        try:
+            struct_json: dict[str, Any] = structure.as_dict()  # monty-serializable
+            indent = 2 if options["pretty"] else None
+            _write_atomic(structure_out, json.dumps(struct_json, indent=indent).encode("utf-8"))
+        except Exception as exc:
+            record["warnings"].append(f"failed to write structure JSON: {exc}")
+
+        # Build Scene JSON (with bonds and axes, using configured color scheme)
+        stage = "scene"
+        t1 = time.perf_counter()
+        scene = structure_to_scene_dict(
+            structure,
+            radius_strategy=options["radius_strategy"],
+            bond_strategy=options["bond_strategy"],
+            lod=options.get("lod", "full"),
+            primitive_budget=options.get("primitive_budget"),
+            supercell=parse_supercell(options.get("supercell")),
+        )
+        if options["no_axes"]:
+            scene = _strip_axes(scene)
+        if options["binary"]:
+            payload = encode_scene(scene)
+        else:
+            payload = json.dumps(scene, indent=2 if options["pretty"] else None).encode("utf-8")
+        timings["scene"] = time.perf_counter() - t1
+        stage = "write"
+        _write_atomic(scene_out, payload)
+        record.update(n_sites=len(structure), timings=timings)
+    except Exception as exc:
+        detail = getattr(exc, "detail", None) or str(exc)
+        record.update(status="failed", stage=stage, error=str(detail))
+    record["seconds"] = time.perf_counter() - t0
+    return record
+
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="CIF -> Structure JSON and CrystalToolkitScene JSON")
-    parser.add_argument("cif", help="Path to .cif file")
+    parser.add_argument("inputs", nargs="+", help="CIF files, directories (recursive) or glob patterns")
     parser.add_argument("--scene-out", default=None, help="Output path for scene JSON (default: <stem>.scene.json)")
     parser.add_argument(
         "--structure-out", default=None, help="Output path for Structure JSON (default: <stem>.structure.json)"
@@ -50,57 +202,212 @@ def main(argv: list[str] | None = None) -> int:
         ],
         help="Radius scheme passed to CTK Legend (default: uniform; color scheme uses CT default)",
     )
+    parser.add_argument(
+        "--bond-strategy",
+        default="minimum_distance",
+        choices=["minimum_distance", "cell_list"],
+        help="Neighbor search used for bonds (default: minimum_distance; cell_list is faster on large cells)",
+    )
+    parser.add_argument(
+        "--lod",
+        default="full",
+        choices=["full", "reduced", "atoms", "auto"],
+        help="Level of detail: reduced drops image atoms and batches primitives, atoms omits bonds, "
+        "auto picks by --primitive-budget (default: full)",
+    )
+    parser.add_argument(
+        "--primitive-budget", type=int, default=None, help="Budget for --lod auto (default: 20000)"
+    )
+    parser.add_argument(
+        "--supercell",
+        default=None,
+        help="Render a supercell: 'NxMxK' (tiled from the unit cell) or nine integers for a 3x3 matrix",
+    )
+    parser.add_argument(
+        "--block",
+        default=None,
+        help="Data block of a multi-block CIF, by index or name (default: first block with a structure); "
+        "'all' converts every block in parallel, writing <stem>.<index>-<name>.scene.json",
+    )
     parser.add_argument("--no-axes", action="store_true", help="Do not include axes (arrows) in scene output")
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON outputs (indent=2)")
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="Write the scene in the binary typed-array encoding (default output: <stem>.scene.bin)",
+    )
+    batch = parser.add_argument_group("batch mode (several inputs or a directory)")
+    batch.add_argument(
+        "--out-dir", default=None, help="Write outputs here, mirroring the input tree (default: next to inputs)"
+    )
+    batch.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes (0 = all cores; default: 1)")
+    batch.add_argument(
+        "--skip",
+        default="mtime",
+        choices=["mtime", "hash", "none"],
+        help="Skip inputs converted with the same options (per the manifest) whose outputs are up to "
+        "date: by mtime, by content hash recorded in the manifest, or never (default: mtime)",
+    )
+    batch.add_argument(
+        "--manifest", default=None, help=f"Manifest path (default: <out-dir or cwd>/{MANIFEST_NAME})"
+    )
+    return parser
 
-    args = parser.parse_args(argv)
 
-    cif_path = args.cif
+def _main_single(args: argparse.Namespace, options: dict[str, Any]) -> int:
+    cif_path = args.inputs[0]
     if not os.path.isfile(cif_path):
         print(f"Error: file not found: {cif_path}", file=sys.stderr)
         return 2
 
     # Derive defaults for outputs
-    stem, _ = os.path.splitext(cif_path)
-    scene_out = args.scene_out or f"{stem}.scene.json"
-    structure_out = args.structure_out or f"{stem}.structure.json"
+    default_scene, default_structure = _output_paths(cif_path, None, None, args.binary)
+    scene_out = args.scene_out or default_scene
+    structure_out = args.structure_out or default_structure
 
-    # Lazy imports from project services to avoid CLI import cost if not needed
-    try:
-        from lattice_api.services.cif import parse_cif_bytes  # type: ignore
-        from lattice_api.services.scene import structure_to_scene_dict  # type: ignore
-    except Exception as exc:
-        print(f"Error: failed to import project modules: {exc}", file=sys.stderr)
+    record = convert_one(cif_path, scene_out, structure_out, options)
+    for warning in record["warnings"]:
+        print(f"Warning: {warning}", file=sys.stderr)
+    if record["status"] != "ok":
+        what = {"import": "import project modules", "parse": "parse CIF"}.get(
+            record["stage"], "build/write scene JSON"
+        )
+        print(f"Error: failed to {what}: {record['error']}", file=sys.stderr)
         return 1
 
-    try:
-        data = open(cif_path, "rb").read()
-        structure = parse_cif_bytes(data)
-    except Exception as exc:
-        print(f"Error: failed to parse CIF: {exc}", file=sys.stderr)
-        return 1
+    print(f"Wrote:\n- {structure_out}\n- {scene_out}")
+    return 0
+
+
+def _is_up_to_date(cif_path: str, outputs: list[str], mode: str, digest: str | None, previous: dict) -> bool:
+    """Whether an input can be skipped. `previous` is its record from a manifest
+    written with the same options ({} otherwise), so option changes reconvert."""
+    if mode == "none" or previous.get("status") != "ok" or not all(os.path.isfile(p) for p in outputs):
+        return False
+    if mode == "hash":
+        return previous.get("hash") == digest
+    src_mtime = os.path.getmtime(cif_path)
+    return all(os.path.getmtime(p) >= src_mtime for p in outputs)
 
-    # Write Structure JSON (MSON-compatible)
+
+def _main_batch(args: argparse.Namespace, options: dict[str, Any]) -> int:
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    if args.scene_out or args.structure_out:
+        print("Error: --scene-out/--structure-out only apply to a single input file", file=sys.stderr)
+        return 2
+
+    inputs = _collect_inputs(args.inputs)
+    if not inputs:
+        print("Error: no .cif files matched the inputs", file=sys.stderr)
+        return 2
+    # Mirror trees relative to the common parent of all inputs
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in inputs])
+
+    manifest_path = args.manifest or os.path.join(args.out_dir or ".", MANIFEST_NAME)
+    options_key = json.dumps(options, sort_keys=True)
+    previous: dict[str, Any] = {}
     try:
-        struct_json: dict[str, Any] = structure.as_dict()  # monty-serializable
-        with open(structure_out, "w", encoding="utf-8") as f:
-            json.dump(struct_json, f, indent=2 if args.pretty else None)
-    except Exception as exc:
-        print(f"Warning: failed to write structure JSON: {exc}", file=sys.stderr)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        if old.get("options") == options:
+            previous = old.get("files", {})
+    except (OSError, ValueError):
+        pass
+
+    files: dict[str, Any] = {}
+    todo = []
+    for path in inputs:
+        digest = _file_hash(path, options_key) if args.skip == "hash" else None
+        blocks = _block_labels(path) if args.block == "all" else [(None, None)]
+        for block, label in blocks:
+            key = f"{path}#{label}" if label is not None else path
+            scene_out, structure_out = _output_paths(
+                os.path.abspath(path), root, args.out_dir, args.binary, label
+            )
+            prev = previous.get(key, {})
+            if _is_up_to_date(path, [structure_out, scene_out], args.skip, digest, prev):
+                files[key] = dict(prev, status="ok", skipped=True)
+            else:
+                todo.append((key, path, scene_out, structure_out, digest, block))
+
+    def write_manifest(final: bool) -> None:
+        counts = {"ok": 0, "failed": 0, "skipped": 0}
+        for rec in files.values():
+            counts["skipped" if rec.get("skipped") else rec["status"]] += 1
+        manifest = {
+            "options": options,
+            "complete": final,
+            "summary": dict(counts, total=total, pending=total - len(files)),
+            "files": files,
+        }
+        _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+    total = len(files) + len(todo)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    print(f"{total} inputs, {total - len(todo)} up to date, converting {len(todo)} with {jobs} workers")
 
-    # Build Scene JSON (with bonds and axes, using configured color scheme)
+    t0 = time.perf_counter()
+    last_flush = t0
+    done = 0
     try:
-        scene = structure_to_scene_dict(structure, radius_strategy=args.radius_strategy)
-        if args.no_axes:
-            scene = _strip_axes(scene)
-        with open(scene_out, "w", encoding="utf-8") as f:
-            json.dump(scene, f, indent=2 if args.pretty else None)
-    except Exception as exc:
-        print(f"Error: failed to build/write scene JSON: {exc}", file=sys.stderr)
-        return 1
+        from lattice_api.services.executor import warm_worker  # type: ignore
+    except Exception:
+        warm_worker = None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_worker) as pool:
+        futures = {
+            pool.submit(convert_one, p, s, st, options, b): (key, d) for key, p, s, st, d, b in todo
+        }
+        try:
+            for future in as_completed(futures):
+                path, digest = futures[future]
+                record = future.result()
+                if digest is not None:
+                    record["hash"] = digest
+                files[path] = record
+                done += 1
+                if record["status"] != "ok":
+                    print(f"FAILED {path}: {record['error']}", file=sys.stderr)
+                # Flush progress periodically so an interrupted run can resume
+                if time.perf_counter() - last_flush > 30:
+                    write_manifest(final=False)
+                    last_flush = time.perf_counter()
+        except KeyboardInterrupt:
+            for future in futures:
+                future.cancel()
+            write_manifest(final=False)
+            print(f"Interrupted after {done}/{len(todo)}; manifest: {manifest_path}", file=sys.stderr)
+            return 130
 
-    print(f"Wrote:\n- {structure_out}\n- {scene_out}")
-    return 0
+    write_manifest(final=True)
+    failed = sum(1 for rec in files.values() if rec["status"] != "ok")
+    elapsed = time.perf_counter() - t0
+    print(f"Converted {done - failed}, failed {failed}, in {elapsed:.1f}s; manifest: {manifest_path}")
+    return 1 if failed else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _build_parser().parse_args(argv)
+    options = {
+        "radius_strategy": args.radius_strategy,
+        "bond_strategy": args.bond_strategy,
+        "lod": args.lod,
+        "primitive_budget": args.primitive_budget,
+        "supercell": args.supercell,
+        "block": args.block,
+        "no_axes": args.no_axes,
+        "pretty": args.pretty,
+        "binary": args.binary,
+    }
+    single = (
+        len(args.inputs) == 1
+        and not os.path.isdir(args.inputs[0])
+        and not args.out_dir
+        and args.block != "all"
+    )
+    if single and (os.path.isfile(args.inputs[0]) or not glob.has_magic(args.inputs[0])):
+        return _main_single(args, options)
+    return _main_batch(args, options)
 
 
 if __name__ == "__main__":